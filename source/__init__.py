@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 
+from nano.config            import Config
 from nano.server            import Server
+from nano.server.asyncioserver import AsyncioServer
+from nano.server.prefork    import Prefork
+from nano.server.reloader   import Reloader
 from nano.app               import App
 
 import os
+import signal
 import sys
 
 if __name__ == '__main__':
@@ -17,9 +22,48 @@ if __name__ == '__main__':
     dirRoot = currentDir()      # Define root directory
     sys.path.append(dirRoot)    # Add it to package resolver
 
-    apps   = App(dirRoot)       # Create applicatives manager
-    # print(apps.list())
-    server = Server(dirRoot)    # Create servers
+    config = Config(dirRoot+"config")
 
-    # Bind entering http request server to apps resolver
-    server.on("request", lambda args: apps.resolve(args["request"], args["response"]))
+    # Start applicatives and servers of current process
+    def boot():
+        apps   = App(dirRoot)       # Create applicatives manager
+        # print(apps.list())
+
+        # Create servers, on asyncio loop or on own io engine
+        if config.get("http.engine", "thread")=="asyncio":
+            server = AsyncioServer(dirRoot)
+        else:
+            server = Server(dirRoot)
+
+        # Bind entering http request server to apps resolver
+        server.on("request", lambda args: apps.resolve(args["request"], args["response"]))
+        return (apps, server)
+
+    if config.get("http.prefork.enabled", False):
+        # Master forks workers, each one listen vhost ports with its own accept queue
+        Prefork(
+            config.get("http.prefork.workers", None),
+            boot,
+            lambda instances: instances[1].drain(),
+            Reloader(config.get("http.shutdown.readyTimeout", 10))
+        ).run()
+    else:
+        (apps, server) = boot()
+
+        # SIGTERM/SIGINT: graceful stop, in-flight requests end before exit
+        def onstop(signum, frame):
+            server.drain()
+            sys.stdout.flush()
+            os._exit(0)
+
+        # SIGHUP: graceful reload, a new process takes over listening sockets
+        def onreload(signum, frame):
+            if server.reload():
+                sys.stdout.flush()
+                os._exit(0)
+
+        signal.signal(signal.SIGTERM, onstop)
+        signal.signal(signal.SIGINT , onstop)
+        signal.signal(signal.SIGHUP , onreload)
+        while True:
+            signal.pause()
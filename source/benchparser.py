@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+"""
+    Microbenchmark of http request parsing, requests/sec on one core (cpu time of this process)
+    - "asset": browser GET of a public file, answered from asset cache to an in-memory connexion
+    - "route": browser GET of an application route, parsed request handed back (applications are not run)
+    - "post" : form POST of an application route
+    Usage: python3 benchparser.py [seconds by case]
+"""
+
+from nano.config                    import Config
+from nano.server.httpprotocol       import HttpProtocol
+
+import os
+import sys
+import time
+
+"""
+    In-memory connexion, same api than nano.server.socketwrapper.SocketWrapper, writes are dropped
+"""
+class BenchConnection():
+
+    """
+        Constructor
+        @returns None
+    """
+    def __init__(self):
+        self.closed     = False
+        self.terminator = b'\r\n\r\n'
+        self.requests   = 0
+        self.pending    = 0
+        self.loop       = None
+        self.written    = 0
+        self._local     = ("127.0.0.1", 80)
+        self._remote    = ("127.0.0.1", 50000)
+        self._port      = 80
+        self._ssl       = False
+
+    """
+        Count written data
+        @param   data   bytes   Data to send
+        @returns None
+    """
+    def write(self, data: bytes):
+        self.written += len(data)
+
+    """
+        Count written data, connexion stays usable
+        @param   data   bytes   Last data to send
+        @returns None
+    """
+    def end(self, data: bytes):
+        self.written += len(data)
+
+    """
+        Response is sent, nothing to do
+        @returns None
+    """
+    def finish(self):
+        pass
+
+    """
+        Nothing to close
+        @returns None
+    """
+    def close(self):
+        pass
+
+    """
+        Keep alive is not measured
+        @param   value  bool    Keep alive
+        @returns None
+    """
+    def setkeepalive(self, value):
+        pass
+
+    """
+        Streamed files are not sent
+        @param   callback   Callable    Streaming routine
+        @returns None
+    """
+    def stream(self, callback):
+        pass
+
+    """
+        Events are never fired
+        @param   eventName  str         Event name
+        @param   callback   Callable    Callback
+        @returns None
+    """
+    def on(self, eventName: str, callback):
+        pass
+
+"""
+    Run a case for given duration
+    @param   protocol   HttpProtocol    Protocol under test
+    @param   raw        bytes           Request
+    @param   duration   float           Seconds of cpu time
+    @returns float                      Requests by second of cpu time
+"""
+def bench(protocol: HttpProtocol, raw: bytes, duration: float) -> float:
+    connexion = BenchConnection()
+    data      = memoryview(raw)
+    count     = 0
+    start     = time.process_time()
+    while True:
+        for i in range(1000):
+            # Keep alive budget is per connexion
+            connexion.requests = 0
+            protocol.parse(connexion, 80, False, data)
+        count  += 1000
+        elapsed = time.process_time()-start
+        if elapsed>=duration:
+            return count/elapsed
+
+if __name__ == '__main__':
+
+    dirRoot  = os.path.dirname(os.path.abspath(__file__))+os.path.sep
+    duration = float(sys.argv[1]) if len(sys.argv)>1 else 3
+    protocol = HttpProtocol(dirRoot, Config(dirRoot+"config"))
+    headers  = b''.join([
+        b'Host: localhost\r\n',
+        b'User-Agent: Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0\r\n',
+        b'Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8\r\n',
+        b'Accept-Language: en-US,en;q=0.5\r\n',
+        b'Accept-Encoding: gzip, deflate, br\r\n',
+        b'Connection: keep-alive\r\n',
+        b'Cookie: session=8f14e45fceea167a5a36dedd4bea2543; theme=dark\r\n',
+        b'Upgrade-Insecure-Requests: 1\r\n',
+        b'Sec-Fetch-Dest: document\r\n',
+        b'Sec-Fetch-Mode: navigate\r\n',
+        b'Sec-Fetch-Site: none\r\n',
+        b'Priority: u=0, i\r\n'
+    ])
+    form     = b'name=nano&lang=python&page=1'
+    cases    = {
+        "asset" : b'GET /index.htm HTTP/1.1\r\n'+headers+b'\r\n',
+        "route" : b'GET /bench/route?page=1&sort=name HTTP/1.1\r\n'+headers+b'\r\n',
+        "post"  : b'POST /bench/route HTTP/1.1\r\n'+headers+b'Content-Type: application/x-www-form-urlencoded\r\nContent-Length: '+str(len(form)).encode('ascii')+b'\r\n\r\n'+form
+    }
+    for name, raw in cases.items():
+        print(f"{name:<6} {bench(protocol, raw, duration):>10.0f} requests/sec/core")
@@ -4,6 +4,8 @@ from nano.config                import Config
 from nano.event                 import Event
 from nano.server.httprequest    import HttpRequest
 from nano.server.httpresponse   import HttpResponse
+from nano.server.workerpool     import WorkerPool
+from nano.server.vhostkey       import VhostKey
 from nano.app.instance          import Instance
 from nano.app.controller        import Controller
 
@@ -26,8 +28,11 @@ class App():
         self.event          = Event()
         self.config         = Config(self.dirRoot+"config")
         self.vhosts         = self.config.get("vhost", [])
+        self.vhostKey       = VhostKey()
         self.applicatives   = {}
+        self.pools          = {}
         self._loadApplicatives()
+        self._startPools()
 
     """
         Load actives applicatives from vhosts configuration
@@ -46,6 +51,29 @@ class App():
             if not appName in self.applicatives:
                 self.applicatives[appName] = Instance(appName, directory)
 
+    """
+        Start one dispatch worker pool by vhost, "workers" of vhost override "http.workers"
+        @returns None
+    """
+    def _startPools(self):
+        defaults = self.config.get("http.workers", {})
+        for vhost in self.vhosts:
+            workers = {**defaults, **vhost.get("workers", {})}
+            threads = int(workers.get("threads", 0))
+            if threads>0:
+                key = self.vhostKey.key(vhost)
+                self.pools[key] = WorkerPool("Worker-"+key, threads, workers.get("maxQueue", 0))
+
+    """
+        Dispatch pools counters by vhost, pre-queues counters by applicative
+        @returns dict
+    """
+    def stats(self) -> dict:
+        return {
+            "pools"         : {key: pool.stats() for key, pool in self.pools.items()},
+            "applicatives"  : {name: instance.Queue.stats() for name, instance in self.applicatives.items()}
+        }
+
     """
         Return list of applicatives availables by vhosts
         @returns list
@@ -73,4 +101,54 @@ class App():
             response.headers['connection']      = 'close'
             response.send()
         else:
-            self.applicatives[appName].resolve(request, response)
+            instance = self.applicatives[appName]
+            pool     = self.pools.get(self.vhostKey.key(request.vhost), None)
+
+            # Admission control, a noisy applicative can not fill shared pools
+            ticket   = instance.Queue.enter()
+            if ticket == None:
+                self._reject(instance.Queue.rejectCode, request, response)
+                return
+
+            def task():
+                if not instance.Queue.start(ticket):
+                    # Waited too long, client has probably given up
+                    self._reject(instance.Queue.rejectCode, request, response)
+                    return
+                running = None
+                try:
+                    running = instance.resolve(request, response)
+                finally:
+                    # "async def" controller still runs on loop, its queue place is left once it is done
+                    if running == None:
+                        instance.Queue.leave()
+                    else:
+                        running.add_done_callback(lambda running: instance.Queue.leave())
+
+            # Websocket messages of a connexion share a serial key, pool runs them one at a time in order
+            if pool == None:
+                # No pool, resolve on io thread
+                task()
+            elif not pool.submit(task, request.serial):
+                instance.Queue.cancel()
+                self._reject(instance.Queue.rejectCode, request, response)
+
+    """
+        Fast http error, when request can not be dispatched
+        @param   httpCode  int          HTTP code (label from "http.codes")
+        @param   request   HttpRequest  http request
+        @param   response  HttpResponse http response
+        @returns None
+    """
+    def _reject(self, httpCode: int, request: HttpRequest, response: HttpResponse):
+        label = self.config.get("http.codes", {}).get(str(httpCode), "")
+        response.code                       = httpCode
+        if request.protocol=='websocket':
+            response.body                   = "<"+str(httpCode)+">"
+        else:
+            response.body                   = "<doctype html><html><body><h1>"+str(httpCode)+" - "+label+"</h1><hr></body></html>"
+            response.headers['cacheControl']= 'no-cache, no-store, max-age=0, must-revalidate'
+            response.headers['contentType'] = 'text/html; chatset: utf-8'
+            response.headers['retryAfter']  = '1'
+        response.headers['connection']      = 'close'
+        response.send()
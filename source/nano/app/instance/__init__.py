@@ -7,10 +7,12 @@ from nano.app.view              import View
 from nano.app.error             import Error
 from nano.app.log               import Log
 from nano.app.lang              import Lang
+from nano.app.prequeue          import PreQueue
 
 import os
 import re
 import sys
+import asyncio
 import importlib
 
 """
@@ -31,6 +33,11 @@ class Instance():
         self.Config         = Config(self.directory+"config")
         self.Log            = Log(self.directory+"log")
         self.Lang           = Lang(self.directory+"lang")
+        self.Queue          = PreQueue(
+            self.Config.get("global.queue.maxDepth", 128),
+            self.Config.get("global.queue.maxWait", 5),
+            self.Config.get("global.queue.rejectCode", 503)
+        )
         self.Controllers    = {}
         self.Models         = {}
         self.Routes         = {}
@@ -44,25 +51,29 @@ class Instance():
     """
     def reloadModules(self):
 
-        self.Controllers    = {}
-        self.Models         = {}
-        self.Routes         = {}
+        # Build then swap, concurrent requests must never see empty routes
+        controllers = {}
+        models      = {}
+        routes      = {}
         for controller in self._loadControllers():
-            self.Routes[controller["route"]]                = controller["controllerName"]
-            self.Controllers[controller["controllerName"]]  = controller["instance"]
+            routes[controller["route"]]                     = controller["controllerName"]
+            controllers[controller["controllerName"]]       = controller["instance"]
 
         for model in self._loadModels():
-            self.Models[model["modelName"]]                 = model["instance"]
+            models[model["modelName"]]                      = model["instance"]
+
+        (self.Controllers, self.Models, self.Routes) = (controllers, models, routes)
 
     """
         Process a request to a response
         @param   request  HttpRequest   HTTP or Websocket Request (given)
         @param   response HttpResponse  HTTP or Websocket Response (to fill)
-        @returns None
+        @returns asyncio.Task   Task of an "async def" controller still running on loop, else None
     """
     def resolve(self, request: HttpRequest, response: HttpResponse):
 
         developperMode = self.Config.get("global.developperMode", False)
+        tasks          = []     # Controller coroutine scheduled on running loop
 
         try:
 
@@ -92,6 +103,16 @@ class Instance():
             # Call it under error watcher
             try:
 
+                def sendView(view):
+
+                    # Check controller return view
+                    if not isinstance(view, View):
+                        raise Exception("Controller \""+route+"\" return invalid View")
+
+                    # map and return
+                    (response.code, response.headers, response.body) = (view.code, view.headers, view.body)
+                    response.send()
+
                 def runController():
 
                     caller = getattr(self.Controllers[self.Routes[route]], method) # Get controller instance from route
@@ -105,13 +126,20 @@ class Instance():
 
                         view = caller(*args)                          # Call it and return view
 
-                        # Check controller return view
-                        if not isinstance(view, View):
-                            raise Exception("Controller \""+route+"\" return invalid View")
-
-                        # map and return
-                        (response.code, response.headers, response.body) = (view.code, view.headers, view.body)
-                        response.send()
+                        # "async def" controller, await it on running loop (asyncio engine) or on its own
+                        if asyncio.iscoroutine(view):
+                            try:
+                                loop = asyncio.get_running_loop()
+                            except RuntimeError:
+                                loop = None
+                            if loop != None:
+                                task = loop.create_task(view)
+                                task.add_done_callback(lambda task: errorManager.watch(lambda: sendView(task.result())))
+                                tasks.append(task)
+                                return
+                            view = asyncio.run(view)
+
+                        sendView(view)
 
                     if request.protocol=='websocket':
                         
@@ -124,6 +152,13 @@ class Instance():
                             response.body = message
                             response.send()
                         view = caller(sender, *args)                          # Call it with a sender
+                        if asyncio.iscoroutine(view):
+                            try:
+                                task = asyncio.get_running_loop().create_task(view)
+                                task.add_done_callback(lambda task: errorManager.watch(task.result))
+                                tasks.append(task)
+                            except RuntimeError:
+                                asyncio.run(view)
 
                 errorManager = Error()
                 def onerror(args):
@@ -140,6 +175,7 @@ class Instance():
 
                 errorManager.on("error", onerror)
                 errorManager.watch(runController)
+                return tasks[0] if len(tasks)>0 else None
 
             # Double safety if error module has bug
             except Exception as e:
@@ -170,7 +206,7 @@ class Instance():
                 { "action": "dir" , "target": "model"                   , "mode": 0o775 },
                 { "action": "dir" , "target": "public"                  , "mode": 0o774 },
                 { "action": "dir" , "target": "upload"                  , "mode": 0o774 },
-                { "action": "file", "target": "config/global.json"      , "mode": 0o664 , "content": "{\n\t\"developperMode\": true\n}"},
+                { "action": "file", "target": "config/global.json"      , "mode": 0o664 , "content": "{\n\t\"developperMode\": true,\n\t\"queue\": {\n\t\t\"maxDepth\": 128,\n\t\t\"maxWait\": 5,\n\t\t\"rejectCode\": 503\n\t}\n}"},
                 { "action": "file", "target": "config/databases.json"   , "mode": 0o664 , "content": "{}" },
                 { "action": "file", "target": "config/routes.json"      , "mode": 0o664 , "content": "{\n\t\"http\": {},\n\t\"websocket\": {}\n}"}
             ]
@@ -37,24 +37,23 @@ class Log:
 
         # Limit 1 update per sec
         now = int(time.time())
-        if self._lastCheckUpdate>=now:
+        if self._lastCheckUpdate>=now and self._path!=None:
             return self.directory + self._path + self.DS
-        self._lastCheckUpdate = now
 
         # Check if day has changed (path of today logs directory)
         today = time.strftime("%Y-%m-%d").replace('-', self.DS)
         if self._path==None or self._path != today:
-            self._path = today
 
-            # Create new directory path
+            # Create new directory path, before publishing it to concurrent requests
             segments = today.split(self.DS)
             path     = self.directory
             for segment in segments:
                 path += segment + self.DS
-                if not os.path.isdir(path):
-                    os.mkdir(path, 0o776)
+                os.makedirs(path, 0o776, exist_ok=True)
+            self._path = today
+        self._lastCheckUpdate = now
 
-        return self.directory + self._path + self.DS
+        return self.directory + today + self.DS
 
     """
         Log Trace
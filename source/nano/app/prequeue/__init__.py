@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+"""
+    Class for applicative request pre-queue (admission control: max depth, max wait)
+"""
+class PreQueue():
+
+    """
+        Constructor
+        @param   maxDepth   int     Max requests waiting or running for applicative (0 for unlimited)
+        @param   maxWait    float   Max seconds a request may wait before running (0 for unlimited)
+        @param   rejectCode int     Http code of rejected requests (503 or 429)
+        @returns None
+    """
+    def __init__(self, maxDepth: int, maxWait: float, rejectCode: int):
+        self.maxDepth   = int(maxDepth)
+        self.maxWait    = float(maxWait)
+        self.rejectCode = int(rejectCode)
+        self.depth      = 0
+        self.rejected   = 0
+        self.expired    = 0
+        self.completed  = 0
+        self.waitAvg    = 0.0
+        self.waitMax    = 0.0
+        self._lock      = threading.Lock()
+
+    """
+        Admit a request in queue
+        @returns float      Ticket (enqueue time), None if queue is full
+    """
+    def enter(self) -> float:
+        with self._lock:
+            if self.maxDepth>0 and self.depth>=self.maxDepth:
+                self.rejected += 1
+                return None
+            self.depth += 1
+        return time.monotonic()
+
+    """
+        Request leaves queue to run, check its wait time
+        @param   ticket float   Ticket given by enter()
+        @returns bool           False if request waited too long (it leaves queue)
+    """
+    def start(self, ticket: float) -> bool:
+        wait = time.monotonic()-ticket
+        with self._lock:
+            # Moving average over ~100 requests
+            self.waitAvg = self.waitAvg + (wait-self.waitAvg)/100
+            self.waitMax = max(self.waitMax, wait)
+            if self.maxWait>0 and wait>self.maxWait:
+                self.expired += 1
+                self.depth   -= 1
+                return False
+        return True
+
+    """
+        Request leaves queue without running (dispatch failed)
+        @returns None
+    """
+    def cancel(self):
+        with self._lock:
+            self.depth -= 1
+
+    """
+        Request is resolved
+        @returns None
+    """
+    def leave(self):
+        with self._lock:
+            self.depth     -= 1
+            self.completed += 1
+
+    """
+        Queue counters
+        @returns dict
+    """
+    def stats(self) -> dict:
+        return {
+            "depth"     : self.depth,
+            "maxDepth"  : self.maxDepth,
+            "maxWait"   : self.maxWait,
+            "waitAvg"   : self.waitAvg,
+            "waitMax"   : self.waitMax,
+            "rejected"  : self.rejected,
+            "expired"   : self.expired,
+            "completed" : self.completed
+        }
@@ -39,7 +39,6 @@ class View:
         for key in headers:
             self.headers[key] = headers[key]
         self.headers["contentType"] = "text/json; chatset: utf-8"
-        self.headers["connection"] = "close"
         return self
 
     def Html(self, code, data, headers):
@@ -49,7 +48,6 @@ class View:
         for key in headers:
             self.headers[key] = headers[key]
         self.headers["contentType"] = "text/html; chatset: utf-8"
-        self.headers["connection"] = "keep-alive"
         return self
 
     def Redirect(self, url):
@@ -6,10 +6,18 @@ from nano.event                     import Event
 from nano.server.socketportlistener import SocketPortListener
 from nano.server.socketwrapper      import SocketWrapper
 from nano.server.httpprotocol       import HttpProtocol
+from nano.server.eventloop          import EventLoop
+from nano.server.httpframer         import HttpFramer
+from nano.server.timerwheel         import TimerWheel
+from nano.server.connectionregistry import ConnectionRegistry
+from nano.server.sniselector        import SniSelector
+from nano.server.reloader           import Reloader
 
 from collections.abc import Callable
 import os
 import ssl as libssl
+import threading
+import time
 
 """
     Class for manage http servers (request/response)
@@ -28,51 +36,175 @@ class Server():
         self.config     = Config(self.dirRoot+"config")
         self.vhosts     = self.config.get("vhost", [])
         self.listeners  = set()
-        self.sockets    = set()
         self.protocol   = HttpProtocol(self.dirRoot, self.config)
+        self.connections= ConnectionRegistry(
+            self.config.get("http.connections.max", 0),
+            self.config.get("http.connections.maxPerRemote", 0),
+            {port: vhost["maxConnections"] for vhost in self.vhosts if "maxConnections" in vhost for port in self.protocol.vhostPorts(vhost)}
+        )
+        self.engine     = self.config.get("http.engine", "thread")
+        self.loop       = None
+        self._sslContexts = {}      # (certfile, keyfile) -> SSLContext, shared by ports of a same cert
+        self._sniSelectors = {}     # Port -> SniSelector of ssl ports, for stats
+        self.draining   = False
+        self._pendingLock = threading.Lock()    # Pending counts of connexions, raised on io threads, lowered on workers
 
-        # Listen data on connexion
-        def ondata(args):
-            (request, response) = self.protocol.parse(args["socket"], args["port"], args["ssl"], args["data"])
-            if request != None and response!=None:
-
-                # Request is valid and not auto managed
-                socket = args["socket"]
-                def onresponse(args):
-                    response    = args["response"]
-                    raw         = self.protocol.pack(response)
-                    if "connexion" in response.headers and response.headers["connexion"]=="keep-alive":
-                        socket.write(raw)
-                    else:
-                        socket.end(raw)
-                
-                response.on("send", onresponse)
-                self.event.fire("request", {"request": request, "response": response})
-
-        # Listen connexion on port
-        def receiveSocket(args):
-            socket, port, ssl = args["socket"], args["port"], args["ssl"]
-            swp = SocketWrapper(socket, port, ssl)
-            swp.on("error"    , lambda args: print("Receive socket error: "+str(args["exception"])))
-            swp.on("close"    , lambda args: socket in self.sockets and self.sockets.remove(socket))
-            swp.on("data"     , ondata)
-            swp.start()
-            self.sockets.add(swp)
-
-        # Listen port
-        def listenPort(usage):
-            port, ssl, wrapper = usage["port"], usage["ssl"], usage["wrapper"]
-            spl = SocketPortListener(port, ssl, wrapper)
-            spl.on("close"    , lambda args: spl in self.listeners and self.listeners.remove(spl))
-            spl.on("error"    , lambda args: print("Listen port error: "+str(args["exception"])))
-            spl.on("listen"   , lambda args: print(f"Server is now listening port {args['port']}"))
-            spl.on("connect"  , receiveSocket)
-            spl.listen()
-            self.listeners.add(spl)
+        # Graceful reload: listening sockets of old process are reused, no connexion is refused meanwhile
+        self.reloader   = Reloader(self.config.get("http.shutdown.readyTimeout", 10))
+        self._inherited = self.reloader.inherited()
+
+        # One wheel for timeouts of all connexions
+        self.timers     = TimerWheel(self.config.get("http.timeouts.resolution", 0.5))
+        self.timeouts   = {
+            "header"    : self.config.get("http.timeouts.header", 10),
+            "body"      : self.config.get("http.timeouts.body", 30),
+            "keepAlive" : self.protocol.KEEPALIVE_TIMEOUT,
+            "websocket" : self.config.get("http.timeouts.websocket", 300),
+            "writeStall": self.config.get("http.timeouts.writeStall", 30)
+        }
+        self.timers.start()
+
+        # Http/2 streams are translated to requests of protocol (version 2.0)
+        self.http2      = None
+        if self.config.get("http.http2.enabled", False) and "2.0" in self.config.get("http.versions", []):
+            self.http2  = {
+                "cleartext"             : self.config.get("http.http2.cleartext", True),
+                "maxConcurrentStreams"  : self.config.get("http.http2.maxConcurrentStreams", 100),
+                "initialWindowSize"     : self.config.get("http.http2.initialWindowSize", 65535),
+                "maxFrameSize"          : self.config.get("http.http2.maxFrameSize", 16384),
+                "headerTableSize"       : self.config.get("http.http2.headerTableSize", 4096),
+                "maxHeaderListSize"     : self.config.get("http.maxHeadersSize", 65536),
+                "maxRequestSize"        : self.protocol.MAX_REQUEST_SIZE
+            }
+
+        self._startEngine()
 
         # Read vhost port usage and start servers
-        for usage in self._vhost2portsusage(self.vhosts):
-            listenPort(usage)
+        usages = self._vhost2portsusage(self.vhosts)
+        self._sniSelectors = {usage["port"]: usage["sni"] for usage in usages if usage["sni"] != None}
+        for usage in usages:
+            self._listenPort(usage)
+        # Old process (graceful reload) stops only once every port is listened
+        if len(self._listenerFds())==len(usages):
+            self.reloader.ready()
+
+    """
+        Start io engine: "thread" (one thread by socket) or "selector" (one event loop for all sockets)
+        @returns None
+    """
+    def _startEngine(self):
+        if self.engine == "selector":
+            self.loop = EventLoop("ServerEventLoop")
+            self.loop.start()
+        elif self.engine != "thread":
+            raise Exception("Unknown http engine \""+str(self.engine)+"\"")
+
+    """
+        Listen data on connexion
+        @param   args   dict    Event "data" of connexion (socket, port, ssl, data)
+        @returns None
+    """
+    def _ondata(self, args: dict):
+        (request, response) = self.protocol.parse(args["socket"], args["port"], args["ssl"], args["data"])
+        if request != None and response!=None:
+
+            # Request is valid and not auto managed
+            socket = args["socket"]
+            with self._pendingLock:
+                socket.pending += 1
+            def onresponse(args):
+                response    = args["response"]
+                raw         = self.protocol.pack(response)
+                with self._pendingLock:
+                    socket.pending -= 1
+                if response.keepAlive:
+                    socket.write(raw)
+                    socket.finish()
+                else:
+                    socket.end(raw)
+
+            response.on("send", onresponse)
+            self.event.fire("request", {"request": request, "response": response})
+
+    """
+        Answer an http error to a request which can not be framed, and close
+        @param   args   dict    Event "invalid" of connexion (socket, port, ssl, code, exception)
+        @returns None
+    """
+    def _oninvalid(self, args: dict):
+        args["socket"].end(self.protocol.packError("1.1", args["code"]))
+
+    """
+        Http/2 settings of a new connexion: ALPN on ssl ports, prior knowledge (h2c) on plain ports if allowed
+        @param   ssl    bool    Connexion over ssl
+        @returns dict           None if http/2 is disabled
+    """
+    def _http2For(self, ssl: bool) -> dict:
+        if self.http2 == None or (not ssl and not self.http2["cleartext"]):
+            return None
+        return self.http2
+
+    """
+        Create framer of a new connexion
+        @returns HttpFramer
+    """
+    def _newFramer(self) -> HttpFramer:
+        return HttpFramer(self.protocol.MAX_REQUEST_SIZE, self.config.get("http.maxHeadersSize", 65536))
+
+    """
+        Listen connexion on port, on place reserved by admission of listener
+        @param   args   dict    Event "connect" of listener (socket, port, ssl, remote)
+        @returns None
+    """
+    def _receiveSocket(self, args: dict):
+        socket, port, ssl = args["socket"], args["port"], args["ssl"]
+        swp = SocketWrapper(socket, port, ssl, self.loop, self._newFramer())
+        if "wrapper" in args:
+            # PROXY protocol listener, socket is wrapped once header is read
+            swp.setproxy(args["wrapper"])
+            swp.on("proxy", self._onproxy)
+        swp.on("error"    , lambda args: print("Receive socket error: "+str(args["exception"])))
+        swp.on("close"    , lambda args: self.connections.remove(swp))
+        swp.on("handshake", self._onhandshake)
+        swp.on("data"     , self._ondata)
+        swp.on("invalid"  , self._oninvalid)
+        swp.sethttp2(self._http2For(ssl))
+        swp.settimeouts(self.timers, self.timeouts)
+        self.connections.add(swp)
+        swp.start()
+
+    """
+        Count connexion under real client ip of its PROXY protocol header, close it over limit by remote
+        @param   args   dict    Event "proxy" of connexion (socket, port, ssl, remote, local)
+        @returns None
+    """
+    def _onproxy(self, args: dict):
+        if not self.connections.readdress(args["socket"]):
+            args["socket"].close()
+
+    """
+        Count a tls handshake of a connexion
+        @param   args   dict    Event "handshake" of connexion (socket, port, ssl, duration, resumed, failed)
+        @returns None
+    """
+    def _onhandshake(self, args: dict):
+        self.connections.handshake(args["duration"], args["resumed"], args["failed"])
+
+    """
+        Listen port (or unix socket path)
+        @param   usage  dict    Port usage (port, ssl, wrapper)
+        @returns None
+    """
+    def _listenPort(self, usage: dict):
+        port, ssl, wrapper = usage["port"], usage["ssl"], usage["wrapper"]
+        spl = SocketPortListener(port, ssl, wrapper, self.loop, usage["reusePort"], usage["listen"])
+        spl.on("close"    , lambda args: spl in self.listeners and self.listeners.remove(spl))
+        spl.on("error"    , lambda args: print("Listen port error: "+str(args["exception"])))
+        spl.on("listen"   , lambda args: print(f"Server is now listening port {args['port']}"))
+        spl.on("connect"  , self._receiveSocket)
+        spl.admission(self.connections.admit, self.connections.release)
+        spl.listen(self._inherited.get(str(port), None))
+        self.listeners.add(spl)
 
     """
         Add event listener
@@ -83,47 +215,204 @@ class Server():
     def on(self, eventName: str, callback: Callable):
         self.event.on(eventName, callback)
 
+    """
+        Server counters: listeners, open connexions, timeouts wheel and certificates selection by port
+        @returns dict
+    """
+    def stats(self) -> dict:
+        return {
+            "listeners"     : self._listenerStats(),
+            "connections"   : self.connections.stats(),
+            "timers"        : self.timers.stats(),
+            "sni"           : {str(port): sni.stats() for port, sni in self._sniSelectors.items()}
+        }
+
+    """
+        Listeners counters (accept queue depth, accept rate)
+        @returns list
+    """
+    def _listenerStats(self) -> list:
+        return [listener.stats() for listener in self.listeners]
+
+    """
+        Graceful reload: start a new process (new code and config) on same listening sockets, then drain current one
+        @returns bool   False if new process failed (current one keeps serving)
+    """
+    def reload(self) -> bool:
+        if self.draining or not self.reloader.spawn(self._listenerFds()):
+            return False
+        self.drain(keepFiles=True)
+        return True
+
+    """
+        File descriptors of listening sockets, by port (str) or unix path
+        @returns dict
+    """
+    def _listenerFds(self) -> dict:
+        return {str(listener._port): listener.fileno() for listener in self.listeners if listener.fileno()>=0}
+
+    """
+        Graceful stop: stop accepting, let in-flight requests end (connexions close after their response),
+        say goodbye to websocket (close frame) and http/2 (GOAWAY) clients, then close what remains at deadline
+        @param   timeout    float   Seconds given to connexions ("http.shutdown.drainTimeout" if None)
+        @param   keepFiles  bool    Keep unix socket files (inherited by a new process)
+        @returns None
+    """
+    def drain(self, timeout: float = None, keepFiles: bool = False):
+        if self.draining:
+            return
+        self.draining           = True
+        self.protocol.draining  = True
+        timeout  = self.config.get("http.shutdown.drainTimeout", 30) if timeout == None else timeout
+        deadline = time.monotonic()+timeout
+        self._closeListeners(keepFiles)
+        notified = set()
+        while len(self.connections)>0 and time.monotonic()<deadline:
+            for connexion in self.connections:
+                self._drainConnection(connexion, notified)
+            time.sleep(0.1)
+        if len(self.connections)>0:
+            print(f"Drain timeout, {len(self.connections)} connexions closed")
+        self.close()
+
+    """
+        Close a connexion as soon as it has nothing in flight
+        @param   connexion  SocketWrapper   Open connexion (or AsyncioConnection)
+        @param   notified   set             Connexions already told that server stops
+        @returns None
+    """
+    def _drainConnection(self, connexion, notified: set):
+        state = connexion.state
+        if state=="idle":
+            connexion.close()
+        elif state=="websocket" and not connexion in notified:
+            notified.add(connexion)
+            connexion.end(self.protocol.websocketClose(1001))
+        elif state=="http2":
+            # GOAWAY refuses new streams, connexion ends with its last stream
+            if len(connexion.http2.streams)==0:
+                connexion.end(b'' if connexion in notified else connexion.http2.goaway())
+            elif not connexion in notified:
+                notified.add(connexion)
+                connexion.write(connexion.http2.goaway())
+
+    """
+        Stop listening
+        @param   keepFiles  bool    Keep unix socket files (inherited by a new process)
+        @returns None
+    """
+    def _closeListeners(self, keepFiles: bool = False):
+        for listener in list(self.listeners):
+            listener.close(keepFiles)
+        self.listeners  = set()
+
+    """
+        Close listeners and connexions, stop io engine
+        @returns None
+    """
+    def close(self):
+        for connexion in self.connections:
+            connexion.close()
+        self._closeListeners()
+        if self.loop != None:
+            self.loop.stop()
+        self.timers.stop()
+
     """
         Destructor, cleans up
         @returns None
     """
     def __del__(self):
-        for socket in self.sockets:
-            sockets.close()
-        self.sockets    = set()
-        for listener in self.listeners:
-            listener.close()
-        self.listeners  = set()
+        self.close()
 
     """
-        Convert vhost config to portUsage config
+        Convert vhost config to portUsage config, a port is listened once (first vhost gives its options)
+        A vhost listens its "port" and/or its "unix" socket path, a unix listener is identified by its path
         @param   vhosts list    List of vhosts given by configuration
-        @returns None
+        @returns list
     """
-    def _vhost2portsusage(self, vhosts: list):
-        ports = []
-        for vhost in vhosts:
+    def _vhost2portsusage(self, vhosts: list) -> list:
+        ports = {}
+        # Prefork workers listen same ports
+        reusePort = self.config.get("http.prefork.enabled", False)
+        listen    = self.config.get("http.listen", {})
+        for vhost, port in [(vhost, port) for vhost in vhosts for port in self.protocol.vhostPorts(vhost)]:
+
+            ssl = False
+            context = None
+            certfilepath = None
+            keyfilepath  = None
+            if "ssl" in vhost and vhost["ssl"]!=None:
+                if not "certfile" in vhost["ssl"]:
+                    raise Exception("Sll config requires \"certfile\" attribute")
+
+                certfilepath = os.path.abspath(vhost["ssl"]["certfile"])
+                if not os.path.isfile(certfilepath):
+                    raise Exception("Sll \"certfile\" not found at \""+vhost["ssl"]["certfile"]+"\"")
 
-            if "port" in vhost and not vhost["port"] in ports:
-                wrapper = lambda sock: sock
-                ssl = False
-                if "ssl" in vhost and vhost["ssl"]!=None:
-                    if not "certfile" in vhost["ssl"]:
-                        raise Exception("Sll config requires \"certfile\" attribute")
+                if not "keyfile" in vhost["ssl"]:
+                    raise Exception("Sll config requires \"keyfile\" attribute")
 
-                    certfilepath = os.path.abspath(vhost["ssl"]["certfile"])
-                    if not os.path.isfile(certfilepath):
-                        raise Exception("Sll \"certfile\" not found at \""+vhost["ssl"]["certfile"]+"\"")
+                keyfilepath = os.path.abspath(vhost["ssl"]["keyfile"])
+                if not os.path.isfile(keyfilepath):
+                    raise Exception("Sll \"keyfile\" not found at \""+vhost["ssl"]["keyfile"]+"\"")
 
-                    if not "keyfile" in vhost["ssl"]:
-                        raise Exception("Sll config requires \"keyfile\" attribute")
+                ssl = True
+                context = self._sslContext(certfilepath, keyfilepath)
 
-                    keyfilepath = os.path.abspath(vhost["ssl"]["keyfile"])
-                    if not os.path.isfile(keyfilepath):
-                        raise Exception("Sll \"keyfile\" not found at \""+vhost["ssl"]["keyfile"]+"\"")
+            if port in ports:
+                # Other vhosts of port add their certificate, selected by server name
+                if ports[port]["ssl"] != ssl:
+                    raise Exception("Port "+str(port)+" mixes ssl and plain vhosts")
+                if ssl:
+                    ports[port]["sni"].add([self.protocol.hostPattern(hostrule) for hostrule in vhost.get("hosts", [])], context)
+                continue
 
-                    ssl = True
+            sni = None
+            if ssl:
+                sni = SniSelector(context, self.config.get("http.tls.sniCache", 4096))
+                sni.add([self.protocol.hostPattern(hostrule) for hostrule in vhost.get("hosts", [])], context)
+            ports[port] = {"port": port, "ssl": ssl, "context": context, "sni": sni, "certfile": certfilepath, "keyfile": keyfilepath, "reusePort": reusePort, "listen": {**listen, **vhost.get("listen", {})} }
 
-                    wrapper = lambda sock: libssl.wrap_socket(sock, server_side=True, certfile=certfilepath, keyfile=keyfilepath)
-                ports.append({"port": int(vhost["port"]), "ssl": ssl, "wrapper": wrapper })
-        return ports
+        for usage in ports.values():
+            usage["wrapper"] = lambda sock: sock
+            if usage["ssl"]:
+                if len(usage["sni"])>1:
+                    # Own front context of port (default certificate), switching connexions to certificate of their server name
+                    usage["context"] = self._newSslContext(usage["certfile"], usage["keyfile"])
+                    usage["context"].sni_callback = usage["sni"].callback
+                # Handshake is run later by connexion, on its own io path
+                usage["wrapper"] = lambda sock, context=usage["context"]: context.wrap_socket(sock, server_side=True, do_handshake_on_connect=False)
+        return list(ports.values())
+
+    """
+        Ssl context of a certificate, created once at startup (certificate loaded once, sessions cache shared by its connexions)
+        @param   certfile   str     Absolute path of certificate
+        @param   keyfile    str     Absolute path of private key
+        @returns ssl.SSLContext
+    """
+    def _sslContext(self, certfile: str, keyfile: str) -> libssl.SSLContext:
+        key = (certfile, keyfile)
+        if not key in self._sslContexts:
+            self._sslContexts[key] = self._newSslContext(certfile, keyfile)
+        return self._sslContexts[key]
+
+    """
+        Create a server ssl context
+        @param   certfile   str     Absolute path of certificate
+        @param   keyfile    str     Absolute path of private key
+        @returns ssl.SSLContext
+    """
+    def _newSslContext(self, certfile: str, keyfile: str) -> libssl.SSLContext:
+        context = libssl.SSLContext(libssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile=certfile, keyfile=keyfile)
+        # Resumption: session tickets (tls 1.3 and 1.2), else server session cache (tls 1.2 session ids)
+        tickets = int(self.config.get("http.tls.tickets", 2))
+        if tickets>0:
+            context.num_tickets = tickets
+        else:
+            context.options |= libssl.OP_NO_TICKET
+            context.num_tickets = 0
+        if self.http2 != None:
+            context.set_alpn_protocols(["h2", "http/1.1"])
+        return context
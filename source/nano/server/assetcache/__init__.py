@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict
+
+import os
+import threading
+import time
+
+"""
+    Class for in-memory static assets of a vhost (body, response headers, stat), LRU evicted over a byte budget
+"""
+class AssetCache():
+
+    """
+        Constructor
+        @param   budget         int     Max bytes of cached bodies
+        @param   maxFileSize    int     Bigger files are never cached
+        @param   revalidate     float   Seconds before an asset is checked again on disk (0 to check on each hit)
+        @returns None
+    """
+    def __init__(self, budget: int, maxFileSize: int, revalidate: float):
+        self.budget         = int(budget)
+        self.maxFileSize    = min(int(maxFileSize), self.budget)
+        self.revalidate     = float(revalidate)
+        self.used           = 0
+        self.hits           = 0
+        self.misses         = 0
+        self.evictions      = 0
+        self._assets        = OrderedDict()
+        self._lock          = threading.Lock()
+
+    """
+        Cached asset, checked against disk once revalidate interval is over
+        @param   path   str     Absolute path of file
+        @returns dict           Asset (path, body, headers, mtime, size), None if not cached or changed
+    """
+    def get(self, path: str) -> dict:
+        with self._lock:
+            asset = self._assets.get(path, None)
+            if asset == None:
+                self.misses += 1
+                return None
+            self._assets.move_to_end(path)
+            now = time.monotonic()
+            if now-asset["checked"]<self.revalidate:
+                self.hits += 1
+                return asset
+
+        # Revalidate out of lock, stat may be slow
+        try:
+            stat = os.stat(path)
+            changed = stat.st_mtime!=asset["mtime"] or stat.st_size!=asset["size"]
+        except OSError:
+            changed = True
+        with self._lock:
+            if changed:
+                # A newer asset may have been put meanwhile, only this one is stale
+                if self._assets.get(path, None) is asset:
+                    self._remove(path)
+                self.misses += 1
+                return None
+            asset["checked"] = now
+            self.hits += 1
+        return asset
+
+    """
+        Cache an asset, evict least recently used ones over budget
+        @param   path       str     Absolute path of file
+        @param   body       bytes   File content
+        @param   headers    dict    Precomputed response headers (camelcase)
+        @param   stat       os.stat_result  Stat of file when read
+        @param   gzip       bytes   Precompressed body (gzip sibling of file), None if none
+        @returns dict               Asset (path, body, gzip, headers, mtime, size), cached or not
+    """
+    def put(self, path: str, body: bytes, headers: dict, stat: os.stat_result, gzip: bytes = None) -> dict:
+        asset = {
+            "path"      : path,
+            "body"      : body,
+            "gzip"      : gzip,
+            "headers"   : headers,
+            "mtime"     : stat.st_mtime,
+            "size"      : stat.st_size,
+            "checked"   : time.monotonic()
+        }
+        if len(body)>self.maxFileSize:
+            return asset
+        with self._lock:
+            self._remove(path)
+            self._assets[path] = asset
+            self.used += self._weight(asset)
+            while self.used>self.budget:
+                oldest = next(iter(self._assets))
+                self._remove(oldest)
+                self.evictions += 1
+        return asset
+
+    """
+        Can a file of this size still be cached without evicting (warm loading)
+        @param   size   int     File size
+        @returns bool
+    """
+    def fits(self, size: int) -> bool:
+        return size<=self.maxFileSize and self.used+size<=self.budget
+
+    """
+        Forget an asset (under lock)
+        @param   path   str     Absolute path of file
+        @returns None
+    """
+    def _remove(self, path: str):
+        asset = self._assets.pop(path, None)
+        if asset != None:
+            self.used -= self._weight(asset)
+
+    """
+        Bytes held by an asset
+        @param   asset  dict
+        @returns int
+    """
+    def _weight(self, asset: dict) -> int:
+        return len(asset["body"])+len(asset["gzip"] or b'')
+
+    """
+        Cache counters
+        @returns dict
+    """
+    def stats(self) -> dict:
+        return {
+            "assets"    : len(self._assets),
+            "used"      : self.used,
+            "budget"    : self.budget,
+            "hits"      : self.hits,
+            "misses"    : self.misses,
+            "evictions" : self.evictions
+        }
@@ -0,0 +1,672 @@
+#!/usr/bin/env python3
+
+from nano.server                    import Server
+from nano.server.httpframer         import HttpFramer, FramingError
+from nano.server.http2session       import Http2Session
+from nano.server.proxyprotocol      import ProxyProtocol, ProxyProtocolError
+from nano.server.socketportlistener import SocketPortListener
+from nano.server.responsesequencer  import ResponseSequencer
+from nano.server.timerwheel         import TimerWheel
+from nano.event                     import Event
+
+from collections.abc import Callable
+import asyncio
+import socket
+import threading
+import time
+
+"""
+    Class for call scheduling on asyncio loop, same api than nano.server.eventloop.EventLoop
+"""
+class AsyncioLoop():
+
+    """
+        Constructor
+        @param   loop   asyncio.AbstractEventLoop   Wrapped asyncio loop
+        @returns None
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop      = loop
+        self._thread    = None
+
+    """
+        Is current thread the loop thread
+        @returns bool
+    """
+    def inLoop(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    """
+        Run a callback on loop thread, as soon as possible (thread safe)
+        @param   callback   Callable    Callback without arguments
+        @returns None
+    """
+    def callSoon(self, callback: Callable):
+        self._loop.call_soon_threadsafe(callback)
+
+    """
+        Run a callback on loop thread after a delay (thread safe)
+        @param   delay      float       Delay in seconds
+        @param   callback   Callable    Callback without arguments
+        @returns None
+    """
+    def callLater(self, delay: float, callback: Callable):
+        self._loop.call_soon_threadsafe(self._loop.call_later, delay, callback)
+
+    """
+        Routine of loop thread
+        @returns None
+    """
+    def run(self):
+        self._thread = threading.current_thread()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+"""
+    Class for asyncio transport, same api than nano.server.socketwrapper.SocketWrapper
+"""
+class AsyncioConnection(asyncio.Protocol):
+
+    instances = 0
+
+    # Bytes of a loop.sendfile call, stalled downloads are seen between slices
+    SENDFILE_SLICE = 262144
+
+    """
+        Constructor
+        @param port     int            Listened port
+        @param ssl      bool           if protocol over ssl
+        @param loop     AsyncioLoop    Loop running transport
+        @param framer   HttpFramer     Framer cutting received data into requests
+        @returns None
+    """
+    def __init__(self, port: int, ssl: bool, loop: AsyncioLoop, framer: HttpFramer):
+        type(self).instances = (type(self).instances + 1) % 65535
+        self._name      = "AsyncioConnection#"+str(type(self).instances)
+        self._transport = None
+        self._local     = None
+        self._remote    = None
+        self._port      = port
+        self._ssl       = ssl
+        self._event     = Event()
+        self._framer    = framer
+        self._sequencer = ResponseSequencer(self)
+        self._paused    = False
+        self._ondrain   = []
+        self._active    = time.monotonic()
+        self._opened    = self._active      # Protocol is created on accept, before tls handshake
+        self._requestStart = self._active   # First byte of current request (or connexion start)
+        self._progress  = self._active      # Last seen change of transport write buffer
+        self._buffered  = 0
+        self._sending   = None      # Task of running loop.sendfile slice
+        self._timers    = None
+        self._timer     = None
+        self._http2Settings = None  # Http/2 allowed on connexion (ALPN "h2" or prior knowledge)
+        self._proxy     = None      # PROXY protocol header read before transport
+        self.http2      = None      # Http2Session once connexion speaks http/2
+        self.loop       = loop
+        self.closed     = False
+        self.requests   = 0         # Requests received on connexion
+        self.pending    = 0         # Requests waiting for their response
+        self.timeouts   = {}
+        self.terminator = b'\r\n\r\n'
+
+    """
+        Host and port of a socket address, unix sockets give (path, 0) and unnamed peers ("unix", 0)
+        @param   address    tuple|str   Address from transport extra info
+        @returns tuple
+    """
+    def _address(self, address) -> tuple:
+        if isinstance(address, tuple):
+            return address[0:2]
+        return (address or "unix", 0)
+
+    """
+        Give PROXY protocol header read before transport, connexion takes real client and destination addresses
+        @param   proxy      ProxyProtocol   Complete header
+        @returns None
+    """
+    def setproxy(self, proxy: ProxyProtocol):
+        self._proxy = proxy
+
+    """
+        Hash, for makes object hashable
+        @returns None
+    """
+    def __hash__(self):
+        return hash(self._name)
+
+    """
+        Eq, for makes object hashable
+        @returns None
+    """
+    def __eq__(self, other):
+        return self._name==other._name
+
+    """
+        asyncio.Protocol: connexion ready
+        @param   transport  asyncio.Transport   Connexion transport
+        @returns None
+    """
+    def connection_made(self, transport: asyncio.Transport):
+        self._transport = transport
+        self._local     = self._address(transport.get_extra_info("sockname"))
+        self._remote    = self._address(transport.get_extra_info("peername"))
+        if self._proxy != None and self._proxy.remote != None:
+            self._remote, self._local = self._proxy.remote, self._proxy.local
+        # Small write buffer, downloads must follow client speed
+        transport.set_write_buffer_limits(high=262144)
+        sslobj = transport.get_extra_info("ssl_object")
+        if sslobj != None:
+            # Handshake is done by transport (failed ones never reach protocol)
+            self._event.fire("handshake", { "socket": self, "port": self._port, "ssl": self._ssl, "duration": time.monotonic()-self._opened, "resumed": sslobj.session_reused, "failed": False })
+        # Handlers may refuse connexion (limits), closing it
+        self._event.fire("connect", { "socket": self, "port": self._port, "ssl": self._ssl })
+        if not self.closed and sslobj != None and self._http2Settings != None and sslobj.selected_alpn_protocol()=="h2":
+            self._startHttp2()
+        self._checkTimeouts()
+
+    """
+        asyncio.Protocol: data received
+        @param   data   bytes   Received data
+        @returns None
+    """
+    def data_received(self, data: bytes):
+        self._active = time.monotonic()
+        if self.http2 == None and self._http2Settings != None and self.requests==0 and self._framer.pending()==0 and data[0:4]==b'PRI ':
+            # Http/2 with prior knowledge (h2c), starts with client connexion preface
+            self._startHttp2()
+        if self.http2 != None:
+            self.http2.feed(data)
+            return
+        if self._framer.pending()==0:
+            self._requestStart = self._active
+        self._framer.feed(data)
+        try:
+            while not self.closed:
+                # Protocol may switch to websocket while handling a frame
+                self._framer.websocket = self.terminator==None
+                frame = self._framer.next()
+                if frame == None:
+                    break
+                # Http responses are written in requests order, websocket frames are not sequenced
+                conn = self if self.terminator==None else self._sequencer.slot()
+                self._event.fire("data", { "socket": conn, "port": self._port, "ssl": self._ssl, "data": frame })
+                try:
+                    frame.release()
+                except BufferError:
+                    pass
+        except FramingError as e:
+            self._event.fire("invalid", { "socket": self._sequencer.slot(), "port": self._port, "ssl": self._ssl, "code": e.code, "exception": e })
+            return
+        self._framer.compact()
+
+    """
+        Allow http/2 on connexion, negotiated by ALPN or with prior knowledge
+        @param   settings   dict    Http2Session settings, None to disable
+        @returns None
+    """
+    def sethttp2(self, settings: dict):
+        self._http2Settings = settings
+
+    """
+        Switch connexion to http/2, requests are then fired by session on its streams
+        @returns None
+    """
+    def _startHttp2(self):
+        self.http2 = Http2Session(self, self._http2Settings, self._event.fire)
+        self.http2.start()
+
+    """
+        asyncio.Protocol: connexion lost
+        @param   exc    Exception   Error, or None on regular close
+        @returns None
+    """
+    def connection_lost(self, exc: Exception):
+        if exc != None:
+            self._event.fire("error", { "socket": self, "port": self._port, "ssl": self._ssl, "exception": exc })
+        self._ondrain = []
+        self._markClosed()
+
+    """
+        asyncio.Protocol: transport buffer is over high-water mark
+        @returns None
+    """
+    def pause_writing(self):
+        self._paused = True
+
+    """
+        asyncio.Protocol: transport buffer is under low-water mark
+        @returns None
+    """
+    def resume_writing(self):
+        self._paused   = False
+        self._progress = time.monotonic()
+        callbacks, self._ondrain = self._ondrain, []
+        for callback in callbacks:
+            callback()
+
+    """
+        Call back once transport accepts more data
+        @param   callback   Callable    Callback without arguments
+        @returns None
+    """
+    def drain(self, callback: Callable):
+        if not self.loop.inLoop():
+            self.loop.callSoon(lambda: self.drain(callback))
+            return
+        if self._paused:
+            self._ondrain.append(callback)
+        else:
+            self.loop.callSoon(callback)
+
+    """
+        Force socket to keepalive
+        @param   value  bool  Enable keepalive
+        @returns None
+    """
+    def setkeepalive(self, value):
+        sock = self._transport.get_extra_info("socket")
+        if sock != None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, value and 1 or 0)
+
+    """
+        Connexion state, for registry stats
+        @returns str    "handshake" (proxy header), "http2", "websocket", "writing" (response running or buffered), "reading" (request incomplete) or "idle"
+    """
+    @property
+    def state(self) -> str:
+        if self.http2 != None:
+            return "http2"
+        if self.terminator == None:
+            return "websocket"
+        if self._sending != None or self.pending>0 or (self._transport != None and self._transport.get_write_buffer_size()>0):
+            return "writing"
+        if self._framer.state()!="idle":
+            return "reading"
+        return "idle"
+
+    """
+        Close connexion on timeouts, checked from a timer wheel
+        @param   timers     TimerWheel  Wheel shared by connexions
+        @param   timeouts   dict        Seconds (0 to disable) of "header", "body", "keepAlive", "websocket" and "writeStall"
+        @returns None
+    """
+    def settimeouts(self, timers: TimerWheel, timeouts: dict):
+        self._timers    = timers
+        self.timeouts   = timeouts
+        if self._transport != None:
+            self.loop.callSoon(self._checkTimeouts)
+
+    """
+        Timer of connexion expired (wheel thread), check it on loop thread
+        @returns None
+    """
+    def _ontimer(self):
+        self.loop.callSoon(self._checkTimeouts)
+
+    """
+        Close connexion if its current deadline is over, else check again at deadline
+        @returns None
+    """
+    def _checkTimeouts(self):
+        if self.closed or self._timers == None or self._transport == None:
+            return
+        now      = time.monotonic()
+        deadline = self._deadline(now)
+        if deadline != None and now>=deadline:
+            if self.http2 != None:
+                self.end(self.http2.goaway())
+                return
+            self.close()
+            return
+        # Deadline may come earlier on state change (response sent, keep alive), checked at least each shortest timeout
+        delays = [timeout for timeout in self.timeouts.values() if timeout>0]
+        if deadline != None:
+            delays.append(deadline-now)
+        if len(delays)>0:
+            self._timer = self._timers.schedule(min(delays), self._ontimer)
+
+    """
+        Deadline of connexion from its state
+        @param   now    float   Monotonic time of check
+        @returns float          Monotonic time, None if not limited now
+    """
+    def _deadline(self, now: float) -> float:
+        if self._sending != None:
+            return self._limit(self._progress, "writeStall")
+        buffered = self._transport.get_write_buffer_size()
+        if buffered != self._buffered:
+            # Output moved since last check
+            self._buffered, self._progress = buffered, now
+        if buffered>0:
+            return self._limit(self._progress, "writeStall")
+        if self.terminator == None:
+            return self._limit(self._active, "websocket")
+        if self.pending>0:
+            return None
+        if self.http2 != None:
+            # Open streams wait for their request body or for window updates
+            return self._limit(self._active, "body" if len(self.http2.streams)>0 else "keepAlive")
+        state = self._framer.state()
+        if state=="headers" or (state=="idle" and self.requests==0):
+            # Not refreshed by received data, slow headers are closed in time
+            return self._limit(self._requestStart, "header")
+        if state=="body":
+            return self._limit(self._active, "body")
+        return self._limit(self._active, "keepAlive")
+
+    """
+        Deadline from a start time and a timeout name
+        @param   start  float   Monotonic time
+        @param   name   str     Timeout name
+        @returns float          None if timeout is disabled
+    """
+    def _limit(self, start: float, name: str) -> float:
+        timeout = self.timeouts.get(name, 0)
+        if timeout>0:
+            return start+timeout
+        return None
+
+    """
+        Write data on transport
+        @param   bytes   data
+        @returns None
+    """
+    def write(self, data: bytes):
+        if self.closed:
+            return
+        self._active = time.monotonic()
+        if self.loop.inLoop():
+            self._transport.write(data)
+        else:
+            # Queued before any close() call, so it runs before transport close
+            self.loop.callSoon(lambda: self._transport.is_closing() or self._transport.write(data))
+
+    """
+        Response is complete (connexion stays open), for api compatibility with ResponseSlot
+        @returns None
+    """
+    def finish(self):
+        pass
+
+    """
+        Run a streaming response (file download) now, for api compatibility with ResponseSlot
+        @param   callback   Callable    Starts stream, without arguments
+        @returns None
+    """
+    def stream(self, callback: Callable):
+        callback()
+
+    """
+        Run a callback on loop thread, now if caller is already on it
+        @param   callback   Callable    Callback without arguments
+        @returns None
+    """
+    def handoff(self, callback: Callable):
+        if self.loop.inLoop():
+            callback()
+        else:
+            self.loop.callSoon(callback)
+
+    """
+        Send a file segment after written data, with loop.sendfile (zero-copy for plain transports)
+        @param   file       file        File opened in binary mode
+        @param   offset     int         First byte
+        @param   count      int         Bytes to send
+        @param   callback   Callable    Called once segment is sent
+        @returns None
+    """
+    def sendfile(self, file, offset: int, count: int, callback: Callable):
+        if self.closed:
+            return
+        self._active = time.monotonic()
+        size = min(count, self.SENDFILE_SLICE)
+        def done(task: asyncio.Task):
+            self._sending = None
+            failed = task.cancelled() or task.exception() != None
+            if failed or self.closed:
+                self._markClosed()
+                self._transport.close()
+            elif count>size:
+                self.sendfile(file, offset+size, count-size, callback)
+            else:
+                callback()
+        def run():
+            if self._transport.is_closing():
+                return
+            # Each slice is a progress for write stall timeout
+            self._progress  = time.monotonic()
+            self._sending   = self.loop._loop.create_task(self.loop._loop.sendfile(self._transport, file, offset, size))
+            self._sending.add_done_callback(done)
+        if self.loop.inLoop():
+            run()
+        else:
+            self.loop.callSoon(run)
+
+    """
+        Write data on transport and close
+        @param   bytes   data
+        @returns None
+    """
+    def end(self, data: bytes):
+        if self.closed:
+            return
+        self.write(data)
+        self.close()
+
+    """
+        Close transport, once buffered data are sent
+        @returns None
+    """
+    def close(self):
+        if self.closed:
+            return
+        self._markClosed()
+        if self._sending != None:
+            # Transport can not be closed during sendfile, it is once slice is cancelled
+            self.loop.callSoon(self._sending.cancel)
+        elif self.loop.inLoop():
+            self._transport.close()
+        else:
+            self.loop.callSoon(self._transport.close)
+
+    """
+        Mark connexion closed and fire event once
+        @returns None
+    """
+    def _markClosed(self):
+        if not self.closed:
+            self.closed = True
+            if self._timer != None:
+                self._timer.cancel()
+            self._event.fire("close", { "socket": self, "port": self._port, "ssl": self._ssl})
+
+    """
+        Add event handler
+        @returns None
+    """
+    def on(self, eventName: str, callback: Callable):
+        self._event.on(eventName, callback)
+
+"""
+    Class for http servers running on asyncio (transports for http and websocket)
+"""
+class AsyncioServer(Server):
+
+    """
+        Start asyncio loop on its own thread
+        @returns None
+    """
+    def _startEngine(self):
+        self.loop   = AsyncioLoop(asyncio.new_event_loop())
+        self._thread= threading.Thread(target=self.loop.run, name="ServerAsyncioLoop")
+        self._thread.start()
+
+    """
+        Listen port with loop.create_server (loop.create_unix_server for a unix socket path)
+        With PROXY protocol, connexions are accepted by a listener and given to loop once header is read
+        @param   usage  dict    Port usage (port, ssl, context)
+        @returns None
+    """
+    def _listenPort(self, usage: dict):
+        port, ssl, context = usage["port"], usage["ssl"], usage["context"]
+        # Slow handshakes are closed by transport, as slow headers
+        handshakeTimeout = self.timeouts["header"] if ssl and self.timeouts["header"]>0 else None
+
+        def factory():
+            connexion = AsyncioConnection(port, ssl, self.loop, self._newFramer())
+            connexion.on("error"  , lambda args: print("Receive socket error: "+str(args["exception"])))
+            connexion.on("connect", self._admitConnection)
+            connexion.on("close"  , lambda args: self.connections.remove(connexion))
+            connexion.on("handshake", self._onhandshake)
+            connexion.on("data"   , self._ondata)
+            connexion.on("invalid", self._oninvalid)
+            connexion.sethttp2(self._http2For(ssl))
+            connexion.settimeouts(self.timers, self.timeouts)
+            return connexion
+
+        if usage["listen"].get("proxyProtocol", False):
+            # Header comes before tls data, transport is created once it is read
+            spl = SocketPortListener(port, ssl, lambda sock: sock, None, usage["reusePort"], usage["listen"])
+            spl.on("close"    , lambda args: spl in self.listeners and self.listeners.remove(spl))
+            spl.on("error"    , lambda args: print("Listen port error: "+str(args["exception"])))
+            spl.on("listen"   , lambda args: print(f"Server is now listening port {args['port']}"))
+            spl.on("connect"  , lambda args: self.loop.callSoon(lambda: self._readProxy(args["socket"], args["remote"], port, factory, context, handshakeTimeout)))
+            spl.admission(self.connections.admit, self.connections.release)
+            spl.listen(self._inherited.get(str(port), None))
+            self.listeners.add(spl)
+            return
+
+        backlog = int(usage["listen"].get("backlog", 1024))
+        fileno  = self._inherited.get(str(port), None)
+        if fileno != None:
+            # Listening socket of old process (graceful reload)
+            sock = socket.socket(fileno=fileno)
+            if isinstance(port, str):
+                server = self.loop._loop.create_unix_server(factory, sock=sock, ssl=context, ssl_handshake_timeout=handshakeTimeout, backlog=backlog)
+            else:
+                server = self.loop._loop.create_server(factory, sock=sock, ssl=context, ssl_handshake_timeout=handshakeTimeout, backlog=backlog)
+        elif isinstance(port, str):
+            server = self.loop._loop.create_unix_server(factory, path=port, ssl=context, ssl_handshake_timeout=handshakeTimeout, backlog=backlog)
+        else:
+            server = self.loop._loop.create_server(factory, host="0.0.0.0", port=port, ssl=context, ssl_handshake_timeout=handshakeTimeout, reuse_address=True, reuse_port=usage["reusePort"], backlog=backlog)
+        future = asyncio.run_coroutine_threadsafe(server, self.loop._loop)
+        try:
+            self.listeners.add(future.result())
+            print(f"Server is now listening port {port}")
+        except Exception as e:
+            print("Listen port error: "+str(e))
+
+    """
+        Read PROXY protocol header of an accepted socket (loop thread), then start its transport
+        Place reserved by admission of listener is given back once header is read, connexion is admitted under real client ip
+        @param   sock               socket.socket   Accepted socket
+        @param   remote             str             Remote ip of socket (admission key)
+        @param   port               int             Listened port
+        @param   factory            Callable        Connexion factory of listened port
+        @param   context            ssl.SSLContext  Ssl context of port, None for plain port
+        @param   handshakeTimeout   float           Tls handshake timeout
+        @returns None
+    """
+    def _readProxy(self, sock, remote: str, port: int, factory: Callable, context, handshakeTimeout: float):
+        loop  = self.loop._loop
+        proxy = ProxyProtocol()
+        timer = None
+
+        def stop():
+            loop.remove_reader(sock.fileno())
+            if timer != None:
+                timer.cancel()
+            self.connections.release(remote, port)
+
+        def onreadable():
+            try:
+                if not proxy.read(sock):
+                    return
+            except (BlockingIOError, InterruptedError):
+                return
+            except (ProxyProtocolError, OSError) as e:
+                if not isinstance(e, ConnectionResetError):
+                    print("Receive socket error: "+str(e))
+                stop()
+                sock.close()
+                return
+            stop()
+            connexion = factory()
+            connexion.setproxy(proxy)
+            task = loop.create_task(loop.connect_accepted_socket(lambda: connexion, sock, ssl=context, ssl_handshake_timeout=handshakeTimeout))
+            # Failed handshakes close socket, as on create_server
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+        def ontimeout():
+            # Slow headers are closed as slow requests headers
+            stop()
+            sock.close()
+
+        sock.setblocking(False)
+        loop.add_reader(sock.fileno(), onreadable)
+        if self.timeouts["header"]>0:
+            timer = loop.call_later(self.timeouts["header"], ontimeout)
+
+    """
+        Register a new connexion, or close it over connexions limits (asyncio has no accept hook, checked once connected)
+        @param   args   dict    Event "connect" of connexion (socket, port, ssl)
+        @returns None
+    """
+    def _admitConnection(self, args: dict):
+        connexion = args["socket"]
+        if not self.connections.admit(connexion._remote[0], connexion._port, connexion):
+            connexion.close()
+
+    """
+        Listeners counters (asyncio servers do not expose accept counters, PROXY protocol listeners do)
+        @returns list
+    """
+    def _listenerStats(self) -> list:
+        stats = []
+        for listener in self.listeners:
+            if isinstance(listener, SocketPortListener):
+                stats.append(listener.stats())
+            else:
+                stats += [{"port": sock.getsockname() if sock.family==socket.AF_UNIX else sock.getsockname()[1]} for sock in listener.sockets]
+        return stats
+
+    """
+        File descriptors of listening sockets, by port (str) or unix path
+        @returns dict
+    """
+    def _listenerFds(self) -> dict:
+        fds = {}
+        for listener in self.listeners:
+            if isinstance(listener, SocketPortListener):
+                if listener.fileno()>=0:
+                    fds[str(listener._port)] = listener.fileno()
+                continue
+            for sock in listener.sockets:
+                fds[sock.getsockname() if sock.family==socket.AF_UNIX else str(sock.getsockname()[1])] = sock.fileno()
+        return fds
+
+    """
+        Stop listening (asyncio servers are closed on loop, unix socket files are kept as by asyncio)
+        @param   keepFiles  bool    Keep unix socket files (inherited by a new process)
+        @returns None
+    """
+    def _closeListeners(self, keepFiles: bool = False):
+        for listener in list(self.listeners):
+            if isinstance(listener, SocketPortListener):
+                listener.close(keepFiles)
+            else:
+                self.loop.callSoon(listener.close)
+        self.listeners = set()
+
+    """
+        Close listeners and connexions, stop asyncio loop
+        @returns None
+    """
+    def close(self):
+        for connexion in self.connections:
+            connexion.close()
+        self._closeListeners()
+        self.loop.callSoon(self.loop._loop.stop)
+        self.timers.stop()
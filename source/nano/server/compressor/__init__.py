@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict
+
+import threading
+import zlib
+
+"""
+    Class for http content encoding (gzip, deflate) with a cache of compressed variants
+"""
+class Compressor():
+
+    # zlib window bits by content coding
+    WBITS = {
+        "gzip"      : 31,
+        "deflate"   : 15
+    }
+
+    """
+        Constructor
+        @param   level          int     zlib compression level (1 to 9)
+        @param   minSize        int     Smaller bodies are sent as is
+        @param   mimes          list    Compressible content types
+        @param   cacheBudget    int     Max bytes of cached compressed variants (0 for no cache)
+        @returns None
+    """
+    def __init__(self, level: int, minSize: int, mimes: list, cacheBudget: int):
+        self.level          = int(level)
+        self.minSize        = int(minSize)
+        self.mimes          = set(mimes)
+        self.cacheBudget    = int(cacheBudget)
+        self.used           = 0
+        self.hits           = 0
+        self.misses         = 0
+        self._variants      = OrderedDict()
+        self._lock          = threading.Lock()
+
+    """
+        Choose content coding from Accept-Encoding (gzip preferred, q=0 refuses)
+        @param   acceptEncoding str     Accept-Encoding header value
+        @returns str                    "gzip", "deflate" or None for identity
+    """
+    def negotiate(self, acceptEncoding: str) -> str:
+        if not acceptEncoding:
+            return None
+        accepted = {}
+        for item in acceptEncoding.lower().split(","):
+            parts   = item.strip().split(";")
+            quality = 1.0
+            for param in parts[1:]:
+                param = param.strip()
+                if param[0:2]=="q=":
+                    try:
+                        quality = float(param[2:])
+                    except ValueError:
+                        quality = 0.0
+            accepted[parts[0].strip()] = quality
+        best = None
+        for encoding in self.WBITS:
+            quality = accepted.get(encoding, accepted.get("*", 0.0))
+            if quality>0 and (best == None or quality>accepted.get(best, accepted.get("*", 0.0))):
+                best = encoding
+        return best
+
+    """
+        Is a body of this type and size worth compressing
+        @param   contentType    str     Content-Type header value
+        @param   size           int     Body size
+        @returns bool
+    """
+    def compressible(self, contentType: str, size: int) -> bool:
+        return size>=self.minSize and self.isCompressibleType(contentType)
+
+    """
+        Is content type in compressible types (response varies on Accept-Encoding)
+        @param   contentType    str     Content-Type header value
+        @returns bool
+    """
+    def isCompressibleType(self, contentType: str) -> bool:
+        return contentType.split(";")[0].strip().lower() in self.mimes
+
+    """
+        Compress a body, from cache if same key was compressed before
+        @param   body       bytes   Body to compress
+        @param   encoding   str     "gzip" or "deflate"
+        @param   key        object  Identity of body (None for not cacheable)
+        @returns bytes
+    """
+    def compress(self, body: bytes, encoding: str, key = None) -> bytes:
+        if key != None and self.cacheBudget>0:
+            with self._lock:
+                variant = self._variants.get((key, encoding), None)
+                if variant != None:
+                    self._variants.move_to_end((key, encoding))
+                    self.hits += 1
+                    return variant
+
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, self.WBITS[encoding])
+        variant    = compressor.compress(body)+compressor.flush()
+
+        if key != None and self.cacheBudget>0 and len(variant)<=self.cacheBudget:
+            with self._lock:
+                self.misses += 1
+                if not (key, encoding) in self._variants:
+                    self._variants[(key, encoding)] = variant
+                    self.used += len(variant)
+                while self.used>self.cacheBudget:
+                    oldest, evicted = self._variants.popitem(last=False)
+                    self.used -= len(evicted)
+        return variant
+
+    """
+        Cache counters
+        @returns dict
+    """
+    def stats(self) -> dict:
+        return {
+            "variants"  : len(self._variants),
+            "used"      : self.used,
+            "budget"    : self.cacheBudget,
+            "hits"      : self.hits,
+            "misses"    : self.misses
+        }
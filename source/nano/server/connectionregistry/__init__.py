@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+import threading
+
+"""
+    Class for open connexions of a server, counted by remote ip and by port, with max connexions limits
+"""
+class ConnectionRegistry():
+
+    STATES = ["handshake", "reading", "writing", "idle", "websocket", "http2"]
+
+    """
+        Constructor
+        @param   maxConnections int     Max open connexions (0 for unlimited)
+        @param   maxPerRemote   int     Max open connexions of a remote ip (0 for unlimited)
+        @param   maxByPort      dict    Max open connexions by listened port (vhosts "maxConnections")
+        @returns None
+    """
+    def __init__(self, maxConnections: int = 0, maxPerRemote: int = 0, maxByPort: dict = None):
+        self.maxConnections = int(maxConnections or 0)
+        self.maxPerRemote   = int(maxPerRemote or 0)
+        self.maxByPort      = maxByPort or {}
+        self.rejected       = 0
+        self._connections   = {}        # Connexion -> (remote ip, port)
+        self._remotes       = {}        # Remote ip -> open connexions
+        self._ports         = {}        # Port -> open connexions (and reserved ones)
+        self._reserved      = {}        # (remote ip, port) -> admitted connexions not added yet
+        self._handshakes    = {"handshakes": 0, "failed": 0, "resumed": 0, "time": 0.0, "maxTime": 0.0}
+        self._lock          = threading.Lock()
+
+    """
+        Count of open connexions
+        @returns int
+    """
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    """
+        Iterate over a snapshot of open connexions
+        @returns iterator
+    """
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._connections))
+
+    """
+        Check limits and take a place for a new connexion in one step (on accept, before any read or handshake)
+        Without connexion, place is reserved until add (or release if socket fails before)
+        @param   remote     str             Remote ip
+        @param   port       int             Listened port
+        @param   conn       SocketWrapper   (facultative) Connexion registered at once (or AsyncioConnection)
+        @returns bool                       False if a limit is reached (connexion is counted as rejected)
+    """
+    def admit(self, remote: str, port: int, conn = None) -> bool:
+        with self._lock:
+            if conn is not None and conn in self._connections:
+                return True
+            maxPort = self.maxByPort.get(port, 0)
+            if (self.maxConnections>0 and len(self._connections)+sum(self._reserved.values())>=self.maxConnections) \
+            or (self.maxPerRemote>0 and self._remotes.get(remote, 0)>=self.maxPerRemote) \
+            or (maxPort>0 and self._ports.get(port, 0)>=maxPort):
+                self.rejected += 1
+                return False
+            if conn is not None:
+                self._connections[conn] = (remote, port)
+            else:
+                self._reserved[(remote, port)] = self._reserved.get((remote, port), 0)+1
+            self._remotes[remote]   = self._remotes.get(remote, 0)+1
+            self._ports[port]       = self._ports.get(port, 0)+1
+        return True
+
+    """
+        Register an open connexion, on place reserved by admit if any
+        @param   conn   SocketWrapper   Connexion (or AsyncioConnection)
+        @returns None
+    """
+    def add(self, conn):
+        remote, port = conn._remote[0], conn._port
+        with self._lock:
+            if conn in self._connections:
+                return
+            self._connections[conn] = (remote, port)
+            if self._reserved.get((remote, port), 0)>0:
+                self._unreserve(remote, port)
+                return
+            self._remotes[remote]   = self._remotes.get(remote, 0)+1
+            self._ports[port]       = self._ports.get(port, 0)+1
+
+    """
+        Give back place reserved by admit, socket failed before its connexion is added
+        @param   remote     str     Remote ip
+        @param   port       int     Listened port
+        @returns None
+    """
+    def release(self, remote: str, port: int):
+        with self._lock:
+            if self._reserved.get((remote, port), 0)==0:
+                return
+            self._unreserve(remote, port)
+            self._uncount(remote, port)
+
+    """
+        Forget a closed connexion
+        @param   conn   SocketWrapper   Connexion (or AsyncioConnection)
+        @returns None
+    """
+    def remove(self, conn):
+        with self._lock:
+            key = self._connections.pop(conn, None)
+            if key == None:
+                return
+            self._uncount(*key)
+
+    """
+        Drop a reservation (lock held)
+        @param   remote     str     Remote ip
+        @param   port       int     Listened port
+        @returns None
+    """
+    def _unreserve(self, remote: str, port: int):
+        self._reserved[(remote, port)] -= 1
+        if self._reserved[(remote, port)]==0:
+            del self._reserved[(remote, port)]
+
+    """
+        Lower counts of a remote ip and a port (lock held)
+        @param   remote     str     Remote ip
+        @param   port       int     Listened port
+        @returns None
+    """
+    def _uncount(self, remote: str, port: int):
+        self._remotes[remote] -= 1
+        if self._remotes[remote]==0:
+            del self._remotes[remote]
+        self._ports[port] -= 1
+
+    """
+        Count an open connexion under its real remote ip (given by PROXY protocol header)
+        @param   conn   SocketWrapper   Connexion (or AsyncioConnection)
+        @returns bool                   False if max connexions by remote is reached for real ip (connexion is counted as rejected)
+    """
+    def readdress(self, conn) -> bool:
+        remote = conn._remote[0]
+        with self._lock:
+            key = self._connections.get(conn, None)
+            if key == None or key[0]==remote:
+                return True
+            self._remotes[key[0]] -= 1
+            if self._remotes[key[0]]==0:
+                del self._remotes[key[0]]
+            self._connections[conn] = (remote, key[1])
+            self._remotes[remote]   = self._remotes.get(remote, 0)+1
+            if self.maxPerRemote>0 and self._remotes[remote]>self.maxPerRemote:
+                self.rejected += 1
+                return False
+        return True
+
+    """
+        Count a tls handshake
+        @param   duration   float   Seconds from accept to handshake end
+        @param   resumed    bool    Session resumed (ticket or session cache)
+        @param   failed     bool    Handshake failed
+        @returns None
+    """
+    def handshake(self, duration: float, resumed: bool, failed: bool = False):
+        with self._lock:
+            counters = self._handshakes
+            if failed:
+                counters["failed"] += 1
+                return
+            counters["handshakes"] += 1
+            counters["resumed"]    += 1 if resumed else 0
+            counters["time"]       += duration
+            counters["maxTime"]     = max(counters["maxTime"], duration)
+
+    """
+        Open connexions of a remote ip
+        @param   remote     str     Remote ip
+        @returns int
+    """
+    def count(self, remote: str) -> int:
+        return self._remotes.get(remote, 0)
+
+    """
+        Snapshot of open connexions, by state, port and busiest remote ips
+        @returns dict
+    """
+    def stats(self) -> dict:
+        with self._lock:
+            connections = list(self._connections)
+            remotes     = sorted(self._remotes.items(), key=lambda item: item[1], reverse=True)
+            ports       = dict(self._ports)
+            handshakes  = dict(self._handshakes)
+            reserved    = sum(self._reserved.values())
+        states = {state: 0 for state in self.STATES}
+        for conn in connections:
+            state = conn.state
+            states[state] = states.get(state, 0)+1
+        return {
+            "connections"   : len(connections),
+            "reserved"      : reserved,
+            "maxConnections": self.maxConnections,
+            "rejected"      : self.rejected,
+            "states"        : states,
+            "ports"         : ports,
+            "remotes"       : len(remotes),
+            "topRemotes"    : dict(remotes[0:10]),
+            "tls"           : {
+                "handshakes"    : handshakes["handshakes"],
+                "failed"        : handshakes["failed"],
+                "resumed"       : handshakes["resumed"],
+                "avgMs"         : handshakes["time"]*1000/max(1, handshakes["handshakes"]),
+                "maxMs"         : handshakes["maxTime"]*1000
+            }
+        }
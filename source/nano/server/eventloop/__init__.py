@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+from collections.abc import Callable
+
+import collections
+import heapq
+import itertools
+import selectors
+import socket
+import threading
+import time
+
+"""
+    Class for single threaded readiness driven io (epoll on linux, from selectors)
+"""
+class EventLoop(threading.Thread):
+
+    READ    = selectors.EVENT_READ
+    WRITE   = selectors.EVENT_WRITE
+
+    """
+        Constructor
+        @param   name   str     Name of loop thread
+        @returns None
+    """
+    def __init__(self, name: str = "EventLoop"):
+        threading.Thread.__init__(self, name=name)
+        self._selector  = selectors.DefaultSelector()
+        self._pending   = collections.deque()
+        self._timers    = []
+        self._sequence  = itertools.count()
+        self._lock      = threading.Lock()
+        self.running    = False
+
+        # Self pipe, allow other threads to wake up select()
+        self._wakeupReader, self._wakeupWriter = socket.socketpair()
+        self._wakeupReader.setblocking(False)
+        self._wakeupWriter.setblocking(False)
+        self._selector.register(self._wakeupReader, self.READ, self._onwakeup)
+
+    """
+        Is current thread the loop thread
+        @returns bool
+    """
+    def inLoop(self) -> bool:
+        return threading.current_thread() is self
+
+    """
+        Run a callback on loop thread, as soon as possible (thread safe)
+        @param   callback   Callable    Callback without arguments
+        @returns None
+    """
+    def callSoon(self, callback: Callable):
+        self._pending.append(callback)
+        if not self.inLoop():
+            self._wakeup()
+
+    """
+        Run a callback on loop thread after a delay (thread safe)
+        @param   delay      float       Delay in seconds
+        @param   callback   Callable    Callback without arguments
+        @returns None
+    """
+    def callLater(self, delay: float, callback: Callable):
+        with self._lock:
+            heapq.heappush(self._timers, (time.monotonic() + delay, next(self._sequence), callback))
+        if not self.inLoop():
+            self._wakeup()
+
+    """
+        Watch a file object readiness
+        @param   fileobj    socket      Socket (or any selectable)
+        @param   events     int         Mask of EventLoop.READ | EventLoop.WRITE
+        @param   callback   Callable    Called with ready mask
+        @returns None
+    """
+    def register(self, fileobj, events: int, callback: Callable):
+        if not self.inLoop():
+            self.callSoon(lambda: self.register(fileobj, events, callback))
+            return
+        self._selector.register(fileobj, events, callback)
+
+    """
+        Change watched readiness of a file object
+        @param   fileobj    socket      Socket (or any selectable)
+        @param   events     int         Mask of EventLoop.READ | EventLoop.WRITE
+        @param   callback   Callable    Called with ready mask
+        @returns None
+    """
+    def modify(self, fileobj, events: int, callback: Callable):
+        if not self.inLoop():
+            self.callSoon(lambda: self.modify(fileobj, events, callback))
+            return
+        try:
+            self._selector.modify(fileobj, events, callback)
+        except (KeyError, ValueError):
+            # Not (or no more) registered
+            pass
+
+    """
+        Stop to watch a file object
+        @param   fileobj    socket      Socket (or any selectable)
+        @returns None
+    """
+    def unregister(self, fileobj):
+        if not self.inLoop():
+            self.callSoon(lambda: self.unregister(fileobj))
+            return
+        try:
+            self._selector.unregister(fileobj)
+        except (KeyError, ValueError):
+            # Not (or no more) registered
+            pass
+
+    """
+        Ask loop to stop
+        @returns None
+    """
+    def stop(self):
+        self.running = False
+        self._wakeup()
+
+    """
+        Routine of threading.Thread
+        @returns None
+    """
+    def run(self):
+        self.running = True
+        while self.running:
+            timeout = None
+            if len(self._pending)>0:
+                timeout = 0
+            elif len(self._timers)>0:
+                timeout = max(0, self._timers[0][0] - time.monotonic())
+
+            for key, mask in self._selector.select(timeout):
+                try:
+                    key.data(mask)
+                except Exception as e:
+                    print("Event loop callback error: "+str(e))
+
+            self._runTimers()
+            self._runPending()
+
+        self._selector.close()
+        self._wakeupReader.close()
+        self._wakeupWriter.close()
+
+    """
+        Run expired timers
+        @returns None
+    """
+    def _runTimers(self):
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if len(self._timers)==0 or self._timers[0][0]>now:
+                    return
+                callback = heapq.heappop(self._timers)[2]
+            try:
+                callback()
+            except Exception as e:
+                print("Event loop timer error: "+str(e))
+
+    """
+        Run callbacks queued by callSoon
+        @returns None
+    """
+    def _runPending(self):
+        # Only run what is already queued, callbacks may queue new ones
+        for i in range(len(self._pending)):
+            callback = self._pending.popleft()
+            try:
+                callback()
+            except Exception as e:
+                print("Event loop callback error: "+str(e))
+
+    """
+        Wake up select() from another thread
+        @returns None
+    """
+    def _wakeup(self):
+        try:
+            self._wakeupWriter.send(b'\0')
+        except (BlockingIOError, OSError):
+            # Pipe full (already woken up) or loop closed
+            pass
+
+    """
+        Drain self pipe
+        @param   mask   int     Ready mask
+        @returns None
+    """
+    def _onwakeup(self, mask: int):
+        try:
+            while self._wakeupReader.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
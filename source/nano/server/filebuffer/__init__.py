@@ -2,70 +2,175 @@
 
 from nano.server.socketwrapper         import SocketWrapper
 
-import threading
-import sys
+import mmap
+import time
 
 """
-    Class for manage http file download
+    Class for manage http file download, sent by connexion without dedicated thread
+    (os.sendfile in plain http, mmap slices over ssl), in one or several segments (byte ranges)
 """
-class FileBuffer(threading.Thread):
+class FileBuffer():
 
 
     """
         Constructor
         @param   conn               socket.socket   Socket demandant un fichier
         @param   path               str             Chemin d'accès au fichier
-        @param   byteStart          int             Index de l'octet de depart a téléchager
-        @param   byteLength         int             Nombre d'octets a télécharger
-        @param   bandWidthChunkSize int             Taille des tronçons a envoyer
-        @param   bandWidthDelay     int             Delai entre 2 envoi de tronçon
+        @param   segments           list            Tronçons a télécharger (bytes ecrits avant, index de depart, nombre d'octets)
+        @param   bandWidthChunkSize int             Taille des tronçons a envoyer (ssl)
+        @param   keepAlive          bool            Laisser la connexion ouverte apres le fichier
+        @param   trailer            bytes           Octets ecrits apres le dernier tronçon (multipart)
+        @param   shaper             Shaper          Limites de bande passante (None pour aucune)
+        @param   shapingKey         tuple           Vhost et ip du client pour le shaper
         @returns None
     """
-    def __init__(self, conn: SocketWrapper, path: str, byteStart: int, byteLength: int, bandWidthChunkSize: int, bandWidthDelay: int):
-        threading.Thread.__init__(self)
+    def __init__(self, conn: SocketWrapper, path: str, segments: list, bandWidthChunkSize: int, keepAlive: bool = False, trailer: bytes = b'', shaper = None, shapingKey: tuple = None):
         self._conn       = conn
         self._path       = path
-        self._byteStart  = byteStart
-        self._byteLength = byteLength
+        self._segments   = segments
+        self._trailer    = trailer
         self._chunkSize  = bandWidthChunkSize
-        self._delay      = bandWidthDelay
+        self._fd         = None
+        self._map        = None
+        self._view       = None
+        self._segment    = -1
+        self._byteStart  = 0
+        self._byteLength = 0
+        self._sent       = 0
+        self._keepAlive  = keepAlive
+        self._shaper     = shaper
+        self._shapingKey = shapingKey
+        self._shaped     = shaper != None and shaper.enabled
 
     """
         Destructeur
         @returns None
     """
     def __del__(self):
-        self._conn.close()
+        if not self._keepAlive:
+            self._conn.close()
 
     """
-        Routine de threading.Thread gerant le téléchargement
+        Start download
         @returns None
     """
-    def run(self):
-        eof         = False
-        fd          = open(self._path, "rb")
+    def start(self):
+        if sum([length for prefix, start, length in self._segments])>0:
+            self._fd = open(self._path, "rb")
+            if self._conn._ssl:
+                # Ssl encrypts in user space, send slices of mapped file without reading it in bytes
+                self._map  = mmap.mmap(self._fd.fileno(), 0, access=mmap.ACCESS_READ)
+                self._view = memoryview(self._map)
+        if self._conn.loop == None:
+            for i in range(0, len(self._segments)):
+                if self._conn.closed:
+                    break
+                self._nextSegment()
+            self._finishSegments()
+        else:
+            self._nextSegment()
 
-        # Position to byteStart
-        if self._byteStart>0:
-            fd.seek(self._byteStart)
-        start       = 0
-        length      = self._byteLength
-        chunksize   = 0
+    """
+        Send next segment (its prefix then its bytes), trailer once all are sent
+        @returns None
+    """
+    def _nextSegment(self):
+        self._segment += 1
+        if self._conn.loop != None and (self._conn.closed or self._segment>=len(self._segments)):
+            self._finishSegments()
+            return
+        prefix, self._byteStart, self._byteLength = self._segments[self._segment]
+        self._sent = 0
+        if len(prefix)>0:
+            self._conn.write(prefix)
+        if self._byteLength<=0:
+            self._segmentSent()
+        elif not self._conn._ssl and not self._shaped:
+            # Kernel copies file to socket
+            self._conn.sendfile(self._fd, self._byteStart, self._byteLength, self._segmentSent)
+        elif self._conn.loop == None:
+            while not self._conn.closed and self._sent<self._byteLength:
+                if not self._writeChunk():
+                    time.sleep(self._shaper.delay(self._shapingKey, self._byteLength-self._sent))
+        else:
+            self._pump()
 
-        # Read loop
-        while not self._conn.closed and not eof:
-            chunksize = self._chunkSize
-            if start+chunksize>length:
-                chunksize = length-start
-                eof = True
-            chunk = fd.read(chunksize) #bytes(fd.read(chunksize), encoding='ascii')
-            self._conn.write(chunk)
-            start += chunksize
+    """
+        Segment is sent, go on with next one (event loop, own thread loops over segments)
+        @returns None
+    """
+    def _segmentSent(self):
+        if self._conn.loop != None:
+            self._nextSegment()
 
-            if not eof:
-                time.sleep(self._delay/1000)
-        
-        if not self._conn.closed:
-            self._conn.close()
+    """
+        All segments are sent, write trailer then release file and connexion
+        @returns None
+    """
+    def _finishSegments(self):
+        if len(self._trailer)>0 and not self._conn.closed:
+            self._conn.write(self._trailer)
+        self._complete()
+
+    """
+        Write next slice, wait for it to be sent (or for shaper) before the next one (event loop)
+        @returns None
+    """
+    def _pump(self):
+        if self._conn.closed or self._sent>=self._byteLength:
+            self._segmentSent()
+            return
+        if not self._writeChunk():
+            self._conn.loop.callLater(self._shaper.delay(self._shapingKey, self._byteLength-self._sent), self._pump)
+        elif self._conn._ssl:
+            self._conn.drain(self._pump)
 
-        sys.exit(0)
+    """
+        Write next slice of file, mapped slice over ssl, sendfile of slice else
+        @returns bool   False if shaper grants nothing yet
+    """
+    def _writeChunk(self) -> bool:
+        chunksize = min(self._chunkSize, self._byteLength-self._sent)
+        if self._shaped:
+            chunksize = self._shaper.grant(self._shapingKey, chunksize)
+            if chunksize<=0:
+                return False
+        offset       = self._byteStart+self._sent
+        self._sent  += chunksize
+        if self._conn._ssl:
+            self._conn.write(self._view[offset:offset+chunksize])
+        else:
+            self._conn.sendfile(self._fd, offset, chunksize, self._sliceSent)
+        return True
+
+    """
+        Sendfile of a slice is over, go on with next one (event loop)
+        @returns None
+    """
+    def _sliceSent(self):
+        if self._conn.loop != None:
+            # Not from connexion flush, slices would recurse
+            self._conn.loop.callSoon(self._pump)
+
+    """
+        Download is over, release file, then release connexion for next response or close it
+        @returns None
+    """
+    def _complete(self):
+        if self._view != None:
+            try:
+                self._view.release()
+                self._map.close()
+            except BufferError:
+                # A slice is still queued by transport, map is closed once collected
+                pass
+            self._view, self._map = None, None
+        if self._fd != None:
+            self._fd.close()
+            self._fd = None
+        if self._conn.closed:
+            return
+        if self._keepAlive:
+            self._conn.finish()
+        else:
+            self._conn.close()
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+
+from collections import deque
+
+"""
+    Exception for malformed header block (http/2 COMPRESSION_ERROR)
+"""
+class HpackError(Exception):
+    pass
+
+"""
+    Class for http/2 header compression (RFC 7541): static and dynamic tables, integers and huffman coded strings
+    One instance by connexion, decoding client header blocks and encoding server ones (each direction has its own dynamic table)
+"""
+class Hpack():
+
+    # Static table, index 1 to 61
+    STATIC = [
+        (b":authority", b""), (b":method", b"GET"), (b":method", b"POST"),
+        (b":path", b"/"), (b":path", b"/index.html"), (b":scheme", b"http"),
+        (b":scheme", b"https"), (b":status", b"200"), (b":status", b"204"),
+        (b":status", b"206"), (b":status", b"304"), (b":status", b"400"),
+        (b":status", b"404"), (b":status", b"500"), (b"accept-charset", b""),
+        (b"accept-encoding", b"gzip, deflate"), (b"accept-language", b""), (b"accept-ranges", b""),
+        (b"accept", b""), (b"access-control-allow-origin", b""), (b"age", b""),
+        (b"allow", b""), (b"authorization", b""), (b"cache-control", b""),
+        (b"content-disposition", b""), (b"content-encoding", b""), (b"content-language", b""),
+        (b"content-length", b""), (b"content-location", b""), (b"content-range", b""),
+        (b"content-type", b""), (b"cookie", b""), (b"date", b""),
+        (b"etag", b""), (b"expect", b""), (b"expires", b""),
+        (b"from", b""), (b"host", b""), (b"if-match", b""),
+        (b"if-modified-since", b""), (b"if-none-match", b""), (b"if-range", b""),
+        (b"if-unmodified-since", b""), (b"last-modified", b""), (b"link", b""),
+        (b"location", b""), (b"max-forwards", b""), (b"proxy-authenticate", b""),
+        (b"proxy-authorization", b""), (b"range", b""), (b"referer", b""),
+        (b"refresh", b""), (b"retry-after", b""), (b"server", b""),
+        (b"set-cookie", b""), (b"strict-transport-security", b""), (b"transfer-encoding", b""),
+        (b"user-agent", b""), (b"vary", b""), (b"via", b""),
+        (b"www-authenticate", b""),
+    ]
+
+    # Huffman code and bit length of each byte (RFC 7541 appendix B), EOS is 0x3fffffff on 30 bits
+    HUFFMAN = [
+        (0x1ff8, 13), (0x7fffd8, 23), (0xfffffe2, 28), (0xfffffe3, 28), (0xfffffe4, 28), (0xfffffe5, 28),
+        (0xfffffe6, 28), (0xfffffe7, 28), (0xfffffe8, 28), (0xffffea, 24), (0x3ffffffc, 30), (0xfffffe9, 28),
+        (0xfffffea, 28), (0x3ffffffd, 30), (0xfffffeb, 28), (0xfffffec, 28), (0xfffffed, 28), (0xfffffee, 28),
+        (0xfffffef, 28), (0xffffff0, 28), (0xffffff1, 28), (0xffffff2, 28), (0x3ffffffe, 30), (0xffffff3, 28),
+        (0xffffff4, 28), (0xffffff5, 28), (0xffffff6, 28), (0xffffff7, 28), (0xffffff8, 28), (0xffffff9, 28),
+        (0xffffffa, 28), (0xffffffb, 28), (0x14, 6), (0x3f8, 10), (0x3f9, 10), (0xffa, 12),
+        (0x1ff9, 13), (0x15, 6), (0xf8, 8), (0x7fa, 11), (0x3fa, 10), (0x3fb, 10),
+        (0xf9, 8), (0x7fb, 11), (0xfa, 8), (0x16, 6), (0x17, 6), (0x18, 6),
+        (0x0, 5), (0x1, 5), (0x2, 5), (0x19, 6), (0x1a, 6), (0x1b, 6),
+        (0x1c, 6), (0x1d, 6), (0x1e, 6), (0x1f, 6), (0x5c, 7), (0xfb, 8),
+        (0x7ffc, 15), (0x20, 6), (0xffb, 12), (0x3fc, 10), (0x1ffa, 13), (0x21, 6),
+        (0x5d, 7), (0x5e, 7), (0x5f, 7), (0x60, 7), (0x61, 7), (0x62, 7),
+        (0x63, 7), (0x64, 7), (0x65, 7), (0x66, 7), (0x67, 7), (0x68, 7),
+        (0x69, 7), (0x6a, 7), (0x6b, 7), (0x6c, 7), (0x6d, 7), (0x6e, 7),
+        (0x6f, 7), (0x70, 7), (0x71, 7), (0x72, 7), (0xfc, 8), (0x73, 7),
+        (0xfd, 8), (0x1ffb, 13), (0x7fff0, 19), (0x1ffc, 13), (0x3ffc, 14), (0x22, 6),
+        (0x7ffd, 15), (0x3, 5), (0x23, 6), (0x4, 5), (0x24, 6), (0x5, 5),
+        (0x25, 6), (0x26, 6), (0x27, 6), (0x6, 5), (0x74, 7), (0x75, 7),
+        (0x28, 6), (0x29, 6), (0x2a, 6), (0x7, 5), (0x2b, 6), (0x76, 7),
+        (0x2c, 6), (0x8, 5), (0x9, 5), (0x2d, 6), (0x77, 7), (0x78, 7),
+        (0x79, 7), (0x7a, 7), (0x7b, 7), (0x7ffe, 15), (0x7fc, 11), (0x3ffd, 14),
+        (0x1ffd, 13), (0xffffffc, 28), (0xfffe6, 20), (0x3fffd2, 22), (0xfffe7, 20), (0xfffe8, 20),
+        (0x3fffd3, 22), (0x3fffd4, 22), (0x3fffd5, 22), (0x7fffd9, 23), (0x3fffd6, 22), (0x7fffda, 23),
+        (0x7fffdb, 23), (0x7fffdc, 23), (0x7fffdd, 23), (0x7fffde, 23), (0xffffeb, 24), (0x7fffdf, 23),
+        (0xffffec, 24), (0xffffed, 24), (0x3fffd7, 22), (0x7fffe0, 23), (0xffffee, 24), (0x7fffe1, 23),
+        (0x7fffe2, 23), (0x7fffe3, 23), (0x7fffe4, 23), (0x1fffdc, 21), (0x3fffd8, 22), (0x7fffe5, 23),
+        (0x3fffd9, 22), (0x7fffe6, 23), (0x7fffe7, 23), (0xffffef, 24), (0x3fffda, 22), (0x1fffdd, 21),
+        (0xfffe9, 20), (0x3fffdb, 22), (0x3fffdc, 22), (0x7fffe8, 23), (0x7fffe9, 23), (0x1fffde, 21),
+        (0x7fffea, 23), (0x3fffdd, 22), (0x3fffde, 22), (0xfffff0, 24), (0x1fffdf, 21), (0x3fffdf, 22),
+        (0x7fffeb, 23), (0x7fffec, 23), (0x1fffe0, 21), (0x1fffe1, 21), (0x3fffe0, 22), (0x1fffe2, 21),
+        (0x7fffed, 23), (0x3fffe1, 22), (0x7fffee, 23), (0x7fffef, 23), (0xfffea, 20), (0x3fffe2, 22),
+        (0x3fffe3, 22), (0x3fffe4, 22), (0x7ffff0, 23), (0x3fffe5, 22), (0x3fffe6, 22), (0x7ffff1, 23),
+        (0x3ffffe0, 26), (0x3ffffe1, 26), (0xfffeb, 20), (0x7fff1, 19), (0x3fffe7, 22), (0x7ffff2, 23),
+        (0x3fffe8, 22), (0x1ffffec, 25), (0x3ffffe2, 26), (0x3ffffe3, 26), (0x3ffffe4, 26), (0x7ffffde, 27),
+        (0x7ffffdf, 27), (0x3ffffe5, 26), (0xfffff1, 24), (0x1ffffed, 25), (0x7fff2, 19), (0x1fffe3, 21),
+        (0x3ffffe6, 26), (0x7ffffe0, 27), (0x7ffffe1, 27), (0x3ffffe7, 26), (0x7ffffe2, 27), (0xfffff2, 24),
+        (0x1fffe4, 21), (0x1fffe5, 21), (0x3ffffe8, 26), (0x3ffffe9, 26), (0xffffffd, 28), (0x7ffffe3, 27),
+        (0x7ffffe4, 27), (0x7ffffe5, 27), (0xfffec, 20), (0xfffff3, 24), (0xfffed, 20), (0x1fffe6, 21),
+        (0x3fffe9, 22), (0x1fffe7, 21), (0x1fffe8, 21), (0x7ffff3, 23), (0x3fffea, 22), (0x3fffeb, 22),
+        (0x1ffffee, 25), (0x1ffffef, 25), (0xfffff4, 24), (0xfffff5, 24), (0x3ffffea, 26), (0x7ffff4, 23),
+        (0x3ffffeb, 26), (0x7ffffe6, 27), (0x3ffffec, 26), (0x3ffffed, 26), (0x7ffffe7, 27), (0x7ffffe8, 27),
+        (0x7ffffe9, 27), (0x7ffffea, 27), (0x7ffffeb, 27), (0xffffffe, 28), (0x7ffffec, 27), (0x7ffffed, 27),
+        (0x7ffffee, 27), (0x7ffffef, 27), (0x7fffff0, 27), (0x3ffffee, 26),
+    ]
+
+    # Values changing on each response, or sensitive, never added to dynamic table
+    NOT_INDEXED = {b"date", b"content-length", b"etag", b"last-modified", b"content-range", b"set-cookie", b"authorization", b"cookie"}
+
+    # Huffman decoding states (4 bits by step), built once
+    _states = None
+
+    """
+        Constructor
+        @param   maxTableSize   int     Dynamic table size of decoder (our SETTINGS_HEADER_TABLE_SIZE)
+        @returns None
+    """
+    def __init__(self, maxTableSize: int = 4096):
+        self.maxTableSize   = int(maxTableSize)
+        self._decodeTable   = deque()       # (name, value), newest first
+        self._decodeSize    = 0
+        self._decodeMax     = self.maxTableSize
+        self._encodeTable   = deque()
+        self._encodeSize    = 0
+        self._encodeMax     = 4096
+        self._encodeUpdate  = None          # Size update to signal at start of next block
+        self._staticIndex   = {}
+        for index in range(len(self.STATIC)-1, -1, -1):
+            self._staticIndex[self.STATIC[index]]    = index+1
+            self._staticIndex[self.STATIC[index][0]] = index+1
+        if Hpack._states == None:
+            Hpack._states = self._huffmanStates()
+
+    """
+        Decode a complete header block (HEADERS and CONTINUATION fragments)
+        @param   block  bytes   Header block
+        @returns list           (name, value) bytes, in block order
+    """
+    def decode(self, block: bytes) -> list:
+        headers = []
+        pos     = 0
+        length  = len(block)
+        while pos<length:
+            byte = block[pos]
+            if byte & 0x80:
+                # Indexed field
+                index, pos = self._readInt(block, pos, 7)
+                headers.append(self._field(index))
+            elif byte & 0x40:
+                # Literal with incremental indexing
+                name, value, pos = self._readLiteral(block, pos, 6)
+                headers.append((name, value))
+                self._add(self._decodeTable, name, value, True)
+            elif byte & 0x20:
+                # Dynamic table size update, up to our setting
+                size, pos = self._readInt(block, pos, 5)
+                if size>self.maxTableSize:
+                    raise HpackError("Table size update over setting")
+                self._decodeMax = size
+                self._evict(self._decodeTable, True)
+            else:
+                # Literal without indexing, or never indexed
+                name, value, pos = self._readLiteral(block, pos, 4)
+                headers.append((name, value))
+        return headers
+
+    """
+        Encode a header list
+        @param   headers    list    (name, value) bytes, names in lower case
+        @returns bytes              Header block
+    """
+    def encode(self, headers: list) -> bytes:
+        block = bytearray()
+        if self._encodeUpdate != None:
+            block += self._int(self._encodeUpdate, 5, 0x20)
+            self._encodeUpdate = None
+        for name, value in headers:
+            index = self._staticIndex.get((name, value), 0) or self._dynamicIndex(name, value)
+            if index>0:
+                block += self._int(index, 7, 0x80)
+                continue
+            nameIndex = self._staticIndex.get(name, 0) or self._dynamicIndex(name, None)
+            if name in self.NOT_INDEXED:
+                block += self._int(nameIndex, 4, 0x00)
+            else:
+                block += self._int(nameIndex, 6, 0x40)
+                self._add(self._encodeTable, name, value, False)
+            if nameIndex==0:
+                block += self._string(name)
+            block += self._string(value)
+        return bytes(block)
+
+    """
+        Set dynamic table size of encoder (peer SETTINGS_HEADER_TABLE_SIZE), signaled in next block
+        @param   size   int     Max size allowed by peer
+        @returns None
+    """
+    def setEncoderMaxSize(self, size: int):
+        size = min(int(size), 4096)
+        if size!=self._encodeMax:
+            self._encodeMax     = size
+            self._encodeUpdate  = size
+            self._evict(self._encodeTable, False)
+
+    """
+        Field of an index (static then dynamic table)
+        @param   index  int
+        @returns tuple          (name, value)
+    """
+    def _field(self, index: int) -> tuple:
+        if index<=0:
+            raise HpackError("Invalid index 0")
+        if index<=len(self.STATIC):
+            return self.STATIC[index-1]
+        index -= len(self.STATIC)+1
+        if index>=len(self._decodeTable):
+            raise HpackError("Index out of tables")
+        return self._decodeTable[index]
+
+    """
+        Index of a field (or of a name if value is None) in encoder dynamic table
+        @param   name   bytes
+        @param   value  bytes
+        @returns int            0 if not found
+    """
+    def _dynamicIndex(self, name: bytes, value: bytes) -> int:
+        for index, (entryName, entryValue) in enumerate(self._encodeTable):
+            if entryName==name and (value == None or entryValue==value):
+                return len(self.STATIC)+1+index
+        return 0
+
+    """
+        Add a field to a dynamic table, evicting oldest entries over its max size
+        @param   table      deque   Decoder or encoder table
+        @param   name       bytes
+        @param   value      bytes
+        @param   decoding   bool    Table is decoder one
+        @returns None
+    """
+    def _add(self, table: deque, name: bytes, value: bytes, decoding: bool):
+        size    = len(name)+len(value)+32
+        maximum = self._decodeMax if decoding else self._encodeMax
+        if size>maximum:
+            # Bigger than table, empties it
+            table.clear()
+            self._setSize(decoding, 0)
+            return
+        table.appendleft((name, value))
+        self._setSize(decoding, (self._decodeSize if decoding else self._encodeSize)+size)
+        self._evict(table, decoding)
+
+    """
+        Evict oldest entries of a table over its max size
+        @param   table      deque
+        @param   decoding   bool    Table is decoder one
+        @returns None
+    """
+    def _evict(self, table: deque, decoding: bool):
+        size    = self._decodeSize if decoding else self._encodeSize
+        maximum = self._decodeMax if decoding else self._encodeMax
+        while size>maximum and len(table)>0:
+            name, value = table.pop()
+            size -= len(name)+len(value)+32
+        self._setSize(decoding, size)
+
+    """
+        Set current size of a table
+        @param   decoding   bool    Table is decoder one
+        @param   size       int
+        @returns None
+    """
+    def _setSize(self, decoding: bool, size: int):
+        if decoding:
+            self._decodeSize = size
+        else:
+            self._encodeSize = size
+
+    """
+        Read a prefixed integer
+        @param   data   bytes
+        @param   pos    int     Offset of first byte
+        @param   bits   int     Prefix bits
+        @returns tuple          (value, next offset)
+    """
+    def _readInt(self, data: bytes, pos: int, bits: int) -> tuple:
+        mask  = (1<<bits)-1
+        value = data[pos] & mask
+        pos  += 1
+        if value<mask:
+            return value, pos
+        shift = 0
+        while True:
+            if pos>=len(data) or shift>28:
+                raise HpackError("Truncated or oversized integer")
+            byte   = data[pos]
+            pos   += 1
+            value += (byte & 0x7f)<<shift
+            shift += 7
+            if not byte & 0x80:
+                return value, pos
+
+    """
+        Read a literal field (indexed or literal name, then value)
+        @param   data   bytes
+        @param   pos    int     Offset of first byte
+        @param   bits   int     Prefix bits of name index
+        @returns tuple          (name, value, next offset)
+    """
+    def _readLiteral(self, data: bytes, pos: int, bits: int) -> tuple:
+        index, pos = self._readInt(data, pos, bits)
+        if index>0:
+            name = self._field(index)[0]
+        else:
+            name, pos = self._readString(data, pos)
+        value, pos = self._readString(data, pos)
+        return name, value, pos
+
+    """
+        Read a string literal (raw or huffman coded)
+        @param   data   bytes
+        @param   pos    int     Offset of first byte
+        @returns tuple          (string, next offset)
+    """
+    def _readString(self, data: bytes, pos: int) -> tuple:
+        if pos>=len(data):
+            raise HpackError("Truncated string")
+        huffman     = data[pos] & 0x80
+        length, pos = self._readInt(data, pos, 7)
+        if pos+length>len(data):
+            raise HpackError("Truncated string")
+        string = bytes(data[pos:pos+length])
+        if huffman:
+            string = self._huffmanDecode(string)
+        return string, pos+length
+
+    """
+        Encode a prefixed integer
+        @param   value  int
+        @param   bits   int     Prefix bits
+        @param   flags  int     High bits of first byte
+        @returns bytes
+    """
+    def _int(self, value: int, bits: int, flags: int) -> bytes:
+        mask = (1<<bits)-1
+        if value<mask:
+            return bytes([flags | value])
+        out    = bytearray([flags | mask])
+        value -= mask
+        while value>=128:
+            out.append((value & 0x7f) | 0x80)
+            value >>= 7
+        out.append(value)
+        return bytes(out)
+
+    """
+        Encode a string literal, huffman coded if shorter
+        @param   string bytes
+        @returns bytes
+    """
+    def _string(self, string: bytes) -> bytes:
+        coded = self._huffmanEncode(string)
+        if len(coded)<len(string):
+            return self._int(len(coded), 7, 0x80)+coded
+        return self._int(len(string), 7, 0x00)+string
+
+    """
+        Huffman code a string, padded with ones (EOS prefix)
+        @param   string bytes
+        @returns bytes
+    """
+    def _huffmanEncode(self, string: bytes) -> bytes:
+        value = 0
+        bits  = 0
+        for byte in string:
+            code, length = self.HUFFMAN[byte]
+            value = (value<<length) | code
+            bits += length
+        padding = -bits % 8
+        value   = (value<<padding) | ((1<<padding)-1)
+        return value.to_bytes((bits+padding)//8, "big")
+
+    """
+        Decode a huffman coded string, 4 bits by step
+        @param   string bytes
+        @returns bytes
+    """
+    def _huffmanDecode(self, string: bytes) -> bytes:
+        out   = bytearray()
+        state = 0
+        for byte in string:
+            for nibble in (byte>>4, byte & 0x0f):
+                state, symbols = self._states[state][nibble]
+                if state<0:
+                    raise HpackError("Invalid huffman code")
+                out += symbols
+        if not self._states[state][16]:
+            raise HpackError("Invalid huffman padding")
+        return bytes(out)
+
+    """
+        Build huffman decoding states: internal nodes of code tree, with for each nibble the next node and decoded bytes
+        Last item of a state tells if input may end there (padding of at most 7 one bits)
+        @returns list
+    """
+    def _huffmanStates(self) -> list:
+        # Tree of nodes [child 0, child 1], a child is a node index or a decoded symbol (tuple)
+        tree = [[None, None]]
+        for symbol, (code, length) in enumerate(self.HUFFMAN+[(0x3fffffff, 30)]):
+            node = 0
+            for bit in range(length-1, -1, -1):
+                branch = (code>>bit) & 1
+                if bit==0:
+                    tree[node][branch] = (symbol,)
+                else:
+                    if tree[node][branch] == None:
+                        tree.append([None, None])
+                        tree[node][branch] = len(tree)-1
+                    node = tree[node][branch]
+
+        # Depth of each node, and if its path is only one bits (valid padding)
+        paths = {0: (0, True)}
+        for node in range(len(tree)):
+            depth, ones = paths[node]
+            for branch in (0, 1):
+                child = tree[node][branch]
+                if isinstance(child, int):
+                    paths[child] = (depth+1, ones and branch==1)
+
+        states = []
+        for node in range(len(tree)):
+            transitions = []
+            for nibble in range(16):
+                current = node
+                symbols = bytearray()
+                for bit in range(3, -1, -1):
+                    child = tree[current][(nibble>>bit) & 1]
+                    if isinstance(child, tuple) and child[0]<256:
+                        symbols.append(child[0])
+                        current = 0
+                    elif isinstance(child, int):
+                        current = child
+                    else:
+                        # EOS is never sent
+                        current = -1
+                        break
+                transitions.append((current, bytes(symbols)))
+            depth, ones = paths[node]
+            transitions.append(node==0 or (ones and depth<8))
+            states.append(transitions)
+        return states
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+import struct
+
+"""
+    Exception for http/2 protocol violation, connexion error (stream 0) or stream error
+"""
+class Http2Error(Exception):
+
+    """
+        Constructor
+        @param   code       int     Http/2 error code (Http2Framer.PROTOCOL_ERROR...)
+        @param   message    str     Reason
+        @param   streamId   int     Stream in error, 0 for connexion error
+        @returns None
+    """
+    def __init__(self, code: int, message: str, streamId: int = 0):
+        Exception.__init__(self, message)
+        self.code       = code
+        self.streamId   = streamId
+
+"""
+    Class for cutting a received http/2 byte stream into frames (after client connexion preface), and packing frames
+"""
+class Http2Framer():
+
+    PREFACE         = b'PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n'
+    HEADER          = struct.Struct(">BHBBI")      # Length on 24 bits (8+16), type, flags, stream id (31 bits)
+
+    # Frame types
+    DATA            = 0x0
+    HEADERS         = 0x1
+    PRIORITY        = 0x2
+    RST_STREAM      = 0x3
+    SETTINGS        = 0x4
+    PUSH_PROMISE    = 0x5
+    PING            = 0x6
+    GOAWAY          = 0x7
+    WINDOW_UPDATE   = 0x8
+    CONTINUATION    = 0x9
+
+    # Flags
+    END_STREAM      = 0x1
+    ACK             = 0x1
+    END_HEADERS     = 0x4
+    PADDED          = 0x8
+    PRIORITY_FLAG   = 0x20
+
+    # Settings
+    SETTINGS_HEADER_TABLE_SIZE      = 0x1
+    SETTINGS_ENABLE_PUSH            = 0x2
+    SETTINGS_MAX_CONCURRENT_STREAMS = 0x3
+    SETTINGS_INITIAL_WINDOW_SIZE    = 0x4
+    SETTINGS_MAX_FRAME_SIZE         = 0x5
+    SETTINGS_MAX_HEADER_LIST_SIZE   = 0x6
+
+    # Error codes
+    NO_ERROR            = 0x0
+    PROTOCOL_ERROR      = 0x1
+    INTERNAL_ERROR      = 0x2
+    FLOW_CONTROL_ERROR  = 0x3
+    STREAM_CLOSED       = 0x5
+    FRAME_SIZE_ERROR    = 0x6
+    REFUSED_STREAM      = 0x7
+    CANCEL              = 0x8
+    COMPRESSION_ERROR   = 0x9
+    ENHANCE_YOUR_CALM   = 0xb
+
+    """
+        Constructor
+        @param   maxFrameSize   int     Max payload of a received frame (our SETTINGS_MAX_FRAME_SIZE)
+        @returns None
+    """
+    def __init__(self, maxFrameSize: int = 16384):
+        self.maxFrameSize   = maxFrameSize
+        self._buffer        = bytearray()
+        self._start         = 0
+        self._preface       = False     # Client preface received
+
+    """
+        Append received data
+        @param   data   bytes   Received data
+        @returns None
+    """
+    def feed(self, data: bytes):
+        self._buffer += data
+
+    """
+        Next complete frame
+        @returns tuple      (type, flags, stream id, payload bytes), None if more data is needed
+    """
+    def next(self) -> tuple:
+        if not self._preface:
+            length = min(len(self._buffer)-self._start, len(self.PREFACE))
+            if self._buffer[self._start:self._start+length]!=self.PREFACE[0:length]:
+                raise Http2Error(self.PROTOCOL_ERROR, "Invalid connexion preface")
+            if length<len(self.PREFACE):
+                return None
+            self._start     += length
+            self._preface    = True
+
+        if len(self._buffer)-self._start<9:
+            self._compact()
+            return None
+        high, low, type, flags, streamId = self.HEADER.unpack_from(self._buffer, self._start)
+        length = (high<<16) | low
+        if length>self.maxFrameSize:
+            raise Http2Error(self.FRAME_SIZE_ERROR, "Frame of "+str(length)+" bytes over max frame size")
+        end = self._start+9+length
+        if end>len(self._buffer):
+            self._compact()
+            return None
+        payload     = bytes(self._buffer[self._start+9:end])
+        self._start = end
+        return (type, flags, streamId & 0x7fffffff, payload)
+
+    """
+        Drop framed data from buffer
+        @returns None
+    """
+    def _compact(self):
+        if self._start>0:
+            del self._buffer[:self._start]
+            self._start = 0
+
+    """
+        Pack a frame
+        @param   type       int     Frame type
+        @param   flags      int     Frame flags
+        @param   streamId   int     Stream id (0 for connexion)
+        @param   payload    bytes   Frame payload
+        @returns bytes
+    """
+    def pack(self, type: int, flags: int, streamId: int, payload: bytes = b'') -> bytes:
+        length = len(payload)
+        return self.HEADER.pack(length>>16, length & 0xffff, type, flags, streamId)+payload
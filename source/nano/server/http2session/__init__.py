@@ -0,0 +1,824 @@
+#!/usr/bin/env python3
+
+from nano.server.http2framer    import Http2Framer, Http2Error
+from nano.server.hpack          import Hpack, HpackError
+
+from collections.abc import Callable
+from collections     import deque
+
+import os
+import struct
+import threading
+
+"""
+    Class for one http/2 stream, same write api than nano.server.socketwrapper.SocketWrapper
+    Http/1 response written by protocol is sent as HEADERS then DATA frames of stream
+"""
+class Http2Stream():
+
+    """
+        Constructor
+        @param   session    Http2Session    Session of connexion
+        @param   streamId   int             Stream id
+        @param   window     int             Send window (peer SETTINGS_INITIAL_WINDOW_SIZE)
+        @returns None
+    """
+    def __init__(self, session, streamId: int, window: int):
+        conn            = session._conn
+        self.id         = streamId
+        self._session   = session
+        self._conn      = conn
+        self._local     = conn._local
+        self._remote    = conn._remote
+        self._port      = conn._port
+        self._ssl       = False     # File segments are read and framed by stream (see sendfile), never mapped by FileBuffer
+        self.loop       = conn.loop
+        self.requests   = 0
+        self.terminator = b'\r\n\r\n'
+        self.window     = window
+        self.headers    = []        # Request headers (name, value)
+        self.body       = bytearray()
+        self.code       = None      # Http code answered instead of dispatching request (413, 431)
+        self.received   = False     # Request complete (END_STREAM received)
+        self._consumed  = 0         # Received body bytes not yet given back by WINDOW_UPDATE
+        self._head      = bytearray()   # Response head, until complete
+        self._headSent  = False
+        self._queue     = deque()   # Response body: memoryview, or [fd, offset, count, callback] file segment
+        self._ending    = False     # Response complete, END_STREAM once queue is sent
+        self._scheduled = False     # In session round robin
+        self._ondrain   = []
+        self._closed    = False
+
+    """
+        Hash, same than connexion (protocol caches are by connexion)
+        @returns int
+    """
+    def __hash__(self):
+        return hash(self._conn)
+
+    """
+        Eq, same than connexion
+        @returns bool
+    """
+    def __eq__(self, other):
+        return hash(self)==hash(other)
+
+    """
+        Is stream closed (response sent, reset) or its connexion
+        @returns bool
+    """
+    @property
+    def closed(self) -> bool:
+        return self._closed or self._conn.closed
+
+    """
+        Requests of connexion waiting for their response
+        @returns int
+    """
+    @property
+    def pending(self) -> int:
+        return self._conn.pending
+
+    @pending.setter
+    def pending(self, value: int):
+        self._conn.pending = value
+
+    """
+        Write response data (http/1 head, then body)
+        @param   bytes   data
+        @returns None
+    """
+    def write(self, data: bytes):
+        self._session._write(self, data)
+
+    """
+        Write response data, then end stream
+        @param   bytes   data
+        @returns None
+    """
+    def end(self, data: bytes):
+        self._session._write(self, data)
+        self._session._finish(self)
+
+    """
+        End stream once written data is sent (reset if no response was written), connexion stays open
+        @returns None
+    """
+    def close(self):
+        self._session._finish(self)
+
+    """
+        Response is complete, end stream
+        @returns None
+    """
+    def finish(self):
+        self._session._finish(self)
+
+    """
+        Run a streaming response (file download) now, streams are multiplexed
+        @param   callback   Callable    Starts stream, without arguments
+        @returns None
+    """
+    def stream(self, callback: Callable):
+        callback()
+
+    """
+        Send a file segment, read by slices as flow control windows open
+        @param   file       file        File opened in binary mode
+        @param   offset     int         First byte
+        @param   count      int         Bytes to send
+        @param   callback   Callable    Called once segment is framed
+        @returns None
+    """
+    def sendfile(self, file, offset: int, count: int, callback: Callable):
+        self._session._sendfile(self, file, offset, count, callback)
+
+    """
+        Call back once written data has been framed
+        @param   callback   Callable    Callback without arguments
+        @returns None
+    """
+    def drain(self, callback: Callable):
+        self._session._drain(self, callback)
+
+    """
+        Force socket to keepalive
+        @param   value  bool  Enable keepalive
+        @returns None
+    """
+    def setkeepalive(self, value):
+        self._conn.setkeepalive(value)
+
+    """
+        Add event handler on connexion
+        @returns None
+    """
+    def on(self, eventName: str, callback: Callable):
+        self._conn.on(eventName, callback)
+
+"""
+    Class for http/2 on a connexion (RFC 9113): settings, ping, flow control and multiplexed streams
+    Each complete request is fired as an http/1 request ("data" event) on its stream, as connexions do
+"""
+class Http2Session():
+
+    # Bytes of frames written before waiting for connexion drain (event loop)
+    FLUSH_BUDGET = 262144
+
+    # Hop-by-hop headers, forbidden in http/2
+    CONNECTION_HEADERS = {b"connection", b"keep-alive", b"proxy-connection", b"transfer-encoding", b"upgrade"}
+
+    """
+        Constructor
+        @param   conn       SocketWrapper   Connexion (or AsyncioConnection)
+        @param   settings   dict            maxConcurrentStreams, initialWindowSize, maxFrameSize, headerTableSize, maxHeaderListSize, maxRequestSize
+        @param   fire       Callable        Fire an event of connexion ("data", "invalid")
+        @returns None
+    """
+    def __init__(self, conn, settings: dict, fire: Callable):
+        self._conn              = conn
+        self._fire              = fire
+        self._framer            = Http2Framer(int(settings.get("maxFrameSize", 16384)))
+        self._hpack             = Hpack(int(settings.get("headerTableSize", 4096)))
+        self._lock              = threading.RLock()
+        self.maxStreams         = int(settings.get("maxConcurrentStreams", 100))
+        self.maxHeaderListSize  = int(settings.get("maxHeaderListSize", 65536))
+        self.maxRequestSize     = int(settings.get("maxRequestSize", 8388608))
+        self.streams            = {}        # Open streams by id
+        self._lastStreamId      = 0
+        self._headerBlock       = None      # [stream id, flags, block] of HEADERS waiting for CONTINUATION
+        self._active            = deque()   # Streams with output, sent round robin
+        self._recvWindow        = int(settings.get("initialWindowSize", 65535))
+        self._consumed          = 0         # Received bytes not yet given back by connexion WINDOW_UPDATE
+        self._sendWindow        = 65535     # Connexion send window
+        self._peerWindow        = 65535     # Send window of new streams
+        self._peerFrameSize     = 16384
+        self._waiting           = False     # Waiting for connexion drain (event loop)
+        self._woken             = False     # Flush scheduled on loop (event loop)
+        self._goaway            = False     # GOAWAY sent or received, no new stream
+        self.closed             = False
+        conn.on("close", self._onclose)
+
+    """
+        Send server connexion preface (SETTINGS), and open connexion receive window
+        @returns None
+    """
+    def start(self):
+        settings = [
+            (Http2Framer.SETTINGS_MAX_CONCURRENT_STREAMS, self.maxStreams),
+            (Http2Framer.SETTINGS_INITIAL_WINDOW_SIZE   , self._recvWindow),
+            (Http2Framer.SETTINGS_MAX_FRAME_SIZE        , self._framer.maxFrameSize),
+            (Http2Framer.SETTINGS_HEADER_TABLE_SIZE     , self._hpack.maxTableSize),
+            (Http2Framer.SETTINGS_MAX_HEADER_LIST_SIZE  , self.maxHeaderListSize)
+        ]
+        out = self._framer.pack(Http2Framer.SETTINGS, 0, 0, b''.join([struct.pack(">HI", ident, value) for ident, value in settings]))
+        if self._recvWindow>65535:
+            out += self._framer.pack(Http2Framer.WINDOW_UPDATE, 0, 0, struct.pack(">I", self._recvWindow-65535))
+        with self._lock:
+            self._conn.write(out)
+
+    """
+        Process received data, fire complete requests then send what windows allow
+        @param   data   bytes   Received data
+        @returns None
+    """
+    def feed(self, data: bytes):
+        events = []
+        with self._lock:
+            self._framer.feed(data)
+            try:
+                while not self.closed:
+                    frame = self._framer.next()
+                    if frame == None:
+                        break
+                    try:
+                        self._onframe(frame[0], frame[1], frame[2], frame[3], events)
+                    except Http2Error as e:
+                        if e.streamId==0:
+                            raise
+                        self._reset(e.streamId, e.code)
+            except HpackError as e:
+                self._error(Http2Framer.COMPRESSION_ERROR)
+            except Http2Error as e:
+                self._error(e.code)
+
+        # Out of lock, protocol writes responses of static files at once
+        for eventName, args in events:
+            if not args["socket"].closed:
+                self._fire(eventName, args)
+        self._flush()
+
+    """
+        GOAWAY frame for a graceful close, no new stream is accepted
+        @param   code   int     Error code
+        @returns bytes
+    """
+    def goaway(self, code: int = Http2Framer.NO_ERROR) -> bytes:
+        with self._lock:
+            self._goaway = True
+            return self._framer.pack(Http2Framer.GOAWAY, 0, 0, struct.pack(">II", self._lastStreamId, code))
+
+    """
+        Handle a received frame (under lock)
+        @param   type       int     Frame type
+        @param   flags      int     Frame flags
+        @param   streamId   int     Stream id
+        @param   payload    bytes   Frame payload
+        @param   events     list    Events to fire once frames are processed
+        @returns None
+    """
+    def _onframe(self, type: int, flags: int, streamId: int, payload: bytes, events: list):
+        if self._headerBlock != None and (type!=Http2Framer.CONTINUATION or streamId!=self._headerBlock[0]):
+            raise Http2Error(Http2Framer.PROTOCOL_ERROR, "Header block interrupted")
+
+        if type==Http2Framer.DATA:
+            self._ondata(flags, streamId, payload, events)
+        elif type==Http2Framer.HEADERS:
+            if streamId==0:
+                raise Http2Error(Http2Framer.PROTOCOL_ERROR, "HEADERS on stream 0")
+            payload = self._unpad(flags, payload)
+            if flags & Http2Framer.PRIORITY_FLAG:
+                if len(payload)<5:
+                    raise Http2Error(Http2Framer.FRAME_SIZE_ERROR, "Truncated HEADERS priority")
+                payload = payload[5:]
+            self._headerBlock = [streamId, flags, bytearray(payload)]
+            if flags & Http2Framer.END_HEADERS:
+                self._onheaders(events)
+        elif type==Http2Framer.CONTINUATION:
+            if self._headerBlock == None:
+                raise Http2Error(Http2Framer.PROTOCOL_ERROR, "CONTINUATION without HEADERS")
+            self._headerBlock[2] += payload
+            if len(self._headerBlock[2])>self.maxHeaderListSize*2:
+                raise Http2Error(Http2Framer.ENHANCE_YOUR_CALM, "Header block too large")
+            if flags & Http2Framer.END_HEADERS:
+                self._onheaders(events)
+        elif type==Http2Framer.PRIORITY:
+            if streamId==0:
+                raise Http2Error(Http2Framer.PROTOCOL_ERROR, "PRIORITY on stream 0")
+            if len(payload)!=5:
+                raise Http2Error(Http2Framer.FRAME_SIZE_ERROR, "Invalid PRIORITY size", streamId)
+        elif type==Http2Framer.RST_STREAM:
+            if len(payload)!=4:
+                raise Http2Error(Http2Framer.FRAME_SIZE_ERROR, "Invalid RST_STREAM size")
+            if streamId==0 or streamId>self._lastStreamId:
+                raise Http2Error(Http2Framer.PROTOCOL_ERROR, "RST_STREAM on idle stream")
+            stream = self.streams.pop(streamId, None)
+            if stream != None:
+                self._drop(stream)
+        elif type==Http2Framer.SETTINGS:
+            self._onsettings(flags, streamId, payload)
+        elif type==Http2Framer.PUSH_PROMISE:
+            raise Http2Error(Http2Framer.PROTOCOL_ERROR, "PUSH_PROMISE from client")
+        elif type==Http2Framer.PING:
+            if streamId!=0:
+                raise Http2Error(Http2Framer.PROTOCOL_ERROR, "PING on a stream")
+            if len(payload)!=8:
+                raise Http2Error(Http2Framer.FRAME_SIZE_ERROR, "Invalid PING size")
+            if not flags & Http2Framer.ACK:
+                self._conn.write(self._framer.pack(Http2Framer.PING, Http2Framer.ACK, 0, payload))
+        elif type==Http2Framer.GOAWAY:
+            if streamId!=0:
+                raise Http2Error(Http2Framer.PROTOCOL_ERROR, "GOAWAY on a stream")
+            self._goaway = True
+        elif type==Http2Framer.WINDOW_UPDATE:
+            self._onwindow(streamId, payload)
+        # Unknown frame types are ignored
+
+    """
+        Complete header block received: open a stream, or end its request (trailers)
+        @param   events     list    Events to fire once frames are processed
+        @returns None
+    """
+    def _onheaders(self, events: list):
+        streamId, flags, block = self._headerBlock
+        self._headerBlock = None
+        # Always decoded, keeps dynamic table in sync
+        headers = self._hpack.decode(block)
+        stream  = self.streams.get(streamId, None)
+        if stream != None:
+            # Trailers, they end request
+            if stream.received or not flags & Http2Framer.END_STREAM:
+                raise Http2Error(Http2Framer.PROTOCOL_ERROR, "Unexpected HEADERS", streamId)
+            self._received(stream, events)
+            return
+        if streamId%2==0 or streamId<=self._lastStreamId:
+            raise Http2Error(Http2Framer.PROTOCOL_ERROR, "Invalid stream id "+str(streamId))
+        self._lastStreamId = streamId
+        if self._goaway:
+            return
+        if len(self.streams)>=self.maxStreams:
+            raise Http2Error(Http2Framer.REFUSED_STREAM, "Too many streams", streamId)
+
+        stream = Http2Stream(self, streamId, self._peerWindow)
+        stream.headers = headers
+        self.streams[streamId] = stream
+        if sum([len(name)+len(value)+32 for name, value in headers])>self.maxHeaderListSize:
+            stream.code = 431
+        if flags & Http2Framer.END_STREAM:
+            self._received(stream, events)
+
+    """
+        DATA frame, request body
+        @param   flags      int     Frame flags
+        @param   streamId   int     Stream id
+        @param   payload    bytes   Frame payload
+        @param   events     list    Events to fire once frames are processed
+        @returns None
+    """
+    def _ondata(self, flags: int, streamId: int, payload: bytes, events: list):
+        if streamId==0:
+            raise Http2Error(Http2Framer.PROTOCOL_ERROR, "DATA on stream 0")
+        stream = self.streams.get(streamId, None)
+        # Padding counts in flow control
+        self._consume(stream, len(payload), flags & Http2Framer.END_STREAM)
+        if stream == None or stream.received:
+            if streamId>self._lastStreamId:
+                raise Http2Error(Http2Framer.PROTOCOL_ERROR, "DATA on idle stream")
+            raise Http2Error(Http2Framer.STREAM_CLOSED, "DATA on closed stream", streamId)
+        if stream.code == None:
+            stream.body += self._unpad(flags, payload)
+            if len(stream.body)>self.maxRequestSize:
+                stream.code = 413
+                stream.body = bytearray()
+        if flags & Http2Framer.END_STREAM:
+            self._received(stream, events)
+
+    """
+        Give received bytes back to peer (WINDOW_UPDATE), once half of a window is consumed
+        @param   stream     Http2Stream     Stream of data (None if closed)
+        @param   length     int             Received bytes
+        @param   last       bool            Last data of stream (its window is not given back)
+        @returns None
+    """
+    def _consume(self, stream: Http2Stream, length: int, last: bool):
+        if length==0:
+            return
+        out = b''
+        self._consumed += length
+        if self._consumed>=self._recvWindow//2:
+            out += self._framer.pack(Http2Framer.WINDOW_UPDATE, 0, 0, struct.pack(">I", self._consumed))
+            self._consumed = 0
+        if stream != None and not last:
+            stream._consumed += length
+            if stream._consumed>=self._recvWindow//2:
+                out += self._framer.pack(Http2Framer.WINDOW_UPDATE, 0, stream.id, struct.pack(">I", stream._consumed))
+                stream._consumed = 0
+        if len(out)>0:
+            self._conn.write(out)
+
+    """
+        Request of a stream is complete, queue its dispatch as an http/1 request
+        @param   stream     Http2Stream     Stream
+        @param   events     list            Events to fire once frames are processed
+        @returns None
+    """
+    def _received(self, stream: Http2Stream, events: list):
+        stream.received = True
+        args = { "socket": stream, "port": self._conn._port, "ssl": self._conn._ssl }
+        if stream.code != None:
+            events.append(("invalid", {**args, "code": stream.code, "exception": Http2Error(Http2Framer.NO_ERROR, "Request of "+str(stream.code))}))
+            return
+        events.append(("data", {**args, "data": self._request(stream)}))
+        stream.headers  = None
+        stream.body     = None
+
+    """
+        Http/1 request of a stream, for protocol parsing (version 2.0)
+        @param   stream     Http2Stream     Stream with its headers and body
+        @returns bytes
+    """
+    def _request(self, stream: Http2Stream) -> bytes:
+        pseudo  = {}
+        lines   = []
+        cookies = []
+        host    = b''
+        length  = None
+        for name, value in stream.headers:
+            if b'\r' in value or b'\n' in value or b'\0' in value:
+                raise Http2Error(Http2Framer.PROTOCOL_ERROR, "Invalid header value", stream.id)
+            if name[0:1]==b':':
+                if len(lines)>0 or len(cookies)>0 or name in pseudo or not name in (b':method', b':scheme', b':path', b':authority'):
+                    raise Http2Error(Http2Framer.PROTOCOL_ERROR, "Invalid pseudo header", stream.id)
+                pseudo[name] = value
+            elif name!=name.lower() or name in self.CONNECTION_HEADERS or b' ' in name or b':' in name:
+                raise Http2Error(Http2Framer.PROTOCOL_ERROR, "Invalid header name", stream.id)
+            elif name==b'cookie':
+                # Cookie crumbs are joined back
+                cookies.append(value)
+            elif name==b'host':
+                host = value
+            else:
+                if name==b'content-length':
+                    length = value
+                lines.append(name+b': '+value)
+        if not b':method' in pseudo or not pseudo.get(b':path', b'')[0:1]==b'/' or b' ' in pseudo[b':path']:
+            raise Http2Error(Http2Framer.PROTOCOL_ERROR, "Missing or invalid pseudo headers", stream.id)
+        if length != None and length!=str(len(stream.body)).encode():
+            raise Http2Error(Http2Framer.PROTOCOL_ERROR, "Content-Length does not match body", stream.id)
+        if len(cookies)>0:
+            lines.append(b'cookie: '+b'; '.join(cookies))
+        if length == None and len(stream.body)>0:
+            lines.append(b'content-length: '+str(len(stream.body)).encode())
+        head = [pseudo[b':method']+b' '+pseudo[b':path']+b' HTTP/2.0', b'host: '+pseudo.get(b':authority', host)]+lines
+        return b'\r\n'.join(head)+b'\r\n\r\n'+bytes(stream.body)
+
+    """
+        SETTINGS frame, applied then acknowledged
+        @param   flags      int     Frame flags
+        @param   streamId   int     Stream id
+        @param   payload    bytes   Frame payload
+        @returns None
+    """
+    def _onsettings(self, flags: int, streamId: int, payload: bytes):
+        if streamId!=0:
+            raise Http2Error(Http2Framer.PROTOCOL_ERROR, "SETTINGS on a stream")
+        if flags & Http2Framer.ACK:
+            if len(payload)>0:
+                raise Http2Error(Http2Framer.FRAME_SIZE_ERROR, "SETTINGS ack with payload")
+            return
+        if len(payload)%6!=0:
+            raise Http2Error(Http2Framer.FRAME_SIZE_ERROR, "Invalid SETTINGS size")
+        for offset in range(0, len(payload), 6):
+            ident, value = struct.unpack_from(">HI", payload, offset)
+            if ident==Http2Framer.SETTINGS_HEADER_TABLE_SIZE:
+                self._hpack.setEncoderMaxSize(value)
+            elif ident==Http2Framer.SETTINGS_ENABLE_PUSH and value>1:
+                raise Http2Error(Http2Framer.PROTOCOL_ERROR, "Invalid SETTINGS_ENABLE_PUSH")
+            elif ident==Http2Framer.SETTINGS_INITIAL_WINDOW_SIZE:
+                if value>0x7fffffff:
+                    raise Http2Error(Http2Framer.FLOW_CONTROL_ERROR, "Invalid SETTINGS_INITIAL_WINDOW_SIZE")
+                # Change applies to windows of open streams
+                delta, self._peerWindow = value-self._peerWindow, value
+                for stream in self.streams.values():
+                    stream.window += delta
+                    if stream.window>0x7fffffff:
+                        raise Http2Error(Http2Framer.FLOW_CONTROL_ERROR, "Stream window overflow")
+            elif ident==Http2Framer.SETTINGS_MAX_FRAME_SIZE:
+                if value<16384 or value>16777215:
+                    raise Http2Error(Http2Framer.PROTOCOL_ERROR, "Invalid SETTINGS_MAX_FRAME_SIZE")
+                self._peerFrameSize = value
+        self._conn.write(self._framer.pack(Http2Framer.SETTINGS, Http2Framer.ACK, 0))
+
+    """
+        WINDOW_UPDATE frame, of connexion or of a stream
+        @param   streamId   int     Stream id
+        @param   payload    bytes   Frame payload
+        @returns None
+    """
+    def _onwindow(self, streamId: int, payload: bytes):
+        if len(payload)!=4:
+            raise Http2Error(Http2Framer.FRAME_SIZE_ERROR, "Invalid WINDOW_UPDATE size")
+        increment = struct.unpack(">I", payload)[0] & 0x7fffffff
+        if streamId==0:
+            if increment==0:
+                raise Http2Error(Http2Framer.PROTOCOL_ERROR, "Null window increment")
+            self._sendWindow += increment
+            if self._sendWindow>0x7fffffff:
+                raise Http2Error(Http2Framer.FLOW_CONTROL_ERROR, "Connexion window overflow")
+            return
+        if streamId>self._lastStreamId:
+            raise Http2Error(Http2Framer.PROTOCOL_ERROR, "WINDOW_UPDATE on idle stream")
+        if increment==0:
+            raise Http2Error(Http2Framer.PROTOCOL_ERROR, "Null window increment", streamId)
+        stream = self.streams.get(streamId, None)
+        if stream != None:
+            stream.window += increment
+            if stream.window>0x7fffffff:
+                raise Http2Error(Http2Framer.FLOW_CONTROL_ERROR, "Stream window overflow", streamId)
+
+    """
+        Payload without padding (PADDED flag)
+        @param   flags      int     Frame flags
+        @param   payload    bytes   Frame payload
+        @returns bytes
+    """
+    def _unpad(self, flags: int, payload: bytes) -> bytes:
+        if not flags & Http2Framer.PADDED:
+            return payload
+        if len(payload)==0 or payload[0]>=len(payload):
+            raise Http2Error(Http2Framer.PROTOCOL_ERROR, "Invalid padding")
+        return payload[1:len(payload)-payload[0]]
+
+    """
+        Connexion error: GOAWAY then close
+        @param   code   int     Error code
+        @returns None
+    """
+    def _error(self, code: int):
+        if not self.closed:
+            self._conn.end(self.goaway(code))
+
+    """
+        Reset a stream (stream error)
+        @param   streamId   int     Stream id
+        @param   code       int     Error code
+        @returns None
+    """
+    def _reset(self, streamId: int, code: int):
+        self._conn.write(self._framer.pack(Http2Framer.RST_STREAM, 0, streamId, struct.pack(">I", code)))
+        stream = self.streams.pop(streamId, None)
+        if stream != None:
+            self._drop(stream)
+
+    """
+        Forget a stream and its pending output (reset, or connexion closed)
+        @param   stream     Http2Stream
+        @returns None
+    """
+    def _drop(self, stream: Http2Stream):
+        stream._closed = True
+        for item in stream._queue:
+            if isinstance(item, list):
+                os.close(item[0])
+        stream._queue.clear()
+        stream._ondrain = []
+
+    """
+        Connexion is closed, release streams
+        @param   args   dict    Event "close" of connexion
+        @returns None
+    """
+    def _onclose(self, args: dict):
+        with self._lock:
+            self.closed = True
+            for stream in self.streams.values():
+                self._drop(stream)
+            self.streams.clear()
+            self._active.clear()
+
+    """
+        Response data of a stream: first its http/1 head (sent as HEADERS), then body
+        @param   stream     Http2Stream
+        @param   data       bytes
+        @returns None
+    """
+    def _write(self, stream: Http2Stream, data: bytes):
+        with self._lock:
+            if stream.closed or stream._ending:
+                return
+            if not stream._headSent:
+                stream._head += data
+                end = stream._head.find(b'\r\n\r\n')
+                if end<0:
+                    return
+                data = stream._head[end+4:]
+                self._sendHeaders(stream, bytes(stream._head[0:end]))
+                stream._head = None
+            if len(data)>0:
+                # Copied, caller buffer (mapped file slice) may be released
+                stream._queue.append(memoryview(bytes(data)))
+                self._schedule(stream)
+        self._wakeup()
+
+    """
+        Send response head of a stream as HEADERS (and CONTINUATION) frames
+        @param   stream     Http2Stream
+        @param   head       bytes   Http/1 status line and headers
+        @returns None
+    """
+    def _sendHeaders(self, stream: Http2Stream, head: bytes):
+        lines   = head.split(b'\r\n')
+        status  = lines[0].split(b' ')
+        headers = [(b':status', status[1] if len(status)>1 else b'500')]
+        for line in lines[1:]:
+            name, separator, value = line.partition(b':')
+            name = name.strip().lower()
+            if separator and len(name)>0 and not name in self.CONNECTION_HEADERS:
+                headers.append((name, value.strip()))
+        block  = self._hpack.encode(headers)
+        size   = self._peerFrameSize
+        out    = []
+        for offset in range(0, max(1, len(block)), size):
+            type  = Http2Framer.HEADERS if offset==0 else Http2Framer.CONTINUATION
+            flags = Http2Framer.END_HEADERS if offset+size>=len(block) else 0
+            out.append(self._framer.pack(type, flags, stream.id, block[offset:offset+size]))
+        # Header blocks are written in encoding order, under lock
+        self._conn.write(b''.join(out))
+        stream._headSent = True
+
+    """
+        Response of a stream is complete, END_STREAM once its data is sent
+        @param   stream     Http2Stream
+        @returns None
+    """
+    def _finish(self, stream: Http2Stream):
+        with self._lock:
+            if stream.closed or stream._ending:
+                return
+            if not stream._headSent:
+                # Closed without response
+                self._reset(stream.id, Http2Framer.INTERNAL_ERROR)
+                return
+            stream._ending = True
+            self._schedule(stream)
+        self._wakeup()
+
+    """
+        Queue a file segment of a stream, read by slices when sent
+        @param   stream     Http2Stream
+        @param   file       file        File opened in binary mode
+        @param   offset     int         First byte
+        @param   count      int         Bytes to send
+        @param   callback   Callable    Called once segment is framed
+        @returns None
+    """
+    def _sendfile(self, stream: Http2Stream, file, offset: int, count: int, callback: Callable):
+        with self._lock:
+            if stream.closed or stream._ending or not stream._headSent:
+                return
+            # Own descriptor, file may be closed by its owner before segment is sent
+            stream._queue.append([os.dup(file.fileno()), offset, count, callback])
+            self._schedule(stream)
+        self._wakeup()
+
+    """
+        Call back once queued data of a stream has been framed
+        @param   stream     Http2Stream
+        @param   callback   Callable
+        @returns None
+    """
+    def _drain(self, stream: Http2Stream, callback: Callable):
+        with self._lock:
+            if len(stream._queue)>0 and not stream.closed:
+                stream._ondrain.append(callback)
+                return
+        callback()
+
+    """
+        Add a stream to round robin of streams with output
+        @param   stream     Http2Stream
+        @returns None
+    """
+    def _schedule(self, stream: Http2Stream):
+        if not stream._scheduled:
+            stream._scheduled = True
+            self._active.append(stream)
+
+    """
+        Flush streams output: on next loop turn (event loop), so a response written then finished ends with its last DATA frame
+        @returns None
+    """
+    def _wakeup(self):
+        if self._conn.loop == None:
+            self._flush()
+            return
+        with self._lock:
+            if self._woken:
+                return
+            self._woken = True
+        self._conn.loop.callSoon(self._onwakeup)
+
+    """
+        Scheduled flush (event loop)
+        @returns None
+    """
+    def _onwakeup(self):
+        with self._lock:
+            self._woken = False
+        self._flush()
+
+    """
+        Write frames of streams as windows allow, then wait for connexion drain (event loop)
+        Own thread connexions write synchronously, frames are written until windows or queues are empty
+        @returns None
+    """
+    def _flush(self):
+        while True:
+            callbacks = []
+            with self._lock:
+                if self._waiting or self.closed or self._conn.closed:
+                    return
+                out = bytearray()
+                while len(out)<self.FLUSH_BUDGET and self._nextFrame(out, callbacks):
+                    pass
+                if len(out)>0:
+                    self._conn.write(bytes(out))
+                    self._waiting = self._conn.loop != None
+            if self._waiting:
+                self._conn.drain(self._ondrain)
+            for callback in callbacks:
+                if self._conn.loop != None:
+                    self._conn.loop.callSoon(callback)
+                else:
+                    callback()
+            if len(out)==0 or self._waiting:
+                return
+
+    """
+        Connexion has sent written frames (event loop)
+        @returns None
+    """
+    def _ondrain(self):
+        with self._lock:
+            self._waiting = False
+        self._flush()
+
+    """
+        Append next DATA frame of round robin (under lock)
+        @param   out        bytearray   Frames to write
+        @param   callbacks  list        Callbacks to call once frames are written
+        @returns bool                   False if no stream can send
+    """
+    def _nextFrame(self, out: bytearray, callbacks: list) -> bool:
+        for i in range(len(self._active)):
+            stream = self._active.popleft()
+            if stream.closed:
+                stream._scheduled = False
+                continue
+            if len(stream._queue)>0:
+                size = min(self._peerFrameSize, stream.window, self._sendWindow)
+                if size<=0:
+                    # Blocked by flow control until a WINDOW_UPDATE
+                    self._active.append(stream)
+                    continue
+                data = self._take(stream, size, callbacks)
+                stream.window    -= len(data)
+                self._sendWindow -= len(data)
+                last = stream._ending and len(stream._queue)==0
+                out += self._framer.pack(Http2Framer.DATA, Http2Framer.END_STREAM if last else 0, stream.id, data)
+            elif stream._ending:
+                last = True
+                out += self._framer.pack(Http2Framer.DATA, Http2Framer.END_STREAM, stream.id)
+            else:
+                stream._scheduled = False
+                continue
+
+            if len(stream._queue)==0:
+                callbacks.extend(stream._ondrain)
+                stream._ondrain = []
+            if last:
+                stream._closed    = True
+                stream._scheduled = False
+                self.streams.pop(stream.id, None)
+            elif len(stream._queue)==0:
+                stream._scheduled = False
+            else:
+                self._active.append(stream)
+            return True
+        return False
+
+    """
+        Take up to size bytes from head of stream queue
+        @param   stream     Http2Stream
+        @param   size       int         Max bytes
+        @param   callbacks  list        Callbacks of file segments completely read
+        @returns bytes
+    """
+    def _take(self, stream: Http2Stream, size: int, callbacks: list) -> bytes:
+        item = stream._queue[0]
+        if isinstance(item, memoryview):
+            if len(item)<=size:
+                stream._queue.popleft()
+                return item
+            stream._queue[0] = item[size:]
+            return item[0:size]
+        fd, offset, count, callback = item
+        data = os.pread(fd, min(size, count), offset)
+        item[1] += len(data)
+        item[2] -= len(data)
+        if item[2]<=0 or len(data)==0:
+            # Segment is sent (or file is shorter than expected)
+            os.close(fd)
+            stream._queue.popleft()
+            callbacks.append(callback)
+        return data
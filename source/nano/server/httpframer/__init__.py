@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+"""
+    Exception for malformed or oversized request, with http code to answer
+"""
+class FramingError(Exception):
+
+    """
+        Constructor
+        @param   code       int     Http code (400, 413, 431...)
+        @param   message    str     Reason
+        @returns None
+    """
+    def __init__(self, code: int, message: str):
+        Exception.__init__(self, message)
+        self.code = code
+
+"""
+    Class for cutting a received byte stream into complete http requests or websocket frames
+"""
+class HttpFramer():
+
+    TERMINATOR      = b'\r\n\r\n'
+    MAX_CHUNK_LINE  = 1024      # Chunk size line, with extensions
+
+    """
+        Constructor
+        @param   maxRequestSize int     Max size of a request (headers and body)
+        @param   maxHeadersSize int     Max size of headers block
+        @returns None
+    """
+    def __init__(self, maxRequestSize: int = 8388608, maxHeadersSize: int = 65536):
+        self.maxRequestSize = maxRequestSize
+        self.maxHeadersSize = maxHeadersSize
+        self.websocket      = False
+        self._buffer        = bytearray()
+        self._start         = 0         # Start of current frame in buffer
+        self._scanned       = 0         # Offset already searched for headers terminator
+        self._headerEnd     = -1        # End of current headers (after terminator), -1 if unknown
+        self._length        = -1        # Content-Length of current request, -1 if chunked
+        self._chunkOffset   = -1        # Next chunk size line of current chunked request
+        self._chunkBody     = None      # Decoded chunked body
+
+    """
+        Append received data
+        @param   data   bytes   Received data
+        @returns None
+    """
+    def feed(self, data: bytes):
+        self._buffer += data
+
+    """
+        Bytes received but not framed yet
+        @returns int
+    """
+    def pending(self) -> int:
+        return len(self._buffer)-self._start
+
+    """
+        Framing state of current request, for read timeouts
+        @returns str    "idle" (nothing received), "headers" (headers incomplete) or "body" (body incomplete)
+    """
+    def state(self) -> str:
+        if self._start>=len(self._buffer):
+            return "idle"
+        if self._headerEnd<0:
+            return "headers"
+        return "body"
+
+    """
+        Next complete frame, as a view on internal buffer (release it before compact)
+        @returns memoryview     Complete request (or websocket frame), None if more data is needed
+    """
+    def next(self) -> memoryview:
+        if self._start>=len(self._buffer):
+            return None
+        if self.websocket:
+            return self._nextWebsocket()
+        return self._nextHttp()
+
+    """
+        Drop framed data from buffer, once no view on it is used anymore
+        @returns None
+    """
+    def compact(self):
+        if self._start==0:
+            return
+        shift = self._start
+        try:
+            del self._buffer[:shift]
+        except BufferError:
+            # A view is still exported, let it keep old buffer
+            self._buffer = bytearray(memoryview(self._buffer)[shift:])
+        self._start = 0
+        self._scanned = max(0, self._scanned-shift)
+        if self._headerEnd>=0:
+            self._headerEnd -= shift
+        if self._chunkOffset>=0:
+            self._chunkOffset -= shift
+
+    """
+        Frame an http request: headers, then Content-Length bytes or chunked body
+        @returns memoryview
+    """
+    def _nextHttp(self) -> memoryview:
+
+        # Find headers end once
+        if self._headerEnd<0:
+            pos = self._buffer.find(self.TERMINATOR, max(self._start, self._scanned-3))
+            if pos<0:
+                self._scanned = len(self._buffer)
+                if self._scanned-self._start>self.maxHeadersSize:
+                    raise FramingError(431, "Request headers too large")
+                return None
+            self._headerEnd = pos+4
+            self._readHeaders()
+
+        # Chunked body
+        if self._length<0:
+            return self._nextChunked()
+
+        end = self._headerEnd+self._length
+        if end>len(self._buffer):
+            return None
+        return self._emit(end)
+
+    """
+        Read body framing headers (Content-Length, Transfer-Encoding) of current request
+        @returns None
+    """
+    def _readHeaders(self):
+        self._length = 0
+        chunked      = False
+        with memoryview(self._buffer)[self._start:self._headerEnd-4] as view:
+            head = bytes(view)
+        for line in head.split(b'\r\n')[1:]:
+            pos = line.find(b':')
+            if pos<=0:
+                continue
+            name = line[:pos].strip().lower()
+            if name==b'content-length':
+                try:
+                    self._length = int(line[pos+1:].strip())
+                except ValueError:
+                    raise FramingError(400, "Invalid Content-Length")
+                if self._length<0:
+                    raise FramingError(400, "Invalid Content-Length")
+            elif name==b'transfer-encoding' and line[pos+1:].strip().lower().endswith(b'chunked'):
+                chunked = True
+        if chunked:
+            # Transfer-Encoding wins over Content-Length
+            self._length        = -1
+            self._chunkOffset   = self._headerEnd
+            self._chunkBody     = bytearray()
+        if self._headerEnd-self._start+max(0, self._length)>self.maxRequestSize:
+            raise FramingError(413, "Request too large")
+
+    """
+        Decode available chunks of current chunked request
+        @returns memoryview     Request rebuilt with Content-Length, None if incomplete
+    """
+    def _nextChunked(self) -> memoryview:
+        while True:
+            pos = self._buffer.find(b'\r\n', self._chunkOffset, self._chunkOffset+self.MAX_CHUNK_LINE+2)
+            if pos<0:
+                if len(self._buffer)-self._chunkOffset>self.MAX_CHUNK_LINE:
+                    raise FramingError(400, "Chunk size line too long")
+                return None
+            try:
+                size = int(bytes(self._buffer[self._chunkOffset:pos]).split(b';')[0].strip(), 16)
+            except ValueError:
+                raise FramingError(400, "Invalid chunk size")
+            if size<0:
+                raise FramingError(400, "Invalid chunk size")
+            # Declared size is checked before waiting for its bytes
+            if self._headerEnd-self._start+len(self._chunkBody)+size>self.maxRequestSize:
+                raise FramingError(413, "Request too large")
+
+            if size==0:
+                # Last chunk, then trailers up to an empty line
+                if self._buffer[pos:pos+4]==self.TERMINATOR:
+                    end = pos+4
+                elif self._buffer[pos:pos+2]==b'\r\n' and self._buffer.find(self.TERMINATOR, pos)>=0:
+                    end = self._buffer.find(self.TERMINATOR, pos)+4
+                elif len(self._buffer)-pos>self.maxHeadersSize:
+                    raise FramingError(431, "Chunked trailers too large")
+                else:
+                    return None
+                break
+
+            if pos+2+size+2>len(self._buffer):
+                return None
+            self._chunkBody += self._buffer[pos+2:pos+2+size]
+            self._chunkOffset = pos+2+size+2
+
+        # Rebuild request with its own Content-Length only, body is a copy here
+        lines = []
+        with memoryview(self._buffer)[self._start:self._headerEnd-4] as view:
+            for line in bytes(view).split(b'\r\n'):
+                if not line.lower().startswith((b'transfer-encoding:', b'content-length:')):
+                    lines.append(line)
+        lines.append(b'Content-Length: '+str(len(self._chunkBody)).encode('ascii'))
+        request = b'\r\n'.join(lines)+self.TERMINATOR+bytes(self._chunkBody)
+
+        self._start       = end
+        self._reset()
+        return memoryview(request)
+
+    """
+        Frame a websocket frame, from its length header
+        @returns memoryview
+    """
+    def _nextWebsocket(self) -> memoryview:
+        available = len(self._buffer)-self._start
+        if available<2:
+            return None
+        first  = self._buffer[self._start+1]
+        length = first & 127
+        head   = 2
+        if length==126:
+            head = 4
+            if available<head:
+                return None
+            length = int.from_bytes(self._buffer[self._start+2:self._start+4], "big")
+        elif length==127:
+            head = 10
+            if available<head:
+                return None
+            length = int.from_bytes(self._buffer[self._start+2:self._start+10], "big")
+        if first & 128:
+            head += 4       # Mask
+        if length>self.maxRequestSize:
+            raise FramingError(413, "Websocket frame too large")
+        end = self._start+head+length
+        if end>len(self._buffer):
+            return None
+        return self._emit(end)
+
+    """
+        Give a view on buffer from current frame start to end, move to next frame
+        @param   end    int     End of frame in buffer
+        @returns memoryview
+    """
+    def _emit(self, end: int) -> memoryview:
+        view        = memoryview(self._buffer)[self._start:end]
+        self._start = end
+        self._reset()
+        return view
+
+    """
+        Forget current request framing state
+        @returns None
+    """
+    def _reset(self):
+        self._scanned       = self._start
+        self._headerEnd     = -1
+        self._length        = -1
+        self._chunkOffset   = -1
+        self._chunkBody     = None
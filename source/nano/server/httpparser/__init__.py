@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+from nano.server.httpframer     import FramingError
+
+import re
+import sys
+
+"""
+    Class for parsing an http request head on bytes, as framed from socket: request line and headers
+    Header names map to camelCase keys ("content-type" -> "contentType") through a table
+    Every kept header value is decoded (latin-1): request.headers is a plain dict read by applications,
+    decoding a value costs less than deferring it, body is left raw
+"""
+class HttpParser():
+
+    REQUEST_LINE    = re.compile(rb'([A-Za-z]+) ([!-~]+) (HTTP)/([0-9]+\.[0-9]+)', re.IGNORECASE)
+    HEADER_NAME     = re.compile(rb'[A-Za-z0-9\-]+')
+    CONTROLS        = re.compile(rb'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]|\r(?!\n)|(?<!\r)\n')   # CR and LF only as line ends
+    MAX_NAMES       = 1024      # Header names remembered (known ones and first unknown ones seen)
+
+    # Known header names, their camelCase key is built once
+    KNOWN_HEADERS   = [
+        b'host', b'user-agent', b'accept', b'accept-encoding', b'accept-language', b'accept-charset',
+        b'connection', b'keep-alive', b'upgrade', b'upgrade-insecure-requests', b'te', b'expect',
+        b'content-type', b'content-length', b'content-encoding', b'transfer-encoding',
+        b'cookie', b'authorization', b'referer', b'origin', b'cache-control', b'pragma', b'priority', b'dnt',
+        b'if-match', b'if-none-match', b'if-modified-since', b'if-unmodified-since', b'if-range', b'range',
+        b'sec-websocket-key', b'sec-websocket-version', b'sec-websocket-extensions', b'sec-websocket-protocol',
+        b'sec-fetch-dest', b'sec-fetch-mode', b'sec-fetch-site', b'sec-fetch-user',
+        b'sec-ch-ua', b'sec-ch-ua-mobile', b'sec-ch-ua-platform',
+        b'via', b'forwarded', b'x-forwarded-for', b'x-forwarded-host', b'x-forwarded-proto', b'x-real-ip', b'x-requested-with'
+    ]
+
+    """
+        Constructor
+        @param   maxHeadersSize int     Max size of headers block (as framer)
+        @param   maxHeaderSize  int     Max size of a header line ("http.maxheaderSize")
+        @returns None
+    """
+    def __init__(self, maxHeadersSize: int = 65536, maxHeaderSize: int = 4096):
+        self.maxHeadersSize = maxHeadersSize
+        self.maxHeaderSize  = maxHeaderSize
+        self._names         = {name: sys.intern(self._camelCase(name)) for name in self.KNOWN_HEADERS}
+        self._methods       = {}    # Raw method -> lowercase method
+
+    """
+        Identify protocol of received data: websocket frame (text or close) or http request line
+        @params  data       bytes           Data received
+        @returns protocol   str             "http", "websocket", None if not recognized
+    """
+    def identify(self, data) -> str:
+        if data[0]==129 or data[0]==136:
+            return 'websocket'
+        head = bytes(data[0:4096])
+        if self._requestLine(head, head.find(b'\r\n')) != None:
+            return 'http'
+        return None
+
+    """
+        Parse request: request line and headers, only head is copied out of socket buffer, body is left raw
+        @params  data       bytes           Framed request (bytes or memoryview)
+        @returns tuple                      (method, target, protocol, version, headers, body), None if request line is invalid
+    """
+    def parse(self, data) -> tuple:
+        head = bytes(data[0:self.maxHeadersSize+4])
+        end  = head.find(b'\r\n\r\n')
+        body = b''
+        if end<0:
+            end  = len(head)
+        else:
+            body = data[end+4:]
+        lineEnd = head.find(b'\r\n', 0, end+2)
+        line    = self._requestLine(head, lineEnd)
+        if line == None:
+            return None
+        return line+(self.headers(head, lineEnd+2, end), body)
+
+    """
+        Parse request line
+        @params  head       bytes           Request head
+        @params  end        int             End of request line (CRLF offset), -1 if missing
+        @returns tuple                      (method, target, protocol, version), None if invalid
+    """
+    def _requestLine(self, head: bytes, end: int) -> tuple:
+        if end<0:
+            return None
+        output = self.REQUEST_LINE.fullmatch(head, 0, end)
+        if output == None:
+            return None
+        method = self._methods.get(output.group(1), None)
+        if method == None:
+            method = output.group(1).decode('ascii').lower()
+            if len(self._methods)<self.MAX_NAMES:
+                self._methods[output.group(1)] = method
+        return (method, output.group(2).decode('ascii'), output.group(3).decode('ascii').lower(), output.group(4).decode('ascii'))
+
+    """
+        Parse header lines, lines which are not "name: value" are ignored, last one of a name wins
+        @params  head       bytes           Request head
+        @params  start      int             Offset of first header line
+        @params  end        int             End of last header line
+        @returns dict                       Decoded values by camelCase name
+                                            Raises FramingError: 400 on control characters, 431 on a line over max header size
+    """
+    def headers(self, head: bytes, start: int, end: int) -> dict:
+        if self.CONTROLS.search(head, start, end) != None:
+            raise FramingError(400, "Control character in header")
+        headers = {}
+        names   = self._names
+        while start<end:
+            lineEnd = head.find(b'\r\n', start, end)
+            if lineEnd<0:
+                lineEnd = end
+            if lineEnd-start>self.maxHeaderSize:
+                raise FramingError(431, "Request header too large")
+            colon = head.find(b':', start, lineEnd)
+            if colon>start:
+                raw  = head[start:colon]
+                name = names.get(raw, None)
+                if name == None:
+                    name = self._name(raw)
+                if name != None:
+                    value = head[colon+1:lineEnd].strip(b' \t')
+                    if len(value)>0:
+                        headers[name] = value.decode('latin-1')
+            start = lineEnd+2
+        return headers
+
+    """
+        camelCase key of a header name not in table yet (any case), remembered while table is not full
+        @params  raw        bytes           Header name as received
+        @returns str                        None if name is not a valid token
+    """
+    def _name(self, raw: bytes) -> str:
+        lower = raw.lower()
+        name  = self._names.get(lower, None)
+        if name == None:
+            if self.HEADER_NAME.fullmatch(raw) == None:
+                return None
+            name = sys.intern(self._camelCase(lower))
+        if len(self._names)<self.MAX_NAMES:
+            self._names[raw] = name
+        return name
+
+    """
+        Convert header name to camelCase: "x-forwarded-for" -> "xForwardedFor"
+        @params  name       bytes           Header name
+        @returns str
+    """
+    def _camelCase(self, name: bytes) -> str:
+        words = name.decode('ascii').lower().split('-')
+        return words[0]+''.join([word[0:1].upper()+word[1:] for word in words[1:]])
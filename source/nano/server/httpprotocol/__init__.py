@@ -5,9 +5,17 @@ from nano.server.socketwrapper         import SocketWrapper
 from nano.server.httprequest           import HttpRequest
 from nano.server.httpresponse          import HttpResponse
 from nano.server.filebuffer            import FileBuffer
+from nano.server.assetcache            import AssetCache
+from nano.server.pathcache             import PathCache
+from nano.server.compressor            import Compressor
+from nano.server.shaper                import Shaper
+from nano.server.httpparser            import HttpParser
+from nano.server.httpframer            import FramingError
+from nano.server.vhostkey              import VhostKey
 
 import os
 import re
+import json
 import hashlib
 import base64
 import time
@@ -36,6 +44,7 @@ class HttpProtocol():
     """
     def __init__(self, dirRoot: str, config: Config):
         self.vhosts             = config.get("vhost", [])
+        self.vhostKey           = VhostKey()
         self.SERVER             = config.get("serverName", "Server")
         self.DIR_ROOT           = dirRoot
         self.DS                 = os.path.sep
@@ -47,8 +56,40 @@ class HttpProtocol():
         self.MIME_DEFAULT       = config.get("mimes.default", "application/octet-stream")
         self.MIMES              = config.get("mimes.byExtensions", {})
         self.BANDWIDTH_CHUNKSIZE= config.get("http.bandWidth.chunkSize", 256000)
-        self.BANDWIDTH_DELAY    = config.get("http.bandWidth.delay", 500)
+        self.KEEPALIVE_TIMEOUT  = config.get("http.keepAlive.timeout", 5)
+        self.KEEPALIVE_MAX      = config.get("http.keepAlive.maxRequests", 100)
+        self.draining           = False     # Server is stopping, connexions close after their response
+        self.ASSET_CACHE        = config.get("http.assetCache", {})
+        self.MAX_RANGES         = config.get("http.range.maxRanges", 16)
         self._socketCache       = {}
+        self._parser            = HttpParser(config.get("http.maxHeadersSize", 65536), self.MAX_HEADER_SIZE)
+        self._assetCaches       = {}
+        self._pathCache         = PathCache(config.get("http.pathCache.maxEntries", 4096), config.get("http.pathCache.ttl", 2))
+        self.COMPRESSION        = config.get("http.compression.enabled", False)
+        self.ETAG_VIEWS         = config.get("http.etag.views", False)
+        self.IMMUTABLE          = config.get("http.fingerprint.cacheControl", "public, max-age=31536000, immutable")
+        self._compressor        = Compressor(
+            config.get("http.compression.level", 6),
+            config.get("http.compression.minSize", 1024),
+            config.get("mimes.compressible", []),
+            config.get("http.compression.cacheBudget", 8388608)
+        )
+        self._fingerprints      = {}
+        self._shaper            = Shaper(
+            config.get("http.bandWidth.rate", 0),
+            config.get("http.bandWidth.burst", None),
+            config.get("http.bandWidth.clientRate", 0),
+            config.get("http.bandWidth.clientBurst", None),
+            config.get("http.bandWidth.maxClients", 4096)
+        )
+        for vhost in self.vhosts:
+            if "bandWidth" in vhost:
+                self._shaper.vhost(self.vhostKey.key(vhost), vhost["bandWidth"].get("rate", 0), vhost["bandWidth"].get("burst", None))
+
+        # Load hot assets before first request
+        for vhost in self.vhosts:
+            if self._assetCacheConfig(vhost).get("warm", False):
+                self._warmAssets(vhost)
 
     """
         Parse data from socket
@@ -60,13 +101,10 @@ class HttpProtocol():
     """
     def parse(self, socket: SocketWrapper, port: int, ssl:bool, data: bytes) -> (HttpRequest, HttpResponse):
 
-        proto = self.identifyProtocol(data)
-        if proto=='http':
-            return self.httpParse(socket, port, ssl, data)
-        if proto=='websocket':
+        if data[0]==129 or data[0]==136:
             return self.websocketParse(socket, port, ssl, data)
-        # else prococol not recognozed
-        socket.close()
+        # Http request line is checked by parser, other protocols are closed
+        return self.httpParse(socket, port, ssl, data)
 
     """
         Identify protocol from received data
@@ -74,22 +112,7 @@ class HttpProtocol():
         @returns protocol   str             Protocol name (expect http or websocket)
     """
     def identifyProtocol(self, data) -> str:
-
-        # Look first line for identify protocol
-        if data[0]==129 or data[0]==136:
-            return 'websocket'
-
-        line = data
-        pos = data.find(13) # \n
-        if pos >= 0:
-            line = data[0:pos]
-        line = line.decode('utf-8')
-
-        find = re.search('^[A-Z]+\\s[^\\s]+\\sHTTP\\/[0-9]+\\.[0-9]+[\\r\\n]*', line, flags=re.IGNORECASE)
-        if find != None:
-            return 'http'
-
-        return None
+        return self._parser.identify(data)
 
     """
         Parse http request
@@ -101,25 +124,30 @@ class HttpProtocol():
     """
     def httpParse(self, socket: SocketWrapper, port: int, ssl:bool, data: bytes) -> (HttpRequest, HttpResponse):
 
-        data = data.decode('utf-8')
-
-        request = HttpRequest()
-        request.ssl = ssl
+        # Request line and headers are parsed on bytes, body is decoded only if any
+        try:
+            parsed = self._parser.parse(data)
+        except FramingError as e:
+            socket.end(self._respondHttpCode("1.1", e.code))
+            return None, None
+        if parsed == None:
+            # Protocol not recognized
+            socket.close()
+            return None, None
+        (method, target, protocol, version, headers, body) = parsed
+
+        request                         = HttpRequest()
+        request.ssl                     = ssl
+        request.method                  = method
+        request.protocol                = protocol
+        request.scheme                  = protocol
+        request.version                 = version
+        request.headers                 = headers
+        request.headers["queryString"]  = target
         request.headers["localHost"], request.headers["localPort"] = socket._local
         request.headers["remoteHost"], request.headers["remotePort"] = socket._remote
-
-        # Check http structure
-        #matches = data.match(/^([a-zA-Z]+)\s([ -~]+)\sHTTP\/([0-9]+\.[0-9]+)\r\n/i);
-        output = re.search('(?s)^([a-zA-Z]+)\s([ -~]+)\sHTTP\/([0-9]+\.[0-9]+)\r\n', data, flags=re.IGNORECASE)
-        if output is not None:
-            output                          = output.group(0)
-            buffer                          = output.split(" ")
-            request.method                  = buffer[0].lower()
-            request.headers["queryString"]  = buffer[1]
-            protocol                        = buffer[2].split("/")
-            request.protocol                = protocol[0].lower()
-            request.scheme                  = request.protocol
-            request.version                 = protocol[1][:-2].lower()
+        if len(body)>0:
+            request.body = str(body, 'utf-8', 'replace')
 
         # Chech http protocol version
         if not request.version in self.VERSIONS:
@@ -136,29 +164,6 @@ class HttpProtocol():
             socket.end(self._respondHttpCode(request.version, 405))
             return None, None
 
-        # Parse headers
-        try:
-            pos = data.index("\r\n\r\n")
-        except ValueError as e:
-            pos = -1
-        headers = None
-        if pos>0:
-            headers = data[:pos]
-            if pos<len(data)-4:
-                request.body = data[pos+4:]
-        else:
-            headers = data
-        headers = headers.split("\r\n")
-        headers = headers[1:]
-        for header in headers:
-            if len(header)>self.MAX_HEADER_SIZE:
-                socket.end(self._respondHttpCode(request.version, 431))
-                return None, None
-            output = re.search('^([a-zA-Z\-]+):\s{0,1}([ -~]+)$', header, flags=re.IGNORECASE)
-            if output is not None:
-                buffer = output.group(0)
-                request.headers[self._httpname2camelcase(output.group(1))] = output.group(2)
-
         # Cookies
         if "Cookie" in request.headers:
             for cookie in request.headers["Cookie"]:
@@ -193,11 +198,10 @@ class HttpProtocol():
         if "host" in request.headers:
             host = request.headers["host"]
             for vhost in self.vhosts:
-                if vhost["port"]==port:
+                if port in self.vhostPorts(vhost):
                     for hostrule in vhost["hosts"]:
-                        pattern = "^"+hostrule+"$"
-                        output = re.search(pattern, host, flags=re.IGNORECASE)
-                        if output != None:
+                        pattern = self.hostPattern(hostrule)
+                        if pattern != None and pattern.search(host) != None:
                             request.vhost = vhost
                             break
                     if request.vhost != None:
@@ -205,12 +209,13 @@ class HttpProtocol():
 
         # Socket cache
         key = str(hash(socket))
+        if not key in self._socketCache:
+            socket.on("close" , lambda args: self._socketCache.pop(key, None))
         self._socketCache[key] = {
             "protocolVersion"   : request.version,
             "headers"           : request.headers.copy(),
             "vhost"             : request.vhost
         }
-        socket.on("close" , lambda args: self._socketCache.pop(key, None))
 
         # DIR_ROOT
         if request.vhost != None:
@@ -256,6 +261,7 @@ class HttpProtocol():
             ])
 
             socket.write(bytes("".join(buffer), encoding='utf-8'))
+            socket.finish()
 
             # update socket behaviour
             socket.terminator = None
@@ -293,14 +299,14 @@ class HttpProtocol():
         elif request.method=="post":
             boundary = None
             if "contentType" in request.headers:
-                output = re.search('(?s)\sboundary=([\-0-9]+)$', data, flags=re.IGNORECASE)
+                output = re.search('(?s)\sboundary=([\-0-9]+)$', request.body, flags=re.IGNORECASE)
                 if output is not None:
                     if "contentLength" not in request.headers:
                         socket.end(self._respondHttpCode(request.version, 411))
                         return None, None
                     boundary = output.group(1)
 
-            output = request.body.search("(?s)^(\-+[0-9]+)\r\n", data, flags=re.IGNORECASE)
+            output = re.search("(?s)^(\-+[0-9]+)\r\n", request.body, flags=re.IGNORECASE)
             if output is not None:
                 try:
                     pos = output.group(1).index(boundary)
@@ -386,20 +392,22 @@ class HttpProtocol():
                 # Request size
                 if len(data)>self.MAX_REQUEST_SIZE:
                     socket.end(self._respondHttpCode(request.version, 413))
-                    return None                        
+                    return None, None
                 buffer = request.body.split('&')
                 for value in buffer:
                     try:
                         pos = value.index('=')
                     except ValueError as e:
                         pos = -1
-                    request.post[value[0, pos]] = value[pos+1:]
+                    if pos<0:
+                        pos = len(value)
+                    request.post[value[0:pos]] = value[pos+1:]
 
         else:
             # Request size
             if len(data)>self.MAX_REQUEST_SIZE:
                 socket.end(self._respondHttpCode(request.version, 413))
-                return None
+                return None, None
 
         response            = HttpResponse()
         response.code       = 200
@@ -410,6 +418,13 @@ class HttpProtocol():
             "server": self.SERVER,
             "date"  : self._httpgmtdate(),
         }
+        socket.requests        += 1
+        response.keepAlive      = self._keepAlive(socket, request)
+        response.keepAliveMax   = self.KEEPALIVE_MAX-socket.requests
+        response.acceptEncoding = request.headers.get("acceptEncoding", "")
+        response.conditions     = {name: request.headers[name] for name in ["ifMatch", "ifNoneMatch", "ifModifiedSince"] if name in request.headers}
+        response.shaping        = (self.vhostKey.key(request.vhost), request.headers["remoteHost"])
+        response.head           = request.method=="head"
 
         # Asset mamagement
         assetPath   = dirRoot + "public" + self.DS
@@ -427,89 +442,323 @@ class HttpProtocol():
         if pos>0:
             filename = filename[0:pos]
 
+        # Fingerprinted url (see precompress.py) is its file, never revalidated by browsers while file is the hashed one
+        original, current = self._fingerprint(dirRoot, filename)
+        if original != None:
+            filename = original
+            if current:
+                response.headers["cacheControl"] = self.IMMUTABLE
+
         # queryString match with a file
         path        = os.path.abspath(assetPath + filename.lstrip("/").replace("/", self.DS))
-        if os.path.isfile(path):
+
+        # Hot assets are served from memory, without filesystem access
+        cache       = self._assetCache(request.vhost)
+        cacheable   = cache != None and not "range" in request.headers and path[0:len(assetPath)]==assetPath
+        if cacheable:
+            asset = cache.get(path)
+            if asset != None:
+                self._sendAsset(socket, request, response, asset)
+                return None, None
+
+        # Dynamic routes are known missing files, no filesystem access until ttl is over
+        if self._pathCache.lookup(path)["kind"]==PathCache.FILE:
             
             # Not alloed to leave app/public directory for assets
             if path[0:len(assetPath)]!=assetPath:
                 socket.end(self._respondHttpCode(request.version, 400))
                 return None, None
 
-            # Extension
-            ext = ""
-            try:
-                pos = path.rindex('.')
-                ext = path[pos:]
-            except ValueError as e:
-                pos = -1  
-            contentType = self.MIME_DEFAULT
-            if ext in self.MIMES:
-                contentType = self.MIMES[ext]
-            response.headers["contentType"] = contentType
-            response.headers["connection"] = "close" #"keep-alive"
-            if "connection" in request.headers:
-                response.headers["connection"] = request.headers["connection"]
-            
             stat            = os.stat(path)
+
+            # Small file, read once then served from memory
+            if cacheable and stat.st_size<=cache.maxFileSize:
+                self._sendAsset(socket, request, response, self._loadAsset(cache, path, stat))
+                return None, None
+
+            response.headers["contentType"] = self._mimeType(path)
+            self._connectionHeaders(response)
+
             byteStart       = 0
-            byteFinish      = stat.st_size-1
             byteLength      = stat.st_size
-            partialContent  = False            
 
-            # 304 not modified
-            mtime       = os.path.getmtime(path)
-            if "ifModifiedSince" in request.headers:
-                stime = self._httpfromgmttime(request.headers["ifModifiedSince"])
-                if mtime<=stime:
+            # 304 not modified, 412 precondition failed
+            mtime       = stat.st_mtime
+            response.headers["etag"] = self._etag(stat)
+            code        = self._preconditions(response.conditions, response.headers["etag"], mtime)
+            if code != None:
+                if code==304:
                     response.headers["acceptRanges"] = 'bytes'
-                    response.headers["contentLength"] = str(byteLength)
-                    response.headers["cacheControl"] = 'public'
-                    socket.end(self._httpFormatHeaders(request.version, 304, response.headers))
-                    return None, None            
-
-            # 206 partial content
-            if "range" in request.headers:
-                partialContent = True
-                output = re.search('^bytes=([0-9]+)\-([0-9]*)$', request.headers["range"], flags=re.IGNORECASE)
-                if output == None:
-                    socket.end(self._respondHttpCode(request.version, 400))
-                    return None, None
-                byteStart       = int(output.group(1))
-                if output.group(2)!="":
-                    byteFinish = int(output.group(2))
-                if byteFinish-byteStart>=stat.st_size:
-                    byteFinish=stat.st_size-1-byteStart
-                byteLength = byteFinish-byteStart+1
+                    response.headers["lastModified"] = self._httpgmtformat(mtime)
+                    response.headers.setdefault("cacheControl", 'public')
+                self._sendHead(socket, request, response, code)
+                return None, None
+
+            # 206 partial content, unless If-Range validator is outdated (whole file is sent)
+            ranges = None
+            if "range" in request.headers and self._ifRange(request.headers.get("ifRange", None), response.headers["etag"], mtime):
+                ranges = self._byteRanges(request.headers["range"], stat.st_size)
+            if ranges != None and len(ranges)==0:
+                response.headers["contentRange"] = 'bytes */'+str(stat.st_size)
+                self._sendHead(socket, request, response, 416)
+                return None, None
+
+            segments    = [(b'', byteStart, byteLength)]
+            trailer     = b''
+            response.headers["lastModified"] = self._httpgmtformat(mtime)
+            response.headers["acceptRanges"] = "bytes"
 
             # Prepare head
-            if partialContent:
+            if ranges != None and len(ranges)==1:
                 code = 206
-                response.headers["acceptRanges"] = 'bytes'
+                byteStart, byteFinish = ranges[0]
+                byteLength = byteFinish-byteStart+1
+                segments   = [(b'', byteStart, byteLength)]
                 response.headers["contentLength"]= str(byteLength)
-                response.headers["contentRange"] = 'bytes '+str(byteStart)+'-'+str(byteFinish)+'/'+str(lstat.st_size),
-                response.headers["cacheControl"] = 'no-cache'
-                response.headers["pragma"]       = 'no-cache'
+                response.headers["contentRange"] = 'bytes '+str(byteStart)+'-'+str(byteFinish)+'/'+str(stat.st_size)
+            elif ranges != None:
+                # multipart/byteranges, each part is its head then its bytes streamed from file
+                code        = 206
+                boundary    = hashlib.sha1(os.urandom(16)).hexdigest()[0:24]
+                segments    = []
+                for byteStart, byteFinish in ranges:
+                    head = ("\r\n" if len(segments)>0 else "")+"--"+boundary+"\r\n"
+                    head+= "Content-Type: "+response.headers["contentType"]+"\r\n"
+                    head+= "Content-Range: bytes "+str(byteStart)+"-"+str(byteFinish)+"/"+str(stat.st_size)+"\r\n\r\n"
+                    segments.append((head.encode(), byteStart, byteFinish-byteStart+1))
+                trailer     = ("\r\n--"+boundary+"--\r\n").encode()
+                response.headers["contentType"]  = 'multipart/byteranges; boundary='+boundary
+                response.headers["contentLength"]= str(sum([len(head)+length for head, start, length in segments])+len(trailer))
             else:
                 code = 200
-                #lastModified      : mtime.toGMTString(),
-                response.headers["lastModified"] = self._httpgmtformat(mtime)
-                response.headers["acceptRanges"] = "bytes"
-                response.headers["contentLength"] = str(byteLength)
+
+                # Precompressed sibling sent instead of file
+                gzipStat = self._gzipSibling(path, stat)
+                if gzipStat != None and self._compressor.isCompressibleType(response.headers["contentType"]):
+                    self._varyEncoding(response)
+                    if self._compressor.negotiate(response.acceptEncoding)=="gzip":
+                        response.headers["contentEncoding"] = "gzip"
+                        response.headers["etag"]            = self._etag(stat, "gzip")
+                        path        = path+".gz"
+                        segments    = [(b'', 0, gzipStat.st_size)]
+                response.headers["contentLength"] = str(segments[0][2])
 
             socket.setkeepalive(True)
 
-            # Send header
-            socket.write(self._httpFormatHeaders(request.version, code, response.headers))
+            # Send header, alone for HEAD (Content-Length is the one of body)
+            head = self._httpFormatHeaders(request.version, code, response.headers)
+            if response.head:
+                if response.keepAlive:
+                    socket.write(head)
+                    socket.finish()
+                else:
+                    socket.end(head)
+                return None, None
+            socket.write(head)
             
-            # Send file as body
-            fb = FileBuffer(socket, path, byteStart, byteLength, self.BANDWIDTH_CHUNKSIZE, self.BANDWIDTH_DELAY)
-            fb.start()
+            # Send file as body, connexion is left open after it when kept alive
+            fb = FileBuffer(socket, path, segments, self.BANDWIDTH_CHUNKSIZE, response.keepAlive, trailer, self._shaper, response.shaping)
+            socket.stream(fb.start)
 
             return None, None
 
         return request, response
 
+    """
+        Send a cached asset (304 if not modified since client copy)
+        @params  socket     SocketWrapper   Socket receiving request
+        @params  request    HttpRequest     Parsed request
+        @params  response   HttpResponse    Response (server headers)
+        @params  asset      dict            Asset from AssetCache
+        @returns None
+    """
+    def _sendAsset(self, socket: SocketWrapper, request: HttpRequest, response: HttpResponse, asset: dict):
+        response.headers.update(asset["headers"])
+        self._connectionHeaders(response)
+        body = self._encodeBody(response, asset["body"], (asset["path"], asset["mtime"]), asset["gzip"])
+        if "contentEncoding" in response.headers:
+            response.headers["etag"] = self._etagVariant(response.headers["etag"], response.headers["contentEncoding"])
+
+        # Conditional request, answered before body is sent
+        code = self._preconditions(response.conditions, response.headers["etag"], asset["mtime"])
+        if code != None:
+            if code==304:
+                response.headers.setdefault("cacheControl", 'public')
+            self._sendHead(socket, request, response, code)
+            return
+
+        response.headers["contentLength"] = str(len(body))
+        raw = self._httpFormatHeaders(request.version, 200, response.headers)
+        if not response.head:
+            raw += body
+        self._shaper.charge(response.shaping, len(raw))
+        if response.keepAlive:
+            socket.write(raw)
+            socket.finish()
+        else:
+            socket.end(raw)
+
+    """
+        Read a file and cache it with its response headers
+        @params  cache      AssetCache      Cache of vhost
+        @params  path       str             Absolute path of file
+        @params  stat       os.stat_result  Stat of file
+        @returns dict                       Asset
+    """
+    def _loadAsset(self, cache: AssetCache, path: str, stat: os.stat_result) -> dict:
+        with open(path, "rb") as fd:
+            body = fd.read()
+        gzip = None
+        if self._gzipSibling(path, stat) != None:
+            with open(path+".gz", "rb") as fd:
+                gzip = fd.read()
+        headers = {
+            "contentType"   : self._mimeType(path),
+            "lastModified"  : self._httpgmtformat(stat.st_mtime),
+            "acceptRanges"  : "bytes",
+            "contentLength" : str(len(body)),
+            "etag"          : self._etag(stat)
+        }
+        return cache.put(path, body, headers, stat, gzip)
+
+    """
+        Stat of precompressed sibling of a file (file.gz), if it is not older than file
+        @params  path       str             Absolute path of file
+        @params  stat       os.stat_result  Stat of file
+        @returns os.stat_result             None if no usable sibling
+    """
+    def _gzipSibling(self, path: str, stat: os.stat_result) -> os.stat_result:
+        sibling = self._pathCache.lookup(path+".gz")
+        if sibling["kind"]!=PathCache.FILE or sibling["stat"].st_mtime<stat.st_mtime:
+            return None
+        return sibling["stat"]
+
+    """
+        Original path of a fingerprinted url, from manifest app/<name>/config/assets.json (see precompress.py)
+        File is current if its size and mtime are still the ones hashed, else it changed since build
+        and its content is not the one named by url
+        @params  dirRoot    str     Vhost directory
+        @params  filename   str     Requested path
+        @returns tuple              (original path, current), (None, False) if url is not fingerprinted
+    """
+    def _fingerprint(self, dirRoot: str, filename: str) -> tuple:
+        manifestPath = dirRoot + "config" + self.DS + "assets.json"
+        lookup       = self._pathCache.lookup(manifestPath)
+        if lookup["kind"]!=PathCache.FILE:
+            return None, False
+        cached = self._fingerprints.get(dirRoot, None)
+        if cached == None or cached["mtime"]!=lookup["stat"].st_mtime:
+            urls = {}
+            try:
+                with open(manifestPath, "r") as fd:
+                    for original, entry in json.load(fd).items():
+                        urls[entry["url"]] = ("/"+original, entry.get("size", None), entry.get("mtime", None))
+            except (OSError, ValueError, KeyError, AttributeError) as e:
+                print("Assets manifest error: "+str(e))
+            cached = {"mtime": lookup["stat"].st_mtime, "urls": urls}
+            self._fingerprints[dirRoot] = cached
+        entry = cached["urls"].get(filename, None)
+        if entry == None:
+            return None, False
+        original, size, mtime = entry
+        lookup = self._pathCache.lookup(os.path.abspath(dirRoot + "public" + original.replace("/", self.DS)))
+        if lookup["kind"]!=PathCache.FILE:
+            return original, False
+        return original, lookup["stat"].st_size==size and lookup["stat"].st_mtime==mtime
+
+    """
+        Asset cache configuration of a vhost ("http.assetCache", overloaded by vhost "assetCache")
+        @params  vhost      dict    Vhost configuration
+        @returns dict
+    """
+    def _assetCacheConfig(self, vhost: dict) -> dict:
+        options = dict(self.ASSET_CACHE)
+        options.update(vhost.get("assetCache", {}))
+        return options
+
+    """
+        Asset cache of a vhost, created on first use
+        @params  vhost      dict        Vhost configuration
+        @returns AssetCache             None if disabled
+    """
+    def _assetCache(self, vhost: dict) -> AssetCache:
+        key = self.vhostKey.key(vhost)
+        if not key in self._assetCaches:
+            options = self._assetCacheConfig(vhost)
+            cache   = None
+            if options.get("budget", 0)>0:
+                cache = AssetCache(options["budget"], options.get("maxFileSize", 1048576), options.get("revalidate", 2))
+            self._assetCaches[key] = cache
+        return self._assetCaches[key]
+
+    """
+        Load public files of a vhost in its asset cache, until budget is full
+        @params  vhost      dict    Vhost configuration
+        @returns None
+    """
+    def _warmAssets(self, vhost: dict):
+        cache = self._assetCache(vhost)
+        if cache == None:
+            return
+        dirRoot = vhost["directory"]
+        if dirRoot[0:2]=="./":
+            dirRoot = self.DIR_ROOT + dirRoot[2:]
+        assetPath = os.path.abspath(dirRoot.replace("/", self.DS)) + self.DS + "public"
+        for directory, dirnames, filenames in os.walk(assetPath):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                stat = os.stat(path)
+                if cache.fits(stat.st_size):
+                    self._loadAsset(cache, path, stat)
+
+    """
+        Counters of assets caches (by vhost) and path cache
+        @returns dict
+    """
+    def stats(self) -> dict:
+        return {
+            "assetCaches"   : {key: cache.stats() for key, cache in self._assetCaches.items() if cache != None},
+            "pathCache"     : self._pathCache.stats(),
+            "compressor"    : self._compressor.stats(),
+            "shaper"        : self._shaper.stats()
+        }
+
+    """
+        Listeners of a vhost: its tcp "port" and its "unix" socket path
+        @params  vhost      dict    Vhost config
+        @returns list               Ports (int) and unix socket paths (str)
+    """
+    def vhostPorts(self, vhost: dict) -> list:
+        return self.vhostKey.ports(vhost)
+
+    """
+        Compile a vhost host rule, regular expression on whole host where a leading "*." matches any subdomain
+        @params  hostrule   str     Host rule of vhost ("localhost", "*.localhost", "www\\.site\\.(com|org)")
+        @returns re.Pattern         None if rule is not valid
+    """
+    def hostPattern(self, hostrule: str) -> re.Pattern:
+        if hostrule[0:2]=="*.":
+            hostrule = "[^/]+\\."+hostrule[2:]
+        try:
+            # Compiled patterns are cached by re
+            return re.compile("^"+hostrule+"$", flags=re.IGNORECASE)
+        except re.error:
+            return None
+
+    """
+        Content type of a file, from its extension ("mimes.byExtensions")
+        @params  path   str     File path
+        @returns str
+    """
+    def _mimeType(self, path: str) -> str:
+        ext = ""
+        try:
+            pos = path.rindex('.')
+            ext = path[pos:]
+        except ValueError as e:
+            pos = -1
+        return self.MIMES.get(ext, self.MIME_DEFAULT)
+
     """
         Parse websocket request
         @params  socket     SocketWrapper   Socket receiving data
@@ -605,6 +854,7 @@ class HttpProtocol():
 
         request.headers     = socketCache["headers"].copy()
         request.vhost       = socketCache["vhost"]
+        request.serial      = key
 
         request.body        = body
 
@@ -616,8 +866,9 @@ class HttpProtocol():
         response.headers    = {
             "server"        : self.SERVER,
             "date"          : self._httpgmtdate(),
-            "connexion"     : "keep-alive"
+            "connection"    : "keep-alive"
         }
+        response.keepAlive  = True
 
         return request, response
 
@@ -641,14 +892,36 @@ class HttpProtocol():
         @returns raw        bytes           Raw protocol bytearray
     """
     def httpPack(self, response: HttpResponse) -> bytes:
-        body = response.body.encode('utf-8')
+        body   = response.body.encode('utf-8')
+        digest = None
 
         if not "contentLength" in response.headers:
+            # Same bodies are compressed once, unless response must not be stored
+            if not "no-store" in response.headers.get("cacheControl", ""):
+                digest = hashlib.sha1(body).digest()
+            body = self._encodeBody(response, body, digest)
             response.headers["contentLength"] = str(len(body))
-        if not "connexion" in response.headers:
-            response.headers["connexion"] = "close"
+
+        # Optional ETag of views, from body (polling clients get 304)
+        if self.ETAG_VIEWS and response.code==200 and digest != None and not "etag" in response.headers:
+            response.headers["etag"] = '"'+digest.hex()[0:20]+'"'
+            if "contentEncoding" in response.headers:
+                response.headers["etag"] = self._etagVariant(response.headers["etag"], response.headers["contentEncoding"])
+        if "etag" in response.headers and response.code==200:
+            code = self._preconditions(response.conditions, response.headers["etag"], None)
+            if code != None:
+                response.code = code
+                response.headers.pop("contentLength", None)
+                body = b''
+                if code==412:
+                    response.headers["contentLength"] = "0"
+        self._connectionHeaders(response)
+        if response.head:
+            body = b''
 
         head = self._httpFormatHeaders(response.version, response.code, response.headers)
+        if response.shaping != None:
+            self._shaper.charge(response.shaping, len(head)+len(body))
         return b''.join([head,body])
 
     """
@@ -685,6 +958,220 @@ class HttpProtocol():
 
         return bytearray(bytesFormatted)
 
+    """
+        Websocket close frame
+        @params  code       int     Close status code (1001: going away, server is stopping)
+        @returns raw        bytes   Raw protocol bytearray
+    """
+    def websocketClose(self, code: int = 1001) -> bytes:
+        return bytes([0x88, 2, (code >> 8) & 255, code & 255])
+
+    """
+        Compress body if client accepts it and content type is compressible ("mimes.compressible")
+        @params  response   HttpResponse    Response (headers are updated)
+        @params  body       bytes           Raw body
+        @params  key        object          Identity of body for compressed variants cache (None to not cache)
+        @params  precompressed bytes        Gzip body built offline, sent as is if client accepts gzip
+        @returns bytes                      Body to send
+    """
+    def _encodeBody(self, response: HttpResponse, body: bytes, key = None, precompressed: bytes = None) -> bytes:
+        if "contentEncoding" in response.headers or (not self.COMPRESSION and precompressed == None):
+            return body
+        if not self._compressor.isCompressibleType(response.headers.get("contentType", "")):
+            return body
+        self._varyEncoding(response)
+        encoding = self._compressor.negotiate(response.acceptEncoding)
+        if encoding=="gzip" and precompressed != None:
+            # Built offline, no cpu at request time
+            response.headers["contentEncoding"] = encoding
+            return precompressed
+        if not self.COMPRESSION or encoding == None or not self._compressor.compressible(response.headers["contentType"], len(body)):
+            return body
+        response.headers["contentEncoding"] = encoding
+        return self._compressor.compress(body, encoding, key)
+
+    """
+        Strong ETag of a file version, from its stat (same for a file whatever path serves it)
+        @params  stat       os.stat_result  Stat of file
+        @params  encoding   str             Content coding of representation (None for identity)
+        @returns str                        Quoted ETag
+    """
+    def _etag(self, stat: os.stat_result, encoding: str = None) -> str:
+        etag = '"'+format(stat.st_mtime_ns, "x")+"-"+format(stat.st_size, "x")+'"'
+        if encoding != None:
+            etag = self._etagVariant(etag, encoding)
+        return etag
+
+    """
+        ETag of an encoded representation (gzip and identity bodies must not share an ETag)
+        @params  etag       str     ETag of identity representation
+        @params  encoding   str     Content coding
+        @returns str
+    """
+    def _etagVariant(self, etag: str, encoding: str) -> str:
+        return etag[:-1]+"-"+encoding+'"'
+
+    """
+        Does an If-Match / If-None-Match list match an ETag
+        @params  header     str     Header value ("*" or list of ETags)
+        @params  etag       str     Current ETag
+        @params  weak       bool    Weak comparison (W/ prefixes ignored, for If-None-Match)
+        @returns bool
+    """
+    def _etagMatch(self, header: str, etag: str, weak: bool) -> bool:
+        if header.strip()=="*":
+            return True
+        for candidate in header.split(","):
+            candidate = candidate.strip()
+            if candidate[0:2]=="W/":
+                if not weak:
+                    continue
+                candidate = candidate[2:]
+            if candidate==etag:
+                return True
+        return False
+
+    """
+        Evaluate conditional headers of request (If-Match, If-None-Match, If-Modified-Since)
+        @params  conditions dict    Conditional headers (see HttpResponse.conditions)
+        @params  etag       str     Current ETag
+        @params  mtime      float   Last modification time (None if unknown)
+        @returns int                304 or 412 to answer without body, None to send response
+    """
+    def _preconditions(self, conditions: dict, etag: str, mtime: float) -> int:
+        if "ifMatch" in conditions and not self._etagMatch(conditions["ifMatch"], etag, False):
+            return 412
+        if "ifNoneMatch" in conditions:
+            # If-None-Match wins over If-Modified-Since
+            if self._etagMatch(conditions["ifNoneMatch"], etag, True):
+                return 304
+            return None
+        if "ifModifiedSince" in conditions and mtime != None and int(mtime)<=self._httpfromgmttime(conditions["ifModifiedSince"]):
+            return 304
+        return None
+
+    """
+        Parse Range header against file size (RFC 7233), overlapping ranges are coalesced
+        @params  header     str     Range header value
+        @params  size       int     File size
+        @returns list               (first, last) byte offsets, empty if unsatisfiable (416), None to ignore header (200)
+    """
+    def _byteRanges(self, header: str, size: int) -> list:
+        if header[0:6].lower()!="bytes=":
+            return None
+        ranges = []
+        for spec in header[6:].split(","):
+            output = re.search('^([0-9]*)-([0-9]*)$', spec.strip())
+            if output == None or output.group(1)+output.group(2)=="":
+                return None
+            if output.group(1)=="":
+                # Suffix range, last N bytes
+                length = int(output.group(2))
+                if length>0 and size>0:
+                    ranges.append((max(0, size-length), size-1))
+                continue
+            first = int(output.group(1))
+            last  = int(output.group(2)) if output.group(2)!="" else max(first, size-1)
+            if last<first:
+                return None
+            if first<size:
+                ranges.append((first, min(last, size-1)))
+
+        ranges.sort()
+        coalesced = []
+        for first, last in ranges:
+            if len(coalesced)>0 and first<=coalesced[-1][1]+1:
+                coalesced[-1] = (coalesced[-1][0], max(last, coalesced[-1][1]))
+            else:
+                coalesced.append((first, last))
+        if len(coalesced)>self.MAX_RANGES:
+            return None
+        return coalesced
+
+    """
+        Is If-Range validator still current (range is served), strong etag or exact date
+        @params  header     str     If-Range header value (None if absent)
+        @params  etag       str     Current etag of file
+        @params  mtime      float   Last modification time of file
+        @returns bool
+    """
+    def _ifRange(self, header: str, etag: str, mtime: float) -> bool:
+        if header == None:
+            return True
+        header = header.strip()
+        if header[0:2]=="W/":
+            return False
+        if header[0:1]=='"':
+            return header==etag
+        return int(mtime)==self._httpfromgmttime(header)
+
+    """
+        Send headers only response (304, 412, 416) of a static file
+        @params  socket     SocketWrapper   Socket receiving request
+        @params  request    HttpRequest     Parsed request
+        @params  response   HttpResponse    Response with headers
+        @params  code       int             Http code
+        @returns None
+    """
+    def _sendHead(self, socket: SocketWrapper, request: HttpRequest, response: HttpResponse, code: int):
+        response.headers.pop("contentLength", None)
+        if code!=304:
+            response.headers["contentLength"] = "0"
+        raw = self._httpFormatHeaders(request.version, code, response.headers)
+        if response.keepAlive:
+            socket.write(raw)
+            socket.finish()
+        else:
+            socket.end(raw)
+
+    """
+        Add Accept-Encoding to Vary header of response
+        @params  response   HttpResponse    Response
+        @returns None
+    """
+    def _varyEncoding(self, response: HttpResponse):
+        vary = response.headers.get("vary", "")
+        if not "accept-encoding" in vary.lower():
+            response.headers["vary"] = vary and vary+", Accept-Encoding" or "Accept-Encoding"
+
+    """
+        Tell if connexion persists after response: HTTP/1.1 defaults to keep-alive, HTTP/1.0 asks for it
+        @params  socket     SocketWrapper   Socket receiving request
+        @params  request    HttpRequest     Parsed request
+        @returns bool
+    """
+    def _keepAlive(self, socket: SocketWrapper, request: HttpRequest) -> bool:
+        if self.draining or self.KEEPALIVE_TIMEOUT<=0 or socket.requests>=self.KEEPALIVE_MAX:
+            return False
+        connection = request.headers.get("connection", "").lower()
+        if request.version=="1.0":
+            return "keep-alive" in connection
+        return not "close" in connection
+
+    """
+        Set Connection and Keep-Alive headers, a "Connection: close" set by application wins
+        @params  response   HttpResponse    Response to send
+        @returns None
+    """
+    def _connectionHeaders(self, response: HttpResponse):
+        if self.draining or response.headers.get("connection", "").lower()=="close":
+            response.keepAlive = False
+        if response.keepAlive:
+            response.headers["connection"]  = "keep-alive"
+            response.headers["keepAlive"]   = "timeout="+str(self.KEEPALIVE_TIMEOUT)+", max="+str(response.keepAliveMax)
+        else:
+            response.headers["connection"]  = "close"
+            response.headers.pop("keepAlive", None)
+
+    """
+        Raw http error response, for requests rejected before parsing
+        @params  httpVersion    str     Version of HTTP
+        @params  httpcode       int     Http code
+        @returns raw            bytes   HTTP protocol bytearray
+    """
+    def packError(self, httpVersion: str, httpcode: int) -> bytes:
+        return self._respondHttpCode(httpVersion, httpcode)
+
     """
         To return on socket fast http code error
         @params  httpVersion    str     Version of HTTP
@@ -706,29 +1193,6 @@ class HttpProtocol():
         ]
         return bytes("".join(buffer), encoding='ascii')
 
-    """
-        Formater name to camelcase
-        @params  name           str     From name
-        @returns formatted      str     Formatted name
-    """
-    def _httpname2camelcase(self, name: str) -> str:
-        camelCase   = ''
-        i           = 0
-        length      = len(name)
-        char        = None
-        upper       = False
-        for i in range(0, length):
-            char = name[i]
-            if char=='-':
-                upper = True
-            else:
-                if upper:
-                    camelCase += char.upper()
-                else:
-                    camelCase += char.lower()
-                upper = False
-        return camelCase
-
     """
         Format camelcase http headers raw http protocol bytearray
         @params  protocolVersion    str     Version of http protocol
@@ -771,11 +1235,16 @@ class HttpProtocol():
         return name + ': ' + value
 
     """
-        GMT time for http
-        @returns gmttime str
+        Timestamp of an http GMT date
+        @param   gmttime    str     Http date (RFC 1123)
+        @returns timestamp  float   0 if date is invalid
     """
-    def _httpfromgmttime(self, gmttime: time) -> str:
-        return datetime.datetime.timestamp(datetime.datetime.strptime(gmttime[5:-4], '%d %b %Y %H:%M:%S'))
+    def _httpfromgmttime(self, gmttime: str) -> float:
+        try:
+            date = datetime.datetime.strptime(gmttime.strip()[5:-4], '%d %b %Y %H:%M:%S')
+        except ValueError:
+            return 0
+        return date.replace(tzinfo=datetime.timezone.utc).timestamp()
 
     """
         GMT time format for http
@@ -783,7 +1252,7 @@ class HttpProtocol():
         @returns gmttime   str
     """
     def _httpgmtformat(self, timestamp: int) -> str:
-        now = datetime.datetime.fromtimestamp(timestamp)
+        now = datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
         day = now.strftime("%A")[0:3]
         return day+', '+now.strftime("%d %b %Y %H:%M:%S")+' GMT'
 
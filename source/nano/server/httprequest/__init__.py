@@ -21,4 +21,5 @@ class HttpRequest():
         self.files       = {}
         self.get         = {}
         self.cookies     = {}
-        self.body        = ""
\ No newline at end of file
+        self.body        = ""
+        self.serial      = None      # Requests of a same serial key are resolved in order (websocket messages of a connexion)
\ No newline at end of file
@@ -22,6 +22,12 @@ class HttpResponse():
         self.version     = None
         self.headers     = {}
         self.body        = ""
+        self.keepAlive   = False     # Connection persists after response
+        self.keepAliveMax= 0         # Requests left on connection
+        self.acceptEncoding = ""     # Accept-Encoding of request
+        self.conditions  = {}        # Conditional headers of request (ifMatch, ifNoneMatch, ifModifiedSince)
+        self.shaping     = None      # Bandwidth shaping key of request (vhost key, remote ip)
+        self.head        = False     # Request is HEAD: headers of the response are sent, never its body
 
     """
         Send response
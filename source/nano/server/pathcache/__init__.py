@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict
+
+import os
+import stat as libstat
+import threading
+import time
+
+"""
+    Class for filesystem lookups cache (missing, file or directory, with stat), bounded and expired by ttl
+"""
+class PathCache():
+
+    MISSING = "missing"
+    FILE    = "file"
+    DIR     = "dir"
+    OTHER   = "other"
+
+    """
+        Constructor
+        @param   maxEntries int     Max cached paths (least recently used are evicted)
+        @param   ttl        float   Seconds a lookup stays valid (0 to disable cache)
+        @returns None
+    """
+    def __init__(self, maxEntries: int, ttl: float):
+        self.maxEntries = int(maxEntries)
+        self.ttl        = float(ttl)
+        self.hits       = 0
+        self.misses     = 0
+        self._paths     = OrderedDict()
+        self._lock      = threading.Lock()
+
+    """
+        Lookup a path, from cache if not expired
+        @param   path   str     Absolute path
+        @returns dict           {"kind": missing|file|dir|other, "stat": os.stat_result or None}
+    """
+    def lookup(self, path: str) -> dict:
+        now = time.monotonic()
+        if self.ttl>0:
+            with self._lock:
+                entry = self._paths.get(path, None)
+                if entry != None and entry["expire"]>now:
+                    self._paths.move_to_end(path)
+                    self.hits += 1
+                    return entry
+
+        try:
+            stat = os.stat(path)
+            kind = self.OTHER
+            if libstat.S_ISREG(stat.st_mode):
+                kind = self.FILE
+            elif libstat.S_ISDIR(stat.st_mode):
+                kind = self.DIR
+        except (OSError, ValueError):
+            stat = None
+            kind = self.MISSING
+        entry = {"kind": kind, "stat": stat, "expire": now+self.ttl}
+
+        with self._lock:
+            self.misses += 1
+            if self.ttl>0 and self.maxEntries>0:
+                self._paths[path] = entry
+                self._paths.move_to_end(path)
+                while len(self._paths)>self.maxEntries:
+                    self._paths.popitem(last=False)
+        return entry
+
+    """
+        Forget a path, or all paths
+        @param   path   str     Absolute path (None for all)
+        @returns None
+    """
+    def invalidate(self, path: str = None):
+        with self._lock:
+            if path == None:
+                self._paths.clear()
+            else:
+                self._paths.pop(path, None)
+
+    """
+        Cache counters
+        @returns dict
+    """
+    def stats(self) -> dict:
+        return {
+            "paths"     : len(self._paths),
+            "maxEntries": self.maxEntries,
+            "hits"      : self.hits,
+            "misses"    : self.misses
+        }
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+from nano.server.reloader   import Reloader
+
+from collections.abc import Callable
+
+import os
+import signal
+import sys
+import threading
+import time
+
+"""
+    Class for manage a master process supervising forked workers
+"""
+class Prefork():
+
+    """
+        Constructor
+        @param   workers    int         Number of worker processes (None for cpu count)
+        @param   boot       Callable    Worker entrypoint, start servers of worker process
+        @param   stop       Callable    (facultative) Graceful stop of a worker on SIGTERM, given what boot returned
+        @param   reloader   Reloader    (facultative) Graceful reload on SIGHUP, new master is started on same command line
+        @returns None
+    """
+    def __init__(self, workers: int, boot: Callable, stop: Callable = None, reloader: Reloader = None):
+        self.workers    = workers or os.cpu_count() or 1
+        self.pids       = {}
+        self.running    = False
+        self._boot      = boot
+        self._stop      = stop
+        self._reloader  = reloader or Reloader()
+        self._spawned   = {}
+
+    """
+        Fork workers and supervise them, respawn dead ones, until SIGTERM/SIGINT, reload on SIGHUP
+        @returns None
+    """
+    def run(self):
+        self.running = True
+        signal.signal(signal.SIGTERM, self._onstop)
+        signal.signal(signal.SIGINT , self._onstop)
+        signal.signal(signal.SIGHUP , self._onreload)
+
+        for slot in range(self.workers):
+            self._spawn(slot)
+        # First workers told old master they listen, respawned ones must not
+        self._reloader.forget()
+        print(f"Master {os.getpid()} supervise {self.workers} workers")
+
+        while self.running or len(self.pids)>0:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            if not pid in self.pids:
+                continue
+            slot = self.pids.pop(pid)
+            if self.running:
+                print(f"Worker {pid} died (status {status}), respawn")
+                # Worker dying at boot, do not respawn in a hard loop
+                if time.monotonic()-self._spawned.get(slot, 0)<1:
+                    time.sleep(1)
+                self._spawn(slot)
+
+    """
+        Fork one worker
+        @param   slot   int     Index of worker
+        @returns None
+    """
+    def _spawn(self, slot: int):
+        pid = os.fork()
+        if pid>0:
+            self.pids[pid]      = slot
+            self._spawned[slot] = time.monotonic()
+            return
+
+        # Worker process, stopped by master only
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT , signal.SIG_IGN)
+        signal.signal(signal.SIGHUP , signal.SIG_IGN)
+        code = 0
+        try:
+            instances = self._boot()  # Keep worker servers referenced
+            if self._stop != None:
+                signal.signal(signal.SIGTERM, lambda signum, frame: self._stopWorker(instances))
+            for thread in threading.enumerate():
+                if thread is not threading.current_thread():
+                    thread.join()
+        except Exception as e:
+            print(f"Worker {os.getpid()} error: "+str(e))
+            code = 1
+        sys.stdout.flush()
+        os._exit(code)
+
+    """
+        Graceful stop of a worker: let its connexions end, then exit
+        @param   instances  object  What boot returned
+        @returns None
+    """
+    def _stopWorker(self, instances):
+        code = 0
+        try:
+            self._stop(instances)
+        except Exception as e:
+            print(f"Worker {os.getpid()} stop error: "+str(e))
+            code = 1
+        sys.stdout.flush()
+        os._exit(code)
+
+    """
+        Signal handler, start a new master (new code and config), then stop workers gracefully
+        Workers of both masters listen same ports (SO_REUSEPORT) while old ones drain
+        @param   signum int     Signal number
+        @param   frame  frame   Current stack frame
+        @returns None
+    """
+    def _onreload(self, signum: int, frame):
+        if self.running and self._reloader.spawn({}):
+            self._onstop(signum, frame)
+
+    """
+        Signal handler, stop workers then master
+        @param   signum int     Signal number
+        @param   frame  frame   Current stack frame
+        @returns None
+    """
+    def _onstop(self, signum: int, frame):
+        self.running = False
+        for pid in list(self.pids.keys()):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+import socket
+import struct
+
+"""
+    Exception for an invalid or missing PROXY protocol header
+"""
+class ProxyProtocolError(Exception):
+    pass
+
+"""
+    Class for reading the PROXY protocol header (v1 text, v2 binary) sent by a load balancer before connexion data
+    Gives the real client and destination addresses of the proxied connexion
+"""
+class ProxyProtocol():
+
+    V1_PREFIX       = b'PROXY '
+    V1_MAX_SIZE     = 107       # Longest v1 line, with CRLF
+    V2_SIGNATURE    = b'\r\n\r\n\x00\r\nQUIT\n'
+    V2_HEADER       = struct.Struct(">BBH")    # Version and command, family and transport, addresses length
+    MAX_SIZE        = 4096      # Longest accepted v2 header (addresses and TLVs)
+
+    """
+        Constructor
+        @returns None
+    """
+    def __init__(self):
+        self._buffer    = bytearray()
+        self.done       = False
+        self.version    = None
+        self.remote     = None      # (host, port) of client, None if connexion is not proxied (LOCAL, UNKNOWN)
+        self.local      = None      # (host, port) of destination
+
+    """
+        Read header from a socket, never past it: data are peeked, then only header bytes are consumed
+        @param   sock   socket.socket   Accepted socket (not yet wrapped for ssl)
+        @returns bool                   True once header is complete, raises BlockingIOError if no data is available
+    """
+    def read(self, sock: socket.socket) -> bool:
+        data = sock.recv(self.MAX_SIZE, socket.MSG_PEEK)
+        if len(data)==0:
+            raise ProxyProtocolError("Connexion closed before PROXY protocol header")
+        count = self.feed(data)
+        sock.recv(count)
+        return self.done
+
+    """
+        Append received data, parse header once complete
+        @param   data   bytes   Received data
+        @returns int            Bytes of data belonging to header (following ones are connexion data)
+    """
+    def feed(self, data: bytes) -> int:
+        if self.done:
+            return 0
+        start  = len(self._buffer)
+        buffer = bytes(self._buffer)+bytes(data)
+        if buffer[0:6]==self.V1_PREFIX:
+            end = buffer.find(b'\r\n')
+            if end<0 or end+2>self.V1_MAX_SIZE:
+                if len(buffer)>=self.V1_MAX_SIZE:
+                    raise ProxyProtocolError("PROXY protocol v1 header too long")
+                self._buffer += data
+                return len(data)
+            self._parseV1(buffer[0:end])
+            return end+2-start
+        if buffer[0:12]==self.V2_SIGNATURE:
+            if len(buffer)<16:
+                self._buffer += data
+                return len(data)
+            size = 16+self.V2_HEADER.unpack_from(buffer, 12)[2]
+            if size>self.MAX_SIZE:
+                raise ProxyProtocolError("PROXY protocol v2 header too long")
+            if len(buffer)<size:
+                self._buffer += data
+                return len(data)
+            self._parseV2(buffer[0:size])
+            return size-start
+        if self.V2_SIGNATURE.startswith(buffer[0:12]) or self.V1_PREFIX.startswith(buffer[0:6]):
+            # Start of a header, both versions are longer than 12 bytes
+            self._buffer += data
+            return len(data)
+        raise ProxyProtocolError("Missing PROXY protocol header")
+
+    """
+        Parse v1 line: "PROXY TCP4|TCP6 source destination sourcePort destinationPort" or "PROXY UNKNOWN ..."
+        @param   line   bytes   Header line without CRLF
+        @returns None
+    """
+    def _parseV1(self, line: bytes):
+        fields = line.decode("ascii", "replace").split(" ")
+        self.version = 1
+        if len(fields)>=2 and fields[1]=="UNKNOWN":
+            self._complete(None, None)
+            return
+        if len(fields)!=6 or not fields[1] in ("TCP4", "TCP6"):
+            raise ProxyProtocolError("Invalid PROXY protocol v1 header")
+        family = socket.AF_INET if fields[1]=="TCP4" else socket.AF_INET6
+        try:
+            for address in fields[2:4]:
+                socket.inet_pton(family, address)
+            ports = [int(port) for port in fields[4:6]]
+        except (OSError, ValueError):
+            raise ProxyProtocolError("Invalid PROXY protocol v1 address")
+        if any([port<0 or port>65535 or str(port)!=field for port, field in zip(ports, fields[4:6])]):
+            raise ProxyProtocolError("Invalid PROXY protocol v1 port")
+        self._complete((fields[2], ports[0]), (fields[3], ports[1]))
+
+    """
+        Parse v2 header: signature, version and command, family, addresses (then TLVs, ignored)
+        @param   header bytes   Complete header
+        @returns None
+    """
+    def _parseV2(self, header: bytes):
+        command, family, length = self.V2_HEADER.unpack_from(header, 12)
+        self.version = 2
+        if command>>4!=2 or command & 0xf>1:
+            raise ProxyProtocolError("Invalid PROXY protocol v2 version or command")
+        if command & 0xf==0:
+            # LOCAL, connexion from proxy itself (health check)
+            self._complete(None, None)
+            return
+        addresses = header[16:]
+        if family>>4==1 and len(addresses)>=12:
+            source, destination, sourcePort, destinationPort = struct.unpack_from(">4s4sHH", addresses)
+            self._complete((socket.inet_ntop(socket.AF_INET, source), sourcePort), (socket.inet_ntop(socket.AF_INET, destination), destinationPort))
+        elif family>>4==2 and len(addresses)>=36:
+            source, destination, sourcePort, destinationPort = struct.unpack_from(">16s16sHH", addresses)
+            self._complete((socket.inet_ntop(socket.AF_INET6, source), sourcePort), (socket.inet_ntop(socket.AF_INET6, destination), destinationPort))
+        elif family>>4==3 and len(addresses)>=216:
+            source, destination = [path.split(b'\x00')[0].decode("utf-8", "replace") for path in struct.unpack_from(">108s108s", addresses)]
+            self._complete((source or "unix", 0), (destination or "unix", 0))
+        elif family>>4==0:
+            # UNSPEC, addresses unknown
+            self._complete(None, None)
+        else:
+            raise ProxyProtocolError("Invalid PROXY protocol v2 addresses")
+
+    """
+        Header is parsed
+        @param   remote tuple   (host, port) of client
+        @param   local  tuple   (host, port) of destination
+        @returns None
+    """
+    def _complete(self, remote: tuple, local: tuple):
+        self.remote     = remote
+        self.local      = local
+        self.done       = True
+        self._buffer    = bytearray()
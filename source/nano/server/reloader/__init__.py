@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import select
+import subprocess
+import sys
+
+"""
+    Class for graceful reload: a new process (new code) inherits listening sockets, and tells once it listens
+    Old process then stops accepting and drains its connexions, no connexion waiting in accept queues is lost
+"""
+class Reloader():
+
+    LISTEN_ENV  = "NANO_LISTEN_FDS"     # Inherited listening sockets, json {port or unix path: fd}
+    READY_ENV   = "NANO_READY_FD"       # Pipe to old process, written once new process listens
+
+    """
+        Constructor
+        @param   readyTimeout   float   Seconds given to new process to listen
+        @returns None
+    """
+    def __init__(self, readyTimeout: float = 10):
+        self.readyTimeout = readyTimeout
+
+    """
+        Listening sockets inherited from old process, taken once (not given to child processes)
+        @returns dict   File descriptors by port (str) or unix path
+    """
+    def inherited(self) -> dict:
+        try:
+            return {str(key): int(fd) for key, fd in json.loads(os.environ.pop(self.LISTEN_ENV, "{}")).items()}
+        except (ValueError, AttributeError):
+            return {}
+
+    """
+        Tell old process that current one listens (once)
+        @returns None
+    """
+    def ready(self):
+        fd = os.environ.pop(self.READY_ENV, None)
+        if fd == None:
+            return
+        try:
+            os.write(int(fd), b'R')
+            os.close(int(fd))
+        except (OSError, ValueError):
+            # Old process gave up waiting
+            pass
+
+    """
+        Forget readiness pipe, processes started later (respawned workers) must not write it
+        @returns None
+    """
+    def forget(self):
+        fd = os.environ.pop(self.READY_ENV, None)
+        if fd != None:
+            try:
+                os.close(int(fd))
+            except (OSError, ValueError):
+                pass
+
+    """
+        Start a new process with same command line, inheriting listening sockets, and wait until it listens
+        @param   fds    dict    File descriptors of listening sockets by port (str) or unix path
+        @returns bool           False if new process failed to start or to listen in time (it is stopped)
+    """
+    def spawn(self, fds: dict) -> bool:
+        reader, writer = os.pipe()
+        env = {**os.environ, self.LISTEN_ENV: json.dumps(fds), self.READY_ENV: str(writer)}
+        try:
+            process = subprocess.Popen([sys.executable]+sys.argv, env=env, pass_fds=list(fds.values())+[writer])
+        except OSError as e:
+            print("Reload error: "+str(e))
+            os.close(reader)
+            os.close(writer)
+            return False
+        os.close(writer)
+        try:
+            # End of file if new process exits (boot error) before listening
+            readable = select.select([reader], [], [], self.readyTimeout)[0]
+            ready    = len(readable)>0 and os.read(reader, 1)==b'R'
+        finally:
+            os.close(reader)
+        if not ready:
+            print(f"Reload error: new process {process.pid} did not listen in time")
+            process.kill()
+            process.wait()
+            return False
+        print(f"Reload: new process {process.pid} listens")
+        return True
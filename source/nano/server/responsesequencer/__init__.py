@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+from collections.abc import Callable
+from collections     import deque
+
+import threading
+
+"""
+    Class for one pipelined request of a connexion, same write api than nano.server.socketwrapper.SocketWrapper
+    Output is held until previous responses of connexion are complete
+"""
+class ResponseSlot():
+
+    """
+        Constructor
+        @param   sequencer  ResponseSequencer   Sequencer of connexion
+        @param   conn       SocketWrapper       Connexion (or AsyncioConnection)
+        @returns None
+    """
+    def __init__(self, sequencer, conn):
+        self._sequencer = sequencer
+        self._conn      = conn
+        self._buffer    = []        # Output waiting for slot turn
+        self._onturn    = []        # Streams waiting for slot turn
+        self._done      = False
+        self._close     = False
+        self._dropped   = False
+        self._local     = conn._local
+        self._remote    = conn._remote
+        self._port      = conn._port
+        self._ssl       = conn._ssl
+        self.loop       = conn.loop
+
+    """
+        Hash, same than connexion (protocol caches are by connexion)
+        @returns int
+    """
+    def __hash__(self):
+        return hash(self._conn)
+
+    """
+        Eq, same than connexion
+        @returns bool
+    """
+    def __eq__(self, other):
+        return hash(self)==hash(other)
+
+    """
+        Is connexion closed, or slot dropped by a previous response closing connexion
+        @returns bool
+    """
+    @property
+    def closed(self) -> bool:
+        return self._dropped or self._conn.closed
+
+    """
+        Terminator of connexion (None once switched to websocket)
+        @returns bytes
+    """
+    @property
+    def terminator(self) -> bytes:
+        return self._conn.terminator
+
+    @terminator.setter
+    def terminator(self, value: bytes):
+        self._conn.terminator = value
+
+    """
+        Requests received on connexion
+        @returns int
+    """
+    @property
+    def requests(self) -> int:
+        return self._conn.requests
+
+    @requests.setter
+    def requests(self, value: int):
+        self._conn.requests = value
+
+    """
+        Requests of connexion waiting for their response
+        @returns int
+    """
+    @property
+    def pending(self) -> int:
+        return self._conn.pending
+
+    @pending.setter
+    def pending(self, value: int):
+        self._conn.pending = value
+
+    """
+        Write response data, held until slot turn
+        @param   bytes   data
+        @returns None
+    """
+    def write(self, data: bytes):
+        self._sequencer._write(self, data)
+
+    """
+        Write response data, then close connexion once slot turn is complete
+        @param   bytes   data
+        @returns None
+    """
+    def end(self, data: bytes):
+        self._sequencer._write(self, data)
+        self._sequencer._finish(self, True)
+
+    """
+        Close connexion once slot turn is complete
+        @returns None
+    """
+    def close(self):
+        self._sequencer._finish(self, True)
+
+    """
+        Response is complete, connexion stays open for next one
+        @returns None
+    """
+    def finish(self):
+        self._sequencer._finish(self, False)
+
+    """
+        Run a streaming response (file download) once slot turn comes
+        @param   callback   Callable    Starts stream, without arguments
+        @returns None
+    """
+    def stream(self, callback: Callable):
+        self._sequencer._stream(self, callback)
+
+    """
+        Send a file segment, slot must have its turn (see stream)
+        @param   file       file        File opened in binary mode
+        @param   offset     int         First byte
+        @param   count      int         Bytes to send
+        @param   callback   Callable    Called once segment is sent
+        @returns None
+    """
+    def sendfile(self, file, offset: int, count: int, callback: Callable):
+        self._conn.sendfile(file, offset, count, callback)
+
+    """
+        Call back once connexion accepts more data
+        @param   callback   Callable    Callback without arguments
+        @returns None
+    """
+    def drain(self, callback: Callable):
+        self._conn.drain(callback)
+
+    """
+        Force socket to keepalive
+        @param   value  bool  Enable keepalive
+        @returns None
+    """
+    def setkeepalive(self, value):
+        self._conn.setkeepalive(value)
+
+    """
+        Add event handler on connexion
+        @returns None
+    """
+    def on(self, eventName: str, callback: Callable):
+        self._conn.on(eventName, callback)
+
+"""
+    Class for write responses of a connexion strictly in requests order (http pipelining)
+"""
+class ResponseSequencer():
+
+    """
+        Constructor
+        @param   conn   SocketWrapper   Connexion (or AsyncioConnection)
+        @returns None
+    """
+    def __init__(self, conn):
+        self._conn      = conn
+        self._slots     = deque()
+        self._lock      = threading.RLock()
+
+    """
+        Open slot of next received request
+        @returns ResponseSlot
+    """
+    def slot(self) -> ResponseSlot:
+        slot = ResponseSlot(self, self._conn)
+        with self._lock:
+            self._slots.append(slot)
+        return slot
+
+    """
+        Count of requests waiting for their turn (or running)
+        @returns int
+    """
+    def depth(self) -> int:
+        return len(self._slots)
+
+    """
+        Write now if slot is head, else hold data
+        @param   slot   ResponseSlot
+        @param   data   bytes
+        @returns None
+    """
+    def _write(self, slot: ResponseSlot, data: bytes):
+        with self._lock:
+            if slot._done or slot._dropped:
+                return
+            if len(self._slots)>0 and self._slots[0] is slot:
+                self._conn.write(data)
+            else:
+                slot._buffer.append(bytes(data))
+
+    """
+        Run stream now if slot is head, else at slot turn
+        @param   slot       ResponseSlot
+        @param   callback   Callable
+        @returns None
+    """
+    def _stream(self, slot: ResponseSlot, callback: Callable):
+        with self._lock:
+            if slot._dropped:
+                return
+            if not (len(self._slots)>0 and self._slots[0] is slot):
+                slot._onturn.append(callback)
+                return
+        callback()
+
+    """
+        Mark slot complete, give turn to next slots
+        Queued streams are handed off to connexion (its loop or own thread), caller may be a worker of pool
+        @param   slot   ResponseSlot
+        @param   close  bool        Close connexion after slot output
+        @returns None
+    """
+    def _finish(self, slot: ResponseSlot, close: bool):
+        streams = []
+        with self._lock:
+            if slot._done or slot._dropped:
+                return
+            slot._done  = True
+            slot._close = close
+            while len(self._slots)>0 and self._slots[0]._done:
+                head = self._slots.popleft()
+                if head._close:
+                    # Later responses are never sent
+                    self._conn.end(b'')
+                    for dropped in self._slots:
+                        dropped._dropped = True
+                    self._slots.clear()
+                    break
+                if len(self._slots)>0:
+                    nextSlot = self._slots[0]
+                    if len(nextSlot._buffer)>0:
+                        self._conn.write(b''.join(nextSlot._buffer))
+                        nextSlot._buffer = []
+                    streams, nextSlot._onturn = streams+nextSlot._onturn, []
+        for callback in streams:
+            self._conn.handoff(callback)
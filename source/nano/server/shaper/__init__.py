@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+from nano.server.tokenbucket    import TokenBucket
+
+from collections import OrderedDict
+
+import threading
+
+"""
+    Class for bandwidth shaping of responses, token buckets of bytes at global, vhost and client (remote ip) levels
+    A write takes bytes from all levels, the most limited one paces it
+"""
+class Shaper():
+
+    # Bytes waited for before a paced write is tried again
+    QUANTUM = 16384
+
+    """
+        Constructor
+        @param   rate           float   Global bytes by second (0 for unlimited)
+        @param   burst          float   Global bucket capacity (None for one second of rate)
+        @param   clientRate     float   Bytes by second of each remote ip (0 for unlimited)
+        @param   clientBurst    float   Client bucket capacity (None for one second of rate)
+        @param   maxClients     int     Max remote ips followed (least recently active are forgotten)
+        @returns None
+    """
+    def __init__(self, rate: float, burst: float, clientRate: float, clientBurst: float, maxClients: int):
+        self.clientRate     = float(clientRate or 0)
+        self.clientBurst    = clientBurst
+        self.maxClients     = int(maxClients)
+        self.paced          = 0
+        self._global        = TokenBucket(rate or 0, burst)
+        self._vhosts        = {}
+        self._clients       = OrderedDict()
+        self._lock          = threading.Lock()
+
+    """
+        Limit bandwidth of a vhost
+        @param   key    str     Vhost key
+        @param   rate   float   Bytes by second (0 for unlimited)
+        @param   burst  float   Bucket capacity (None for one second of rate)
+        @returns None
+    """
+    def vhost(self, key: str, rate: float, burst: float = None):
+        self._vhosts[key] = TokenBucket(rate or 0, burst)
+
+    """
+        Is any level limited (unshaped writes are never split nor delayed)
+        @returns bool
+    """
+    @property
+    def enabled(self) -> bool:
+        return self._global.rate>0 or self.clientRate>0 or len([bucket for bucket in self._vhosts.values() if bucket.rate>0])>0
+
+    """
+        Buckets limiting a write
+        @param   key    tuple   (vhost key, remote ip)
+        @returns list           Limited TokenBucket
+    """
+    def _buckets(self, key: tuple) -> list:
+        vhostKey, remote = key
+        buckets = [self._global, self._vhosts.get(vhostKey, None)]
+        if self.clientRate>0 and remote != None:
+            with self._lock:
+                bucket = self._clients.get(remote, None)
+                if bucket == None:
+                    bucket = TokenBucket(self.clientRate, self.clientBurst)
+                    self._clients[remote] = bucket
+                    while len(self._clients)>self.maxClients:
+                        self._clients.popitem(last=False)
+                self._clients.move_to_end(remote)
+            buckets.append(bucket)
+        return [bucket for bucket in buckets if bucket != None and bucket.rate>0]
+
+    """
+        Bytes which can be written now, taken from all levels
+        @param   key    tuple   (vhost key, remote ip)
+        @param   count  int     Bytes wanted
+        @returns int            Bytes granted (0 to wait, see delay)
+    """
+    def grant(self, key: tuple, count: int) -> int:
+        buckets = self._buckets(key)
+        granted = count
+        taken   = []
+        for bucket in buckets:
+            granted = max(0, bucket.take(granted))
+            taken.append(granted)
+            if granted<=0:
+                break
+        # Give back what upper levels granted over the most limited one (never more than they took)
+        for i in range(0, len(taken)):
+            if taken[i]>granted:
+                buckets[i].charge(granted-taken[i])
+        if granted<count:
+            self.paced += 1
+        return granted
+
+    """
+        Delay before a write can be granted
+        @param   key    tuple   (vhost key, remote ip)
+        @param   count  int     Bytes wanted
+        @returns float          Seconds to wait
+    """
+    def delay(self, key: tuple, count: int) -> float:
+        count = min(count, self.QUANTUM)
+        return max([bucket.delay(count) for bucket in self._buckets(key)]+[0])
+
+    """
+        Account bytes written without pacing (in memory responses), later writes wait for them
+        @param   key    tuple   (vhost key, remote ip)
+        @param   count  int     Bytes written
+        @returns None
+    """
+    def charge(self, key: tuple, count: int):
+        for bucket in self._buckets(key):
+            bucket.charge(count)
+
+    """
+        Shaping counters
+        @returns dict
+    """
+    def stats(self) -> dict:
+        return {
+            "enabled"   : self.enabled,
+            "clients"   : len(self._clients),
+            "paced"     : self.paced
+        }
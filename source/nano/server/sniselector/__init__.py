@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict
+
+import ssl as libssl
+import threading
+
+"""
+    Class for ssl certificate selection by server name (sni) of a tls port, on vhosts host rules
+"""
+class SniSelector():
+
+    """
+        Constructor
+        @param   default    ssl.SSLContext  Context of clients without server name or matching no host
+        @param   maxEntries int             Max server names cached (least recently used are evicted)
+        @returns None
+    """
+    def __init__(self, default: libssl.SSLContext, maxEntries: int = 4096):
+        self.default    = default
+        self.maxEntries = int(maxEntries)
+        self.hits       = 0
+        self.misses     = 0
+        self._rules     = []        # [(host pattern, context)], in vhosts order
+        self._names     = OrderedDict()
+        self._lock      = threading.Lock()
+
+    """
+        Serve hosts of a vhost with a context
+        @param   patterns   list            Compiled host rules of vhost (same patterns than vhost resolving)
+        @param   context    ssl.SSLContext  Context of vhost certificate
+        @returns None
+    """
+    def add(self, patterns: list, context: libssl.SSLContext):
+        for pattern in patterns:
+            if pattern != None:
+                self._rules.append((pattern, context))
+        with self._lock:
+            self._names.clear()
+
+    """
+        Count of distinct contexts served
+        @returns int
+    """
+    def __len__(self) -> int:
+        return len(set(id(context) for rule, context in self._rules) | {id(self.default)})
+
+    """
+        Context of a server name, first matching host rule wins
+        @param   serverName str     Server name sent by client (None if not sent)
+        @returns ssl.SSLContext
+    """
+    def select(self, serverName: str) -> libssl.SSLContext:
+        if serverName == None:
+            return self.default
+        with self._lock:
+            context = self._names.get(serverName, None)
+            if context != None:
+                self._names.move_to_end(serverName)
+                self.hits += 1
+                return context
+
+        context = self.default
+        for rule, candidate in self._rules:
+            if rule.search(serverName) != None:
+                context = candidate
+                break
+
+        with self._lock:
+            self.misses += 1
+            if self.maxEntries>0:
+                self._names[serverName] = context
+                while len(self._names)>self.maxEntries:
+                    self._names.popitem(last=False)
+        return context
+
+    """
+        ssl.SSLContext.sni_callback, switch connexion to context of server name
+        @param   sslobj     ssl.SSLSocket   Connexion in handshake (or ssl.SSLObject)
+        @param   serverName str             Server name sent by client
+        @param   context    ssl.SSLContext  Current context of connexion
+        @returns None                       Handshake goes on
+    """
+    def callback(self, sslobj, serverName: str, context: libssl.SSLContext):
+        selected = self.select(serverName)
+        if selected is not context:
+            sslobj.context = selected
+
+    """
+        Cache counters
+        @returns dict
+    """
+    def stats(self) -> dict:
+        return {
+            "contexts"  : len(self),
+            "names"     : len(self._names),
+            "maxEntries": self.maxEntries,
+            "hits"      : self.hits,
+            "misses"    : self.misses
+        }
@@ -1,32 +1,61 @@
 
-from nano.event import Event
+from nano.event                 import Event
+from nano.server.eventloop      import EventLoop
+from nano.server.tokenbucket    import TokenBucket
 from collections.abc import Callable
 
+import errno
+import os
+import select
 import socket
+import stat
+import struct
 import threading
 import ssl as libssl
 import time
 
 """
-    Class for manage port listening (with over ssl wrapped if needed)
+    Class for manage port listening (with over ssl wrapped if needed), or unix socket listening
 """
 class SocketPortListener(threading.Thread):
 
     """
         Constructor
-        @param port     int         Port to listen
+        @param port     int|str     Port to listen, or path of unix socket
         @param ssl      bool        If socket wrapper is over ssl
         @param wrapper  Callable    Socket wrapper for "over" protocol, as ssl
+        @param loop     EventLoop   (facultative) Event loop accepting connexions, else listener has its own thread
+        @param reusePort bool       (facultative) Share port between processes, each one with its own accept queue
+        @param options  dict        (facultative) Listen options: backlog, deferAccept, noDelay, maxAcceptRate, acceptBurst, overRate, proxyProtocol, unixMode
         @returns None
     """
-    def __init__(self, port: int, ssl: bool, wrapper: Callable):
+    def __init__(self, port: int, ssl: bool, wrapper: Callable, loop: EventLoop = None, reusePort: bool = False, options: dict = None):
         self._socket    = None
         self._name      = "SocketPortListener#"+str(port)
         self._port      = port
+        self._unix      = isinstance(port, str)
+        self._inode     = None      # Unix socket file created by listener, removed on close
         self._ssl       = ssl
         self._wrapper   = wrapper
         self._event     = Event()
         self._listening = False
+        self._loop      = loop
+        self._reusePort = reusePort
+        self._options   = options or {}
+        self._backlog   = int(self._options.get("backlog", 1024))
+        self._limiter   = None
+        self._admission = None      # Callable(remote ip, port) -> bool, connexions limits
+        self._release   = None      # Callable(remote ip, port), admitted socket failed before its connexion
+        self._paused    = False
+        self.accepted   = 0
+        self.rejected   = 0
+        self.rate       = 0
+        self._rateCount = 0
+        self._rateStart = time.monotonic()
+
+        # Explicit connexion rate policy: "defer" leaves connexions in kernel queue, "reject" closes them
+        if self._options.get("maxAcceptRate", 0)>0:
+            self._limiter = TokenBucket(self._options["maxAcceptRate"], self._options.get("acceptBurst", None))
         threading.Thread.__init__(self)
 
     """
@@ -53,35 +82,108 @@ class SocketPortListener(threading.Thread):
 
     """
         Start port listening
+        @param   fileno int     (facultative) Listening socket inherited from old process (graceful reload), else socket is bound
         @returns None
     """
-    def listen(self):
-        #self._socket = socket.socket()
-        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    def listen(self, fileno: int = None):
+        if fileno != None:
+            self._socket = socket.socket(fileno=fileno)
+        elif self._unix:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self._reusePort:
+                # Kernel spreads incoming connexions between processes listening same port
+                self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         try:
-            # Listen all incoming ip on port
-            self._socket.bind(("0.0.0.0", self._port))
-            self._socket.listen(1)
+            if fileno != None:
+                if self._unix:
+                    self._inode = os.stat(self._port).st_ino
+            elif self._unix:
+                self._removeStale()
+                self._socket.bind(self._port)
+                self._inode = os.stat(self._port).st_ino
+                if self._options.get("unixMode", None) != None:
+                    os.chmod(self._port, int(str(self._options["unixMode"]), 8))
+            else:
+                # Listen all incoming ip on port
+                self._socket.bind(("0.0.0.0", self._port))
+            if fileno == None and not self._unix and self._options.get("deferAccept", 0)>0 and hasattr(socket, "TCP_DEFER_ACCEPT"):
+                # Wake up accept only once client has sent data
+                self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_DEFER_ACCEPT, int(self._options["deferAccept"]))
+            self._socket.listen(self._backlog)
+            self._socket.setblocking(0)
             self._listening = True
             self._event.fire("listen", { "port" : self._port, "ssl": self._ssl})
-            self.start()
+            if self._loop != None:
+                self._loop.register(self._socket, EventLoop.READ, self._onacceptable)
+            else:
+                self.start()
         except socket.error as e:
-            self._event.fire("error", {"exception", e})
+            self._event.fire("error", {"exception": e})
             self.close()
 
     """
         Close listening socket
+        @param   keepFile   bool    Keep unix socket file, listening socket is inherited by a new process
         @returns None
     """
-    def close(self):
+    def close(self, keepFile: bool = False):
+        if keepFile:
+            self._inode = None
         if self._listening:
             if self._socket != None:
+                if self._loop != None:
+                    self._loop.unregister(self._socket)
                 self._socket.close()
                 self._socket = None
+            if self._inode != None:
+                self._removeFile()
             self._listening = False
             self._event.fire("close", {"self": self })
 
+    """
+        Remove unix socket file left by a dead process (connexions refused), a live one is kept and bind fails
+        @returns None
+    """
+    def _removeStale(self):
+        try:
+            if not stat.S_ISSOCK(os.stat(self._port).st_mode):
+                return
+        except FileNotFoundError:
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self._port)
+        except ConnectionRefusedError:
+            os.unlink(self._port)
+        except OSError:
+            pass
+        finally:
+            probe.close()
+
+    """
+        Remove unix socket file of listener, unless replaced since bind
+        @returns None
+    """
+    def _removeFile(self):
+        try:
+            if os.stat(self._port).st_ino==self._inode:
+                os.unlink(self._port)
+        except OSError:
+            pass
+        self._inode = None
+
+    """
+        File descriptor of listening socket, given to a new process on graceful reload
+        @returns int    -1 if not listening
+    """
+    def fileno(self) -> int:
+        if not self._listening or self._socket == None:
+            return -1
+        return self._socket.fileno()
+
     """
         Register a callback to listen an event
         @paran   eventName  str         name of event
@@ -91,6 +193,16 @@ class SocketPortListener(threading.Thread):
     def on(self, eventName: str, callback: Callable):
         self._event.on(eventName, callback)
 
+    """
+        Set admission check of accepted connexions, refused ones are closed before any read or handshake
+        @param   callback   Callable    Callback(remote ip, port) returning bool
+        @param   release    Callable    (facultative) Callback(remote ip, port) once an admitted socket fails before "connect" is handled
+        @returns None
+    """
+    def admission(self, callback: Callable, release: Callable = None):
+        self._admission = callback
+        self._release   = release
+
     """
         Main routine of threading.Thread
         @returns None
@@ -98,21 +210,151 @@ class SocketPortListener(threading.Thread):
     def run(self):
         while self._listening:
             try:
-                socket, address = self._socket.accept()
-                self._event.fire("connect", { "port": self._port, "ssl": self._ssl, "socket": self._wrapper(socket) })
-            except libssl.SSLError as e:
-                msg = str(e)
-                try:
-                    pos = msg.index("SSLV3_ALERT_CERTIFICATE_UNKNOWN")
-                    pos = msg.index("sslv3 alert certificate unknown")
-                    # Ignore it
-                except ValueError as n:
-                    self._event.fire("error", {"exception", e})
-                    sys.exit(1)
-                    return
-            except Exception as e:
-                self._event.fire("error", {"exception", e})
-                sys.exit(1)
+                readable, writable, errors = select.select([self._socket], [], [], 1)
+            except (OSError, ValueError):
+                # Closed while waiting
+                break
+            if len(readable)>0:
+                delay = self._acceptPending()
+                if delay>0:
+                    time.sleep(delay)
+
+    """
+        Event loop readiness callback, accept incoming connexions
+        @param   mask   int     Ready mask
+        @returns None
+    """
+    def _onacceptable(self, mask: int):
+        delay = self._acceptPending()
+        if delay>0 and not self._paused:
+            # Stop readiness notifications until rate policy allows new connexions
+            self._paused = True
+            self._loop.unregister(self._socket)
+            self._loop.callLater(delay, self._resume)
+
+    """
+        Watch listening socket again after a rate policy pause (event loop)
+        @returns None
+    """
+    def _resume(self):
+        self._paused = False
+        if self._listening:
+            self._loop.register(self._socket, EventLoop.READ, self._onacceptable)
+
+    """
+        Accept all pending connexions of kernel queue
+        @returns float      Seconds to wait before accepting again (rate policy), else 0
+    """
+    def _acceptPending(self) -> float:
+        while self._listening:
+            if self._limiter != None and not self._limiter.consume():
+                if self._options.get("overRate", "defer")=="defer":
+                    return max(0.001, self._limiter.delay())
+                admitted = False
+            else:
+                admitted = True
+
+            try:
+                sock, address = self._socket.accept()
+            except (BlockingIOError, InterruptedError):
+                # Queue drained
+                return 0
+            except OSError as e:
+                self._event.fire("error", {"exception": e})
+                if e.errno in (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM):
+                    # Out of resources, let some connexions close before retry
+                    return 0.1
+                return 0
+
+            # Unix socket peers have no address
+            remote = address[0] if isinstance(address, tuple) else "unix"
+            if admitted and self._admission != None and not self._admission(remote, self._port):
+                admitted = False
+
+            if not admitted:
+                self.rejected += 1
+                sock.close()
+                continue
+            self._count()
+            self._connect(sock, remote)
+        return 0
+
+    """
+        Wrap an accepted socket and fire "connect"
+        With PROXY protocol, socket is given unwrapped with its wrapper, header comes before any tls data
+        @param   sock   socket.socket   Accepted socket
+        @param   remote str             Remote ip (admission key)
+        @returns None
+    """
+    def _connect(self, sock: socket.socket, remote: str):
+        try:
+            if self._options.get("noDelay", False) and not self._unix:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self._options.get("proxyProtocol", False):
+                self._event.fire("connect", { "port": self._port, "ssl": self._ssl, "socket": sock, "wrapper": self._wrapper, "remote": remote })
                 return
-            # a small sleep break 100% cpu disease, limit 50 incoming socket by second
-            time.sleep(0.02)
\ No newline at end of file
+            self._event.fire("connect", { "port": self._port, "ssl": self._ssl, "socket": self._wrapper(sock), "remote": remote })
+        except libssl.SSLError as e:
+            sock.close()
+            self._released(remote)
+            # Self signed certificate refused by client, ignore it
+            if str(e).lower().find("certificate unknown")<0:
+                self._event.fire("error", {"exception": e})
+        except Exception as e:
+            sock.close()
+            self._released(remote)
+            self._event.fire("error", {"exception": e})
+
+    """
+        Give back admission place of a socket failed before its connexion
+        @param   remote str     Remote ip (admission key)
+        @returns None
+    """
+    def _released(self, remote: str):
+        if self._admission != None and self._release != None:
+            self._release(remote, self._port)
+
+    """
+        Count accepted connexion, update accept rate (connexions over last second)
+        @returns None
+    """
+    def _count(self):
+        self.accepted   += 1
+        self._rateCount += 1
+        now = time.monotonic()
+        if now-self._rateStart>=1:
+            self.rate       = self._rateCount/(now-self._rateStart)
+            self._rateCount = 0
+            self._rateStart = now
+
+    """
+        Connexions waiting in kernel accept queue (linux TCP_INFO), -1 if unknown
+        @returns int
+    """
+    def queueDepth(self) -> int:
+        if self._socket == None or not hasattr(socket, "TCP_INFO"):
+            return -1
+        try:
+            # struct tcp_info: 8 x u8 then u32 rto, ato, snd_mss, rcv_mss, unacked (queue length on listen socket)
+            info = self._socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, 32)
+            return struct.unpack_from("I", info, 24)[0]
+        except OSError:
+            return -1
+
+    """
+        Listener counters
+        @returns dict
+    """
+    def stats(self) -> dict:
+        elapsed = time.monotonic()-self._rateStart
+        if elapsed>=1:
+            # No accept since last second
+            self.rate = self._rateCount/elapsed
+        return {
+            "port"      : self._port,
+            "backlog"   : self._backlog,
+            "queueDepth": self.queueDepth(),
+            "accepted"  : self.accepted,
+            "rejected"  : self.rejected,
+            "acceptRate": self.rate
+        }
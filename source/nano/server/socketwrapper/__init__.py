@@ -1,9 +1,18 @@
 
-from nano.event import Event
+from nano.event                 import Event
+from nano.server.eventloop      import EventLoop
+from nano.server.httpframer     import HttpFramer, FramingError
+from nano.server.http2session   import Http2Session
+from nano.server.proxyprotocol  import ProxyProtocol, ProxyProtocolError
+from nano.server.responsesequencer import ResponseSequencer
+from nano.server.timerwheel     import TimerWheel
 
+import os
 import socket
+import struct
 import threading
 from collections.abc import Callable
+from collections     import deque
 import ssl as libssl
 import errno
 import sys
@@ -21,19 +30,46 @@ class SocketWrapper(threading.Thread):
         @param socket   socket.socket  Socket to wrap
         @param port     int            Incoming socket port 
         @param ssl      bool           if protocol over ssl
+        @param loop     EventLoop      (facultative) Event loop driving io, else socket has its own thread
+        @param framer   HttpFramer     (facultative) Framer cutting received data into requests
         @returns None
     """
-    def __init__(self, socket: socket.socket, port: int, ssl: bool):
+    def __init__(self, socket: socket.socket, port: int, ssl: bool, loop: EventLoop = None, framer: HttpFramer = None):
         type(self).instances = (type(self).instances + 1) % 65535
         self._name      = "SocketProtoWrapper#"+str(type(self).instances)
         self._socket    = socket
-        self._local     = socket.getpeername()
-        self._remote    = socket.getsockname()
+        self._local     = self._address(socket.getsockname())
+        self._remote    = self._address(socket.getpeername())
         self._port      = port
         self._ssl       = ssl
         self._event     = Event()
-        self._buffer    = b''
+        self._framer    = framer or HttpFramer()
+        self._sequencer = ResponseSequencer(self)
+        self._outbuffer = bytearray()
+        self._outlock   = threading.Lock()
+        self._ondrain   = []
+        self._handoffs  = deque()   # Callbacks handed off by other threads (no loop)
+        self._handing   = False     # Hand-off thread of connexion is running
+        self._handlock  = threading.Lock()
+        self._outfile   = None      # File segment to send once buffer is flushed [file, offset, count, callback]
+        self._closing   = False
+        self._active    = time.monotonic()
+        self._opened    = self._active
+        self._requestStart = self._active   # First byte of current request (or connexion start)
+        self._progress  = self._active      # Last progress of buffered output
+        self._writing   = False     # Own thread is blocked in a write
+        self._handshaking = isinstance(socket, libssl.SSLSocket) and socket.version() == None   # Tls handshake not done yet
+        self._proxy     = None      # PROXY protocol header being read
+        self._wrapper   = None      # Socket wrapper (ssl) applied once PROXY protocol header is read
+        self._timers    = None
+        self._timer     = None
+        self._http2Settings = None  # Http/2 allowed on connexion (ALPN "h2" or prior knowledge)
+        self.http2      = None      # Http2Session once connexion speaks http/2
+        self.loop       = loop
         self.closed     = False
+        self.requests   = 0         # Requests received on connexion
+        self.pending    = 0         # Requests waiting for their response
+        self.timeouts   = {}
         self.terminator = b'\r\n\r\n'
         threading.Thread.__init__(self)
 
@@ -44,6 +80,16 @@ class SocketWrapper(threading.Thread):
     def __del__(self):
         self.closed     = True
 
+    """
+        Host and port of a socket address, unix sockets give (path, 0) and unnamed peers ("unix", 0)
+        @param   address    tuple|str   Address from getsockname or getpeername
+        @returns tuple
+    """
+    def _address(self, address) -> tuple:
+        if isinstance(address, tuple):
+            return address[0:2]
+        return (address or "unix", 0)
+
     """
         Hash, for makes object hashable
         @returns None
@@ -58,44 +104,353 @@ class SocketWrapper(threading.Thread):
     def __eq__(self, other):
         return self._name==other._name
 
+    """
+        Start socket reading, from its own thread or from event loop
+        @returns None
+    """
+    def start(self):
+        if self.loop == None:
+            threading.Thread.start(self)
+            return
+        self._socket.setblocking(0)
+        self.loop.register(self._socket, EventLoop.READ, self._onready)
+
     """
         Routine of threading.Thread
         @returns None
     """
     def run(self):
-        self._socket.setblocking(0)
+        # Blocking socket (writes from workers block), timeouts close it from timer wheel, waking up recv
+        self._socket.setblocking(1)
+        if self.timeouts.get("writeStall", 0)>0:
+            # Kernel fails a write without progress for stall timeout
+            stall = self.timeouts["writeStall"]
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, struct.pack("ll", int(stall), int((stall%1)*1000000)))
+        while self._proxy != None and not self.closed:
+            # Blocks own thread only, a slow proxy header is closed by header timeout
+            self._readProxy()
+        if self._handshaking:
+            # Blocks own thread only, a slow handshake is closed by header timeout
+            self._handshake()
         while not self.closed:
             if self._socket.fileno()<0:
                 self.closed = True
                 break
             try:
-                data = self._socket.recv(4096)
-                if len(data)>0:
-                    self._buffer = self._buffer + data
-                    if self.terminator==None or self._buffer.endswith(self.terminator):
-                        self._event.fire("data", { "socket": self, "port": self._port, "ssl": self._ssl, "data": self._buffer })
-                        self._buffer = b''
-                # No need to hard loop to collect socket data 
-                # ( 4096b / 0.0039s > 1Mb / s), will not allow more
-                time.sleep(0.0039) 
-            except BlockingIOError:
-                # No data
-                continue
+                data = self._socket.recv(65536)
+                if len(data)==0:
+                    # Remote closed
+                    break
+                self._receive(data)
             except libssl.SSLWantReadError:
                 # No data
                 continue
-            except socket.error as e:
-                err = e.args[0]
-                if err == errno.EAGAIN or err == errno.EWOULDBLOCK:
-                    continue
-                else:
-                    self._event.fire("error", { "socket": self._socket, "port": self._port, "ssl": self._ssl, "exception": e })
-                    self._socket.shutdown(2)
+            except (socket.error, ValueError) as e:
+                if self.closed:
+                    # Closed by response writer (dispatch worker thread)
                     break
+                self._event.fire("error", { "socket": self._socket, "port": self._port, "ssl": self._ssl, "exception": e })
+                try:
+                    self._socket.shutdown(2)
+                except socket.error:
+                    pass
+                break
 
         self.close()
         sys.exit(0)
 
+    """
+        Event loop readiness callback
+        @param   mask   int     Ready mask (EventLoop.READ | EventLoop.WRITE)
+        @returns None
+    """
+    def _onready(self, mask: int):
+        if self._proxy != None:
+            # Tls handshake, or request, continues on next readiness
+            self._readProxy()
+            return
+        if self._handshaking:
+            self._handshake()
+            if self._handshaking or self.closed:
+                return
+        if mask & EventLoop.READ:
+            self._onreadable()
+        if mask & EventLoop.WRITE and not self.closed:
+            self._flush()
+
+    """
+        Expect a PROXY protocol header before connexion data, then wrap socket (ssl)
+        @param   wrapper    Callable    Socket wrapper of listener
+        @returns None
+    """
+    def setproxy(self, wrapper: Callable):
+        self._proxy     = ProxyProtocol()
+        self._wrapper   = wrapper
+
+    """
+        Read PROXY protocol header, then connexion takes real client and destination addresses
+        @returns None
+    """
+    def _readProxy(self):
+        try:
+            if not self._proxy.read(self._socket):
+                return
+        except (BlockingIOError, InterruptedError):
+            return
+        except (ProxyProtocolError, socket.error, ValueError) as e:
+            if not self.closed and not isinstance(e, ConnectionResetError):
+                self._event.fire("error", { "socket": self._socket, "port": self._port, "ssl": self._ssl, "exception": e })
+            self.close()
+            return
+        proxied = self._proxy.remote != None
+        if proxied:
+            self._remote, self._local = self._proxy.remote, self._proxy.local
+        self._proxy = None
+        sock = self._socket
+        try:
+            if self.loop != None:
+                # Wrapped socket takes file descriptor of raw one, registered again
+                self.loop.unregister(sock)
+            self._socket = self._wrapper(sock)
+        except Exception as e:
+            self._event.fire("error", { "socket": sock, "port": self._port, "ssl": self._ssl, "exception": e })
+            self._socket = sock
+            self.close()
+            return
+        self._handshaking = isinstance(self._socket, libssl.SSLSocket) and self._socket.version() == None
+        if self.loop != None:
+            self.loop.register(self._socket, EventLoop.READ, self._onready)
+        if proxied:
+            # Handlers may refuse real client (limits), closing connexion
+            self._event.fire("proxy", { "socket": self, "port": self._port, "ssl": self._ssl, "remote": self._remote, "local": self._local })
+
+    """
+        Run tls handshake, step by step on socket readiness in event loop, fires "handshake" once done or failed
+        @returns None
+    """
+    def _handshake(self):
+        try:
+            self._socket.do_handshake()
+        except (libssl.SSLWantReadError, libssl.SSLWantWriteError) as e:
+            if self.loop != None:
+                # Continued from _onready
+                mask = EventLoop.READ if isinstance(e, libssl.SSLWantReadError) else EventLoop.READ | EventLoop.WRITE
+                self.loop.modify(self._socket, mask, self._onready)
+                return
+            self._handshakeFailed(e)
+            return
+        except (socket.error, ValueError) as e:
+            self._handshakeFailed(e)
+            return
+        self._handshaking = False
+        self._event.fire("handshake", { "socket": self, "port": self._port, "ssl": self._ssl, "duration": time.monotonic()-self._opened, "resumed": self._socket.session_reused, "failed": False })
+        if self.loop != None:
+            self.loop.modify(self._socket, EventLoop.READ, self._onready)
+        if self._http2Settings != None and self._socket.selected_alpn_protocol()=="h2":
+            self._startHttp2()
+
+    """
+        Close connexion after a failed tls handshake
+        @param   e      Exception   Handshake error
+        @returns None
+    """
+    def _handshakeFailed(self, e: Exception):
+        if not self.closed:
+            self._event.fire("handshake", { "socket": self, "port": self._port, "ssl": self._ssl, "duration": time.monotonic()-self._opened, "resumed": False, "failed": True })
+            # Self signed certificate refused by client, or client gone (port probe), ignore it
+            if str(e).lower().find("certificate unknown")<0 and not isinstance(e, (libssl.SSLEOFError, ConnectionResetError)):
+                self._event.fire("error", { "socket": self._socket, "port": self._port, "ssl": self._ssl, "exception": e })
+        self.close()
+
+    """
+        Read all available data from socket (event loop)
+        @returns None
+    """
+    def _onreadable(self):
+        while not self.closed:
+            try:
+                data = self._socket.recv(4096)
+            except (BlockingIOError, libssl.SSLWantReadError, libssl.SSLWantWriteError):
+                return
+            except socket.error as e:
+                self._event.fire("error", { "socket": self._socket, "port": self._port, "ssl": self._ssl, "exception": e })
+                self.close()
+                return
+            if len(data)==0:
+                # Remote closed
+                self.close()
+                return
+            self._receive(data)
+            # Ssl may hold decrypted data not seen by selector
+            if not (self._ssl and self._socket.pending()>0) and len(data)<4096:
+                return
+
+    """
+        Collect received data, fire each complete request (or websocket frame)
+        @param   data   bytes   Received data
+        @returns None
+    """
+    def _receive(self, data: bytes):
+        self._active = time.monotonic()
+        if self.http2 == None and self._http2Settings != None and self.requests==0 and self._framer.pending()==0 and bytes(data[0:4])==b'PRI ':
+            # Http/2 with prior knowledge (h2c), starts with client connexion preface
+            self._startHttp2()
+        if self.http2 != None:
+            self.http2.feed(data)
+            return
+        if self._framer.pending()==0:
+            self._requestStart = self._active
+        self._framer.feed(data)
+        try:
+            while not self.closed:
+                # Protocol may switch to websocket while handling a frame
+                self._framer.websocket = self.terminator==None
+                frame = self._framer.next()
+                if frame == None:
+                    break
+                # Http responses are written in requests order, websocket frames are not sequenced
+                conn = self if self.terminator==None else self._sequencer.slot()
+                self._event.fire("data", { "socket": conn, "port": self._port, "ssl": self._ssl, "data": frame })
+                try:
+                    frame.release()
+                except BufferError:
+                    pass
+        except FramingError as e:
+            self._event.fire("invalid", { "socket": self._sequencer.slot(), "port": self._port, "ssl": self._ssl, "code": e.code, "exception": e })
+            return
+        self._framer.compact()
+
+    """
+        Allow http/2 on connexion, negotiated by ALPN or with prior knowledge
+        @param   settings   dict    Http2Session settings, None to disable
+        @returns None
+    """
+    def sethttp2(self, settings: dict):
+        self._http2Settings = settings
+
+    """
+        Switch connexion to http/2, requests are then fired by session on its streams
+        @returns None
+    """
+    def _startHttp2(self):
+        self.http2 = Http2Session(self, self._http2Settings, self._event.fire)
+        self.http2.start()
+
+    """
+        Send as much buffered output as socket accepts (event loop)
+        @returns None
+    """
+    def _flush(self):
+        with self._outlock:
+            while len(self._outbuffer)>0:
+                try:
+                    sent = self._socket.send(self._outbuffer)
+                except (BlockingIOError, libssl.SSLWantReadError, libssl.SSLWantWriteError):
+                    break
+                except socket.error as e:
+                    self._outbuffer = bytearray()
+                    self._event.fire("error", { "socket": self._socket, "port": self._port, "ssl": self._ssl, "exception": e })
+                    self.loop.callSoon(self.close)
+                    return
+                del self._outbuffer[:sent]
+                self._progress = time.monotonic()
+            drained = len(self._outbuffer)==0
+            if drained and self._outfile != None:
+                drained = self._pumpfile()
+
+        if not drained:
+            self.loop.modify(self._socket, EventLoop.READ | EventLoop.WRITE, self._onready)
+            return
+
+        self.loop.modify(self._socket, EventLoop.READ, self._onready)
+        if self._closing:
+            self._closing = False
+            self.close()
+            return
+        callbacks, self._ondrain = self._ondrain, []
+        for callback in callbacks:
+            callback()
+
+    """
+        Send as much of current file segment as socket accepts, with os.sendfile (event loop, under output lock)
+        @returns bool   True once segment is sent
+    """
+    def _pumpfile(self):
+        file, offset, count, callback = self._outfile
+        while count>0:
+            try:
+                sent = os.sendfile(self._socket.fileno(), file.fileno(), offset, count)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                self._event.fire("error", { "socket": self._socket, "port": self._port, "ssl": self._ssl, "exception": e })
+                self.loop.callSoon(self.close)
+                break
+            if sent==0:
+                # File is shorter than expected
+                count = 0
+                break
+            offset += sent
+            count  -= sent
+            self._progress = time.monotonic()
+        if count>0 and not self.closed:
+            self._outfile = [file, offset, count, callback]
+            return False
+        self._outfile = None
+        self._ondrain.append(callback)
+        return True
+
+    """
+        Send a file segment after written data, zero-copy for plain sockets
+        @param   file       file        File opened in binary mode
+        @param   offset     int         First byte
+        @param   count      int         Bytes to send
+        @param   callback   Callable    Called once segment is sent
+        @returns None
+    """
+    def sendfile(self, file, offset: int, count: int, callback: Callable):
+        if self.closed or self._closing:
+            return
+        self._active = time.monotonic()
+        if self.loop == None:
+            self._writing = True
+            try:
+                # Blocking sendfile, fails once stalled for SO_SNDTIMEO
+                while count>0:
+                    sent = os.sendfile(self._socket.fileno(), file.fileno(), offset, count)
+                    if sent==0:
+                        break
+                    offset += sent
+                    count  -= sent
+            except OSError:
+                self.close()
+                return
+            finally:
+                self._writing = False
+            callback()
+            return
+        with self._outlock:
+            if len(self._outbuffer)==0:
+                self._progress = self._active
+            self._outfile = [file, offset, count, callback]
+        if self.loop.inLoop():
+            self._flush()
+        else:
+            self.loop.callSoon(self._flush)
+
+    """
+        Call back once all written data has been sent
+        @param   callback   Callable    Callback without arguments
+        @returns None
+    """
+    def drain(self, callback: Callable):
+        if self.loop == None:
+            # Own thread writes are synchronous
+            callback()
+            return
+        self._ondrain.append(callback)
+        self.loop.callSoon(self._flush)
+
     """
         Force socket to keepalive
         @param   value  bool  Enable keepalive
@@ -107,14 +462,182 @@ class SocketWrapper(threading.Thread):
         else:
             self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 0)
 
+    """
+        Connexion state, for registry stats
+        @returns str    "handshake" (proxy header or tls), "http2", "websocket", "writing" (response running or buffered), "reading" (request incomplete) or "idle"
+    """
+    @property
+    def state(self) -> str:
+        if self._handshaking or self._proxy != None:
+            return "handshake"
+        if self.http2 != None:
+            return "http2"
+        if self.terminator == None:
+            return "websocket"
+        if self._writing or self.pending>0 or len(self._outbuffer)>0 or self._outfile != None:
+            return "writing"
+        if self._framer.state()!="idle":
+            return "reading"
+        return "idle"
+
+    """
+        Close connexion on timeouts, checked from a timer wheel
+        @param   timers     TimerWheel  Wheel shared by connexions
+        @param   timeouts   dict        Seconds (0 to disable) of "header", "body", "keepAlive", "websocket" and "writeStall"
+        @returns None
+    """
+    def settimeouts(self, timers: TimerWheel, timeouts: dict):
+        self._timers    = timers
+        self.timeouts   = timeouts
+        self._checkTimeouts()
+
+    """
+        Timer of connexion expired (wheel thread), check it on loop thread
+        @returns None
+    """
+    def _ontimer(self):
+        if self.loop != None:
+            self.loop.callSoon(self._checkTimeouts)
+        else:
+            self._checkTimeouts()
+
+    """
+        Close connexion if its current deadline is over, else check again at deadline
+        @returns None
+    """
+    def _checkTimeouts(self):
+        if self.closed or self._timers == None:
+            return
+        now      = time.monotonic()
+        deadline = self._deadline()
+        if deadline != None and now>=deadline:
+            if self.http2 != None:
+                self.end(self.http2.goaway())
+                return
+            self.close()
+            return
+        # Deadline may come earlier on state change (response sent, keep alive), checked at least each shortest timeout
+        delays = [timeout for timeout in self.timeouts.values() if timeout>0]
+        if deadline != None:
+            delays.append(deadline-now)
+        if len(delays)>0:
+            self._timer = self._timers.schedule(min(delays), self._ontimer)
+
+    """
+        Deadline of connexion from its state
+        @returns float  Monotonic time, None if not limited now
+    """
+    def _deadline(self) -> float:
+        if self._writing:
+            # Stalled writes of own thread fail by themselves
+            return None
+        if self.loop != None and (len(self._outbuffer)>0 or self._outfile != None):
+            return self._limit(self._progress, "writeStall")
+        if self.terminator == None:
+            return self._limit(self._active, "websocket")
+        if self.pending>0:
+            return None
+        if self.http2 != None:
+            # Open streams wait for their request body or for window updates
+            return self._limit(self._active, "body" if len(self.http2.streams)>0 else "keepAlive")
+        state = self._framer.state()
+        if state=="headers" or (state=="idle" and self.requests==0):
+            # Not refreshed by received data, slow headers are closed in time
+            return self._limit(self._requestStart, "header")
+        if state=="body":
+            return self._limit(self._active, "body")
+        return self._limit(self._active, "keepAlive")
+
+    """
+        Deadline from a start time and a timeout name
+        @param   start  float   Monotonic time
+        @param   name   str     Timeout name
+        @returns float          None if timeout is disabled
+    """
+    def _limit(self, start: float, name: str) -> float:
+        timeout = self.timeouts.get(name, 0)
+        if timeout>0:
+            return start+timeout
+        return None
+
     """
         Write data on socket
         @param   bytes   data
         @returns None
     """
     def write(self, data: bytes):
-        if not self.closed:
-            self._socket.send(data)
+        if self.closed or self._closing:
+            return
+        self._active = time.monotonic()
+        if self.loop == None:
+            self._writing = True
+            try:
+                self._socket.sendall(data)
+            except socket.error:
+                # Stalled (SO_SNDTIMEO) or reset
+                self.close()
+            finally:
+                self._writing = False
+            return
+        with self._outlock:
+            if len(self._outbuffer)==0 and self._outfile == None:
+                self._progress = self._active
+            self._outbuffer += data
+        if self.loop.inLoop():
+            self._flush()
+        else:
+            self.loop.callSoon(self._flush)
+
+    """
+        Response is complete (connexion stays open), for api compatibility with ResponseSlot
+        @returns None
+    """
+    def finish(self):
+        pass
+
+    """
+        Run a streaming response (file download) now, for api compatibility with ResponseSlot
+        @param   callback   Callable    Starts stream, without arguments
+        @returns None
+    """
+    def stream(self, callback: Callable):
+        callback()
+
+    """
+        Run a callback on connexion side, never on calling thread when it is not connexion one (a stream may last)
+        With a loop, callback runs on loop thread, else on hand-off thread of connexion, in order
+        @param   callback   Callable    Callback without arguments
+        @returns None
+    """
+    def handoff(self, callback: Callable):
+        if self.loop != None:
+            if self.loop.inLoop():
+                callback()
+            else:
+                self.loop.callSoon(callback)
+            return
+        with self._handlock:
+            self._handoffs.append(callback)
+            if self._handing:
+                return
+            self._handing = True
+        threading.Thread(target=self._runHandoffs, name=self._name+"-handoff", daemon=True).start()
+
+    """
+        Run callbacks handed off to connexion, until none is left
+        @returns None
+    """
+    def _runHandoffs(self):
+        while True:
+            with self._handlock:
+                if len(self._handoffs)==0:
+                    self._handing = False
+                    return
+                callback = self._handoffs.popleft()
+            try:
+                callback()
+            except Exception as e:
+                print("Connexion \""+self._name+"\" hand-off error: "+str(e))
 
     """
         Write data on socket and close
@@ -122,11 +645,24 @@ class SocketWrapper(threading.Thread):
         @returns None
     """
     def end(self, data: bytes):
+        if self.closed or self._closing:
+            return
+        if self.loop != None:
+            self.write(data)
+            self._closing = True
+            self.loop.callSoon(self._flush)
+            return
         if not self.closed:
-            self._socket.send(data)
+            self._writing = True
+            try:
+                self._socket.sendall(data)
+            except socket.error:
+                pass
             self.closed = True
+            if self._timer != None:
+                self._timer.cancel()
             self._event.fire("close", { "socket": self._socket, "port": self._port, "ssl": self._ssl})
-            self._socket.close()
+            self._shutdown()
 
     """
         Close socket
@@ -135,8 +671,33 @@ class SocketWrapper(threading.Thread):
     def close(self):
         if not self.closed:
             self.closed = True
+            if self._timer != None:
+                self._timer.cancel()
             self._event.fire("close", { "socket": self._socket, "port": self._port, "ssl": self._ssl})
-            self._socket.close()
+            if self.loop != None:
+                # Unregister before closing, a reused file descriptor must not hit a stale registration
+                self.loop.callSoon(self._release)
+            else:
+                self._shutdown()
+
+    """
+        Shutdown and close socket, wakes up its reading thread
+        @returns None
+    """
+    def _shutdown(self):
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self._socket.close()
+
+    """
+        Unregister and close socket from event loop
+        @returns None
+    """
+    def _release(self):
+        self.loop.unregister(self._socket)
+        self._socket.close()
 
     """
         Add event handler
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+from collections.abc import Callable
+
+import math
+import threading
+import time
+
+"""
+    Class for a timer of a TimerWheel
+"""
+class Timer():
+
+    """
+        Constructor
+        @param   wheel      TimerWheel  Wheel holding timer
+        @param   expire     int         Tick of expiration
+        @param   callback   Callable    Callback without arguments
+        @returns None
+    """
+    def __init__(self, wheel, expire: int, callback: Callable):
+        self._wheel     = wheel
+        self._slot      = None      # Slot (set) holding timer, None once fired or cancelled
+        self.expire     = expire
+        self.callback   = callback
+
+    """
+        Cancel timer, O(1)
+        @returns None
+    """
+    def cancel(self):
+        self._wheel.cancel(self)
+
+"""
+    Class for hierarchical timer wheel, one thread for all timers (connexion timeouts)
+    Level 0 slots are ticks, each upper level slot is a whole turn of level below, cascaded down when reached
+    Insertion and cancellation are O(1), timers fire at tick resolution (never before their delay)
+"""
+class TimerWheel(threading.Thread):
+
+    """
+        Constructor
+        @param   resolution float   Seconds of a tick
+        @param   bits       int     Slots of a level are 2^bits
+        @param   levels     int     Levels (max delay is resolution*2^(bits*levels))
+        @param   name       str     Name of wheel thread
+        @returns None
+    """
+    def __init__(self, resolution: float = 0.5, bits: int = 6, levels: int = 4, name: str = "TimerWheel"):
+        threading.Thread.__init__(self, name=name, daemon=True)
+        self.resolution = float(resolution)
+        self._bits      = bits
+        self._mask      = (1<<bits)-1
+        self._maxTicks  = (1<<(bits*levels))-1
+        self._levels    = [[set() for i in range(0, 1<<bits)] for level in range(0, levels)]
+        self._tick      = 0
+        self._origin    = time.monotonic()
+        self._lock      = threading.Lock()
+        self._stopped   = threading.Event()
+        self.timers     = 0
+        self.fired      = 0
+        self.running    = False
+
+    """
+        Call back after a delay (thread safe), from wheel thread
+        @param   delay      float       Delay in seconds
+        @param   callback   Callable    Callback without arguments, must be short (dispatch long work elsewhere)
+        @returns Timer
+    """
+    def schedule(self, delay: float, callback: Callable) -> Timer:
+        expire = math.ceil((time.monotonic()-self._origin+max(0, delay))/self.resolution)
+        with self._lock:
+            timer = Timer(self, min(self._tick+self._maxTicks, max(self._tick+1, expire)), callback)
+            self._place(timer)
+            self.timers += 1
+        return timer
+
+    """
+        Cancel a timer (thread safe)
+        @param   timer  Timer
+        @returns None
+    """
+    def cancel(self, timer: Timer):
+        with self._lock:
+            if timer._slot != None:
+                timer._slot.discard(timer)
+                timer._slot = None
+                self.timers -= 1
+
+    """
+        Put timer in the slot of the lowest level whose turn holds its expiration (under lock)
+        @param   timer  Timer
+        @returns None
+    """
+    def _place(self, timer: Timer):
+        levels = len(self._levels)
+        for level in range(0, levels):
+            turn = self._bits*(level+1)
+            if (timer.expire>>turn)==(self._tick>>turn) or level==levels-1:
+                slot = self._levels[level][(timer.expire>>(self._bits*level)) & self._mask]
+                break
+        slot.add(timer)
+        timer._slot = slot
+
+    """
+        Move to next tick: cascade upper levels reaching a new slot, then take expired timers (under lock)
+        @returns list   Expired Timer
+    """
+    def _advance(self) -> list:
+        self._tick += 1
+        top = 0
+        for level in range(1, len(self._levels)):
+            if self._tick & ((1<<(self._bits*level))-1) != 0:
+                break
+            top = level
+        # Highest level first, its timers may land in a lower slot cascaded right after
+        for level in range(top, 0, -1):
+            slot    = self._levels[level][(self._tick>>(self._bits*level)) & self._mask]
+            timers  = list(slot)
+            slot.clear()
+            for timer in timers:
+                self._place(timer)
+        slot    = self._levels[0][self._tick & self._mask]
+        expired = list(slot)
+        slot.clear()
+        for timer in expired:
+            timer._slot = None
+        self.timers -= len(expired)
+        self.fired  += len(expired)
+        return expired
+
+    """
+        Ask wheel to stop
+        @returns None
+    """
+    def stop(self):
+        self.running = False
+        self._stopped.set()
+
+    """
+        Routine of threading.Thread
+        @returns None
+    """
+    def run(self):
+        self.running = True
+        while self.running:
+            target = int((time.monotonic()-self._origin)/self.resolution)
+            while self._tick<target:
+                with self._lock:
+                    expired = self._advance()
+                for timer in expired:
+                    try:
+                        timer.callback()
+                    except Exception as e:
+                        print("Timer wheel callback error: "+str(e))
+            self._stopped.wait(max(0, self._origin+(self._tick+1)*self.resolution-time.monotonic()))
+
+    """
+        Wheel counters
+        @returns dict
+    """
+    def stats(self) -> dict:
+        return {
+            "timers"    : self.timers,
+            "fired"     : self.fired,
+            "tick"      : self._tick
+        }
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+"""
+    Class for token bucket rate limiting (tokens refilled continuously up to burst)
+"""
+class TokenBucket():
+
+    """
+        Constructor
+        @param   rate   float   Tokens added by second (0 for unlimited)
+        @param   burst  float   Bucket capacity (default one second of rate)
+        @returns None
+    """
+    def __init__(self, rate: float, burst: float = None):
+        self.rate       = float(rate)
+        self.burst      = float(burst or rate)
+        self._tokens    = self.burst
+        self._updated   = time.monotonic()
+        self._lock      = threading.Lock()
+
+    """
+        Add tokens earned since last update
+        @returns None
+    """
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens  = min(self.burst, self._tokens + (now-self._updated)*self.rate)
+        self._updated = now
+
+    """
+        Take tokens if available
+        @param   count  float   Tokens wanted
+        @returns bool           True if taken
+    """
+    def consume(self, count: float = 1) -> bool:
+        if self.rate<=0:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens>=count:
+                self._tokens -= count
+                return True
+            return False
+
+    """
+        Take up to count tokens
+        @param   count  int     Tokens wanted
+        @returns int            Tokens taken (0 if bucket is empty or owes tokens)
+    """
+    def take(self, count: int) -> int:
+        if self.rate<=0:
+            return count
+        with self._lock:
+            self._refill()
+            taken = int(max(0, min(count, self._tokens)))
+            self._tokens -= taken
+            return taken
+
+    """
+        Take tokens even if not available, bucket owes them (refilled before next take)
+        @param   count  float   Tokens used (negative to give back taken tokens)
+        @returns None
+    """
+    def charge(self, count: float):
+        if self.rate<=0:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.burst, self._tokens-count)
+
+    """
+        Delay before count tokens are available
+        @param   count  float   Tokens wanted
+        @returns float          Seconds to wait (0 if available now)
+    """
+    def delay(self, count: float = 1) -> float:
+        if self.rate<=0:
+            return 0
+        with self._lock:
+            self._refill()
+            if self._tokens>=count:
+                return 0
+            return (min(count, self.burst)-self._tokens)/self.rate
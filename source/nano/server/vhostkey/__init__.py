@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+"""
+    Class for identifying a vhost (its listeners and hosts), whatever config object it comes from
+    Shared by server (caches, shaper) and applicatives (worker pools), keys of a vhost are the same for both
+"""
+class VhostKey():
+
+    """
+        Listeners of a vhost: its tcp "port" and its "unix" socket path
+        @params  vhost      dict    Vhost config
+        @returns list               Ports (int) and unix socket paths (str)
+    """
+    def ports(self, vhost: dict) -> list:
+        ports = []
+        if "port" in vhost:
+            ports.append(int(vhost["port"]))
+        if vhost.get("unix", None) != None:
+            ports.append(str(vhost["unix"]))
+        return ports
+
+    """
+        Key of a vhost: "<ports>:<hosts>"
+        @params  vhost      dict    Vhost config
+        @returns str
+    """
+    def key(self, vhost: dict) -> str:
+        return ",".join([str(port) for port in self.ports(vhost)])+":"+",".join(vhost.get("hosts", []))
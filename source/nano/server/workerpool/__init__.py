@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+from collections.abc import Callable
+
+import collections
+import queue
+import threading
+
+"""
+    Class for bounded pool of worker threads (fixed threads, bounded queue)
+"""
+class WorkerPool():
+
+    """
+        Constructor, start worker threads
+        @param   name       str     Name prefix of threads
+        @param   threads    int     Number of worker threads
+        @param   maxQueue   int     Max waiting tasks (0 for unbounded)
+        @returns None
+    """
+    def __init__(self, name: str, threads: int, maxQueue: int):
+        self.name       = name
+        self.threads    = max(1, int(threads))
+        self.maxQueue   = int(maxQueue)
+        self.active     = 0
+        self.completed  = 0
+        self.rejected   = 0
+        self._queue     = queue.Queue(self.maxQueue)
+        self._lock      = threading.Lock()
+        self._serials   = {}        # Serial key -> tasks waiting for the running one of the key
+        self._workers   = []
+        for i in range(self.threads):
+            worker = threading.Thread(target=self._work, name=name+"#"+str(i), daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    """
+        Queue a task, never blocks
+        Tasks of a same serial key run one after the other in submit order (messages of a websocket connexion)
+        @param   task   Callable    Task without arguments
+        @param   serial str         Serial key, None if task can run along any other
+        @returns bool               False if queue is full (task rejected)
+    """
+    def submit(self, task: Callable, serial: str = None) -> bool:
+        if serial != None:
+            return self._submitSerial(task, serial)
+        try:
+            self._queue.put_nowait(task)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+
+    """
+        Queue a task after the ones of its serial key, only first task of a key waits in pool queue
+        @param   task   Callable    Task without arguments
+        @param   serial str         Serial key
+        @returns bool               False if queue is full (task rejected)
+    """
+    def _submitSerial(self, task: Callable, serial: str) -> bool:
+        with self._lock:
+            tasks = self._serials.get(serial, None)
+            if tasks != None:
+                if self.maxQueue>0 and len(tasks)>=self.maxQueue:
+                    self.rejected += 1
+                    return False
+                tasks.append(task)
+                return True
+            try:
+                self._queue.put_nowait(lambda: self._runSerial(task, serial))
+            except queue.Full:
+                self.rejected += 1
+                return False
+            self._serials[serial] = collections.deque()
+            return True
+
+    """
+        Run a task then the ones queued meanwhile for its serial key
+        @param   task   Callable    First task
+        @param   serial str         Serial key
+        @returns None
+    """
+    def _runSerial(self, task: Callable, serial: str):
+        while task != None:
+            try:
+                task()
+            except Exception as e:
+                print("Worker pool \""+self.name+"\" task error: "+str(e))
+            with self._lock:
+                tasks = self._serials[serial]
+                if len(tasks)>0:
+                    task = tasks.popleft()
+                else:
+                    task = None
+                    del self._serials[serial]
+
+    """
+        Stop workers once queued tasks are done
+        @returns None
+    """
+    def shutdown(self):
+        for worker in self._workers:
+            self._queue.put(None)
+
+    """
+        Pool counters
+        @returns dict
+    """
+    def stats(self) -> dict:
+        return {
+            "threads"   : self.threads,
+            "maxQueue"  : self.maxQueue,
+            "queued"    : self._queue.qsize(),
+            "active"    : self.active,
+            "completed" : self.completed,
+            "rejected"  : self.rejected
+        }
+
+    """
+        Routine of worker threads
+        @returns None
+    """
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            if task == None:
+                return
+            with self._lock:
+                self.active += 1
+            try:
+                task()
+            except Exception as e:
+                print("Worker pool \""+self.name+"\" task error: "+str(e))
+            with self._lock:
+                self.active    -= 1
+                self.completed += 1
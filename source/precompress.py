@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+"""
+    Build step for static assets of applications
+    - writes a gzip sibling (file.css.gz) of compressible files ("mimes.compressible"), served as is to clients accepting gzip
+    - writes app/<name>/config/assets.json, the manifest of content hashes and fingerprinted urls (file.<hash>.css),
+      with size and mtime of hashed files: a file changed since build is not served as immutable
+    Usage: python3 precompress.py [level]
+"""
+
+from nano.config            import Config
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+
+if __name__ == '__main__':
+
+    dirRoot = os.path.dirname(os.path.abspath(__file__))+os.path.sep
+    config  = Config(dirRoot+"config")
+    DS      = os.path.sep
+    level   = int(sys.argv[1]) if len(sys.argv)>1 else 9
+    minSize = config.get("http.compression.minSize", 1024)
+    mimes   = config.get("mimes.byExtensions", {})
+    types   = config.get("mimes.compressible", [])
+
+    for appName in sorted(os.listdir(dirRoot+"app")):
+        publicPath = dirRoot+"app"+DS+appName+DS+"public"
+        if not os.path.isdir(publicPath):
+            continue
+        manifest = {}
+        for directory, dirnames, filenames in os.walk(publicPath):
+            for filename in sorted(filenames):
+                path = os.path.join(directory, filename)
+                if filename.endswith(".gz"):
+                    # Stale sibling, source file is gone
+                    if not os.path.isfile(path[:-3]):
+                        os.remove(path)
+                    continue
+
+                with open(path, "rb") as fd:
+                    body = fd.read()
+                stat        = os.stat(path)
+                name, ext   = os.path.splitext(filename)
+                relative    = os.path.relpath(path, publicPath).replace(DS, "/")
+                digest      = hashlib.sha256(body).hexdigest()[0:12]
+                entry       = {
+                    "hash"  : digest,
+                    "url"   : "/"+os.path.dirname(relative)+("/" if os.path.dirname(relative) else "")+name+"."+digest+ext,
+                    "size"  : len(body),
+                    "mtime" : stat.st_mtime,
+                    "gzip"  : False
+                }
+
+                # Gzip sibling, only if worth it
+                if mimes.get(ext, "") in types and len(body)>=minSize:
+                    compressed = gzip.compress(body, compresslevel=level, mtime=0)
+                    if len(compressed)<len(body)*0.9:
+                        with open(path+".gz", "wb") as fd:
+                            fd.write(compressed)
+                        # Same mtime than source, server serves sibling only if it is not older
+                        os.utime(path+".gz", (stat.st_atime, stat.st_mtime))
+                        entry["gzip"] = True
+                    elif os.path.isfile(path+".gz"):
+                        os.remove(path+".gz")
+
+                manifest[relative] = entry
+
+        configPath = dirRoot+"app"+DS+appName+DS+"config"
+        os.makedirs(configPath, exist_ok=True)
+        with open(configPath+DS+"assets.json", "w") as fd:
+            json.dump(manifest, fd, indent=4, sort_keys=True)
+        print(f"{appName}: {len(manifest)} assets, {len([e for e in manifest.values() if e['gzip']])} precompressed")
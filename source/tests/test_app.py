@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+from nano.app                   import App
+from nano.app.prequeue          import PreQueue
+from nano.app.view              import View
+from nano.server.httprequest    import HttpRequest
+from nano.server.httpresponse   import HttpResponse
+from nano.server.workerpool     import WorkerPool
+
+import asyncio
+import os
+import threading
+import time
+import unittest
+
+"""
+    Dispatch of requests to applicatives: admission control and worker pools
+"""
+class TestApp(unittest.TestCase):
+
+    """
+        Applicatives of project, localhost one rejects with 429
+        @returns None
+    """
+    def setUp(self):
+        dirRoot         = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))+os.path.sep
+        self.app        = App(dirRoot)
+        self.vhost      = self.app.vhosts[0]
+        self.instance   = self.app.applicatives["localhost"]
+        self.release    = threading.Event()
+
+    """
+        Release blocked workers, stop pools
+        @returns None
+    """
+    def tearDown(self):
+        self.release.set()
+        for pool in self.app.pools.values():
+            pool.shutdown()
+
+    """
+        Resolve a request, without waiting for its response
+        @param   path   str         Requested path
+        @returns tuple  (HttpResponse, threading.Event set once response is sent)
+    """
+    def dispatch(self, path: str = "/") -> tuple:
+        request             = HttpRequest()
+        request.protocol    = "http"
+        request.vhost       = self.vhost
+        request.headers["queryString"] = path
+        response            = HttpResponse()
+        sent                = threading.Event()
+        response.on("send", lambda args: sent.set())
+        self.app.resolve(request, response)
+        return response, sent
+
+    """
+        Resolve a request, wait for its response
+        @returns HttpResponse
+    """
+    def resolve(self) -> HttpResponse:
+        response, sent = self.dispatch()
+        self.assertTrue(sent.wait(5))
+        return response
+
+    """
+        Vhost pool with one worker busy until release
+        @param   maxQueue   int     Max waiting tasks of pool
+        @returns None
+    """
+    def busyPool(self, maxQueue: int):
+        key     = self.app.vhostKey.key(self.vhost)
+        self.app.pools[key].shutdown()
+        pool    = WorkerPool("Test", 1, maxQueue)
+        started = threading.Event()
+        pool.submit(lambda: started.set() or self.release.wait(5))
+        started.wait(5)
+        self.app.pools[key] = pool
+
+    """
+        Request over queue depth gets configured reject code
+    """
+    def test_reject_depth(self):
+        self.instance.Queue = PreQueue(1, 0, 429)
+        self.instance.Queue.enter()
+        self.assertEqual(self.resolve().code, 429)
+
+    """
+        Request rejected by a full pool gets configured reject code, and leaves queue
+    """
+    def test_reject_pool_full(self):
+        self.instance.Queue = PreQueue(0, 0, 429)
+        self.busyPool(1)
+        self.app.pools[self.app.vhostKey.key(self.vhost)].submit(lambda: None)
+        response = self.resolve()
+        self.assertEqual(response.code, 429)
+        self.assertEqual(response.headers["retryAfter"], "1")
+        self.assertEqual(self.instance.Queue.depth, 0)
+
+    """
+        Request which waited over max wait gets configured reject code
+    """
+    def test_reject_expired(self):
+        self.instance.Queue = PreQueue(0, 0.01, 429)
+        self.busyPool(0)
+        timer = threading.Timer(0.05, self.release.set)
+        timer.start()
+        response = self.resolve()
+        self.assertEqual(response.code, 429)
+        self.assertEqual(self.instance.Queue.stats()["expired"], 1)
+
+    """
+        "async def" controller resolved on running loop keeps its queue place until its coroutine is done
+    """
+    def test_async_controller(self):
+        self.instance.Queue = PreQueue(1, 0, 429)
+        self.app.pools.pop(self.app.vhostKey.key(self.vhost)).shutdown()
+        self.instance.reloadModules = lambda: None
+        test = self
+        class AsyncController():
+            async def test(self, number):
+                await test.done.wait()
+                return View().Json(200, {"argv": number}, {})
+        self.instance.Controllers[self.instance.Routes["index"]] = AsyncController()
+
+        async def run():
+            self.done = asyncio.Event()
+            first, sent = self.dispatch("/test/1")
+            await asyncio.sleep(0.01)
+            self.assertFalse(sent.is_set())
+            self.assertEqual(self.instance.Queue.depth, 1)
+            # Queue is full while coroutine runs
+            self.assertEqual(self.resolve().code, 429)
+            self.done.set()
+            while not sent.is_set():
+                await asyncio.sleep(0.005)
+            self.assertEqual(first.code, 200)
+            self.assertEqual(self.instance.Queue.depth, 0)
+            second, sent = self.dispatch("/test/2")
+            while not sent.is_set():
+                await asyncio.sleep(0.005)
+            self.assertEqual(second.code, 200)
+        asyncio.run(asyncio.wait_for(run(), 5))
+        self.assertEqual(self.instance.Queue.depth, 0)
+        self.assertEqual(self.instance.Queue.stats()["rejected"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
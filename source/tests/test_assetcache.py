@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+from nano.server.assetcache     import AssetCache
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+"""
+    In-memory static assets, revalidation against disk
+"""
+class TestAssetCache(unittest.TestCase):
+
+    """
+        Temporary file of asset
+        @returns None
+    """
+    def setUp(self):
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(b'old')
+        self.path  = f.name
+        self.cache = AssetCache(1024, 1024, 0)
+
+    """
+        Remove temporary file
+        @returns None
+    """
+    def tearDown(self):
+        os.unlink(self.path)
+
+    """
+        Write file with a new mtime
+        @param   body   bytes   Content
+        @returns os.stat_result
+    """
+    def rewrite(self, body: bytes) -> os.stat_result:
+        stat = os.stat(self.path)
+        with open(self.path, "wb") as f:
+            f.write(body)
+        os.utime(self.path, (stat.st_atime+10, stat.st_mtime+10))
+        return os.stat(self.path)
+
+    """
+        Changed file is a miss and leaves cache
+    """
+    def test_changed(self):
+        self.cache.put(self.path, b'old', {}, os.stat(self.path))
+        self.assertEqual(self.cache.get(self.path)["body"], b'old')
+        self.rewrite(b'new!')
+        self.assertIsNone(self.cache.get(self.path))
+        self.assertEqual(self.cache.used, 0)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    """
+        Stale asset found by revalidation does not evict a newer one put meanwhile
+    """
+    def test_changed_put_meanwhile(self):
+        self.cache.put(self.path, b'old', {}, os.stat(self.path))
+        stat = self.rewrite(b'new!')
+        def putMeanwhile(path):
+            # Other thread reads new file while stat is out of lock
+            self.cache.put(self.path, b'new!', {}, stat)
+            return stat
+        with mock.patch("nano.server.assetcache.os.stat", side_effect=putMeanwhile):
+            self.assertIsNone(self.cache.get(self.path))
+        asset = self.cache.get(self.path)
+        self.assertEqual(asset["body"], b'new!')
+        self.assertEqual(self.cache.used, 4)
+
+if __name__ == '__main__':
+    unittest.main()
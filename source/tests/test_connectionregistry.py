@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+from nano.server.connectionregistry import ConnectionRegistry
+from nano.server.socketportlistener import SocketPortListener
+
+import socket
+import threading
+import unittest
+
+"""
+    Connexion with remote address and port, as registry reads them
+"""
+class Connection():
+
+    """
+        Constructor
+        @param   remote str     Remote ip
+        @param   port   int     Listened port
+        @returns None
+    """
+    def __init__(self, remote: str, port: int):
+        self._remote    = (remote, 50000)
+        self._port      = port
+        self.state      = "idle"
+
+"""
+    Open connexions of a server and their limits
+"""
+class TestConnectionRegistry(unittest.TestCase):
+
+    """
+        Admitted place is reserved until connexion is added, released place is given back
+    """
+    def test_reserve(self):
+        registry = ConnectionRegistry(2, 0)
+        self.assertTrue(registry.admit("10.0.0.1", 80))
+        self.assertTrue(registry.admit("10.0.0.2", 80))
+        self.assertFalse(registry.admit("10.0.0.3", 80))
+        conn = Connection("10.0.0.1", 80)
+        registry.add(conn)
+        self.assertEqual(len(registry), 1)
+        self.assertEqual(registry.stats()["reserved"], 1)
+        self.assertFalse(registry.admit("10.0.0.3", 80))
+        registry.release("10.0.0.2", 80)
+        self.assertEqual(registry.stats()["reserved"], 0)
+        self.assertEqual(registry.count("10.0.0.2"), 0)
+        self.assertTrue(registry.admit("10.0.0.3", 80))
+        registry.remove(conn)
+        self.assertEqual(registry.count("10.0.0.1"), 0)
+        self.assertEqual(registry.stats()["ports"], {80: 1})
+        self.assertEqual(registry.rejected, 2)
+
+    """
+        Admission with its connexion registers it in same step, removal frees its place
+    """
+    def test_admit_connection(self):
+        registry = ConnectionRegistry(0, 1)
+        first    = Connection("10.0.0.1", 443)
+        self.assertTrue(registry.admit("10.0.0.1", 443, first))
+        self.assertTrue(registry.admit("10.0.0.1", 443, first))
+        self.assertFalse(registry.admit("10.0.0.1", 443, Connection("10.0.0.1", 443)))
+        self.assertEqual(len(registry), 1)
+        self.assertEqual(registry.stats()["reserved"], 0)
+        registry.remove(first)
+        self.assertTrue(registry.admit("10.0.0.1", 443, Connection("10.0.0.1", 443)))
+
+    """
+        Concurrent admissions never go over limits
+    """
+    def test_concurrent_admit(self):
+        registry = ConnectionRegistry(20, 5)
+        admitted = []
+        start    = threading.Barrier(16)
+        def run(i):
+            start.wait()
+            for j in range(10):
+                remote = "10.0.0."+str(j%5)
+                if registry.admit(remote, 80):
+                    admitted.append(remote)
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(admitted), 20)
+        for i in range(5):
+            self.assertEqual(admitted.count("10.0.0."+str(i)), 4)
+        self.assertEqual(registry.rejected, 160-20)
+
+    """
+        Listener gives back place of an admitted socket failing before its connexion
+    """
+    def test_listener_release(self):
+        registry = ConnectionRegistry(1, 0)
+        def wrapper(sock):
+            raise OSError("wrap failed")
+        listener = SocketPortListener(80, False, wrapper)
+        listener.admission(registry.admit, registry.release)
+        errors   = []
+        listener.on("error", lambda args: errors.append(args["exception"]))
+        server, client = socket.socketpair()
+        try:
+            self.assertTrue(registry.admit("unix", 80))
+            listener._connect(server, "unix")
+            self.assertEqual(len(errors), 1)
+            self.assertEqual(registry.stats()["reserved"], 0)
+            self.assertEqual(registry.count("unix"), 0)
+            self.assertTrue(registry.admit("unix", 80))
+        finally:
+            server.close()
+            client.close()
+
+if __name__ == '__main__':
+    unittest.main()
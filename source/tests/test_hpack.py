@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+from nano.server.hpack          import Hpack, HpackError
+
+import os
+import random
+import unittest
+
+"""
+    HPACK header compression (RFC 7541)
+"""
+class TestHpack(unittest.TestCase):
+
+    """
+        Decode requests of a connexion, RFC 7541 C.3 (raw strings) and C.4 (huffman strings)
+    """
+    def test_decode_rfc_requests(self):
+        for blocks in [
+            ["828684410f7777772e6578616d706c652e636f6d", "828684be58086e6f2d6361636865", "828785bf400a637573746f6d2d6b65790c637573746f6d2d76616c7565"],
+            ["828684418cf1e3c2e5f23a6ba0ab90f4ff", "828684be5886a8eb10649cbf", "828785bf408825a849e95ba97d7f8925a849e95bb8e8b4bf"]
+        ]:
+            hpack = Hpack()
+            self.assertEqual(hpack.decode(bytes.fromhex(blocks[0])), [(b':method', b'GET'), (b':scheme', b'http'), (b':path', b'/'), (b':authority', b'www.example.com')])
+            self.assertEqual(hpack._decodeSize, 57)
+            self.assertEqual(hpack.decode(bytes.fromhex(blocks[1])), [(b':method', b'GET'), (b':scheme', b'http'), (b':path', b'/'), (b':authority', b'www.example.com'), (b'cache-control', b'no-cache')])
+            self.assertEqual(hpack._decodeSize, 110)
+            self.assertEqual(hpack.decode(bytes.fromhex(blocks[2])), [(b':method', b'GET'), (b':scheme', b'https'), (b':path', b'/index.html'), (b':authority', b'www.example.com'), (b'custom-key', b'custom-value')])
+            self.assertEqual(list(hpack._decodeTable), [(b'custom-key', b'custom-value'), (b'cache-control', b'no-cache'), (b':authority', b'www.example.com')])
+            self.assertEqual(hpack._decodeSize, 164)
+
+    """
+        Decode responses with evictions from a 256 bytes table, RFC 7541 C.6 (huffman strings)
+    """
+    def test_decode_rfc_responses(self):
+        hpack = Hpack(256)
+        self.assertEqual(hpack.decode(bytes.fromhex("488264025885aec3771a4b6196d07abe941054d444a8200595040b8166e082a62d1bff6e919d29ad171863c78f0b97c8e9ae82ae43d3")), [
+            (b':status', b'302'), (b'cache-control', b'private'), (b'date', b'Mon, 21 Oct 2013 20:13:21 GMT'), (b'location', b'https://www.example.com')
+        ])
+        self.assertEqual(hpack._decodeSize, 222)
+        self.assertEqual(hpack.decode(bytes.fromhex("4883640effc1c0bf")), [
+            (b':status', b'307'), (b'cache-control', b'private'), (b'date', b'Mon, 21 Oct 2013 20:13:21 GMT'), (b'location', b'https://www.example.com')
+        ])
+        self.assertEqual(hpack._decodeSize, 222)
+        self.assertEqual(hpack.decode(bytes.fromhex("88c16196d07abe941054d444a8200595040b8166e084a62d1bffc05a839bd9ab77ad94e7821dd7f2e6c7b335dfdfcd5b3960d5af27087f3672c1ab270fb5291f9587316065c003ed4ee5b1063d5007")), [
+            (b':status', b'200'), (b'cache-control', b'private'), (b'date', b'Mon, 21 Oct 2013 20:13:22 GMT'), (b'location', b'https://www.example.com'),
+            (b'content-encoding', b'gzip'), (b'set-cookie', b'foo=ASDJKHQKBZXOQWEOPIUAXQWEOIU; max-age=3600; version=1')
+        ])
+        self.assertEqual(hpack._decodeSize, 215)
+
+    """
+        Encoded blocks decode to same headers on peer, dynamic table entries are reused
+    """
+    def test_roundtrip(self):
+        encoder, decoder = Hpack(), Hpack()
+        generator = random.Random(3)
+        for i in range(0, 50):
+            headers = [(b':status', b'200'), (b'content-type', b'text/html; charset=utf-8'), (b'date', b'Mon, 21 Oct 2013 20:13:21 GMT')]
+            headers+= [(b'x-custom-'+str(generator.randint(0, 9)).encode(), bytes(generator.randint(0, 255) for j in range(generator.randint(0, 40)))) for j in range(0, 5)]
+            block = encoder.encode(headers)
+            self.assertEqual(decoder.decode(block), headers)
+        block = encoder.encode([(b'content-type', b'text/html; charset=utf-8')])
+        self.assertEqual(len(block), 1)
+        self.assertEqual(decoder.decode(block), [(b'content-type', b'text/html; charset=utf-8')])
+
+    """
+        Fields never indexed by encoder stay out of dynamic table
+    """
+    def test_not_indexed(self):
+        encoder = Hpack()
+        block   = encoder.encode([(b'set-cookie', b'a=1'), (b'etag', b'"x"')])
+        self.assertEqual(len(encoder._encodeTable), 0)
+        self.assertEqual(Hpack().decode(block), [(b'set-cookie', b'a=1'), (b'etag', b'"x"')])
+
+    """
+        Smaller table of peer is signaled at start of next block, and evicts entries
+    """
+    def test_table_size_update(self):
+        encoder, decoder = Hpack(), Hpack()
+        decoder.decode(encoder.encode([(b'x-a', b'1'*100), (b'x-b', b'2'*100)]))
+        encoder.setEncoderMaxSize(200)
+        self.assertEqual(len(encoder._encodeTable), 1)
+        block = encoder.encode([(b'x-b', b'2'*100)])
+        self.assertEqual(block[0:2], bytes([0x3f, 200-31]))
+        self.assertEqual(decoder.decode(block), [(b'x-b', b'2'*100)])
+        self.assertEqual(decoder._decodeMax, 200)
+        self.assertEqual(len(decoder._decodeTable), 1)
+
+    """
+        Integers on several bytes, RFC 7541 C.1
+    """
+    def test_integers(self):
+        hpack = Hpack()
+        self.assertEqual(hpack._int(10, 5, 0), bytes([10]))
+        self.assertEqual(hpack._int(1337, 5, 0), bytes([31, 154, 10]))
+        self.assertEqual(hpack._int(42, 8, 0), bytes([42]))
+        self.assertEqual(hpack._readInt(bytes([31, 154, 10]), 0, 5), (1337, 3))
+        for value in [0, 30, 31, 127, 128, 255, 16383, 1<<20]:
+            self.assertEqual(hpack._readInt(hpack._int(value, 6, 0x40), 0, 6), (value, len(hpack._int(value, 6, 0x40))))
+
+    """
+        Huffman coding of every byte value
+    """
+    def test_huffman(self):
+        hpack  = Hpack()
+        string = bytes(range(0, 256))+os.urandom(512)
+        self.assertEqual(hpack._huffmanDecode(hpack._huffmanEncode(string)), string)
+        self.assertEqual(hpack._huffmanEncode(b'www.example.com'), bytes.fromhex("f1e3c2e5f23a6ba0ab90f4ff"))
+
+    """
+        Malformed blocks are compression errors
+    """
+    def test_errors(self):
+        for block in [
+            "80",                   # Index 0
+            "be",                   # Index out of tables
+            "3fe21f",               # Table size update over setting (4097)
+            "7f",                   # Truncated integer
+            "ffffffffffffff",       # Oversized integer
+            "4003666f6f",           # Truncated string
+            "408cf1e3c2e5f23a6ba0ab90f4",       # Truncated huffman string
+            "0081fe",               # Huffman padding of zero bits
+            "008400000000"          # Huffman string with EOS
+        ]:
+            with self.assertRaises(HpackError, msg=block):
+                Hpack().decode(bytes.fromhex(block))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+from nano.server.http2framer    import Http2Framer, Http2Error
+
+import unittest
+
+"""
+    Cutting of an http/2 byte stream into frames
+"""
+class TestHttp2Framer(unittest.TestCase):
+
+    """
+        Frames after preface, fed byte by byte or at once
+    """
+    def test_frames(self):
+        framer  = Http2Framer()
+        frames  = [(Http2Framer.SETTINGS, 0, 0, b''), (Http2Framer.HEADERS, Http2Framer.END_HEADERS, 1, b'\x82\x84'), (Http2Framer.DATA, Http2Framer.END_STREAM, 1, b'x'*20000)]
+        data    = Http2Framer.PREFACE+b''.join([framer.pack(*frame) for frame in frames])
+        for step in [1, 7, len(data)]:
+            framer  = Http2Framer(32768)
+            output  = []
+            for offset in range(0, len(data), step):
+                framer.feed(data[offset:offset+step])
+                while True:
+                    frame = framer.next()
+                    if frame == None:
+                        break
+                    output.append(frame)
+            self.assertEqual(output, frames)
+            self.assertEqual(len(framer._buffer)-framer._start, 0)
+
+    """
+        Frame header: 24 bits length, type, flags, reserved bit of stream id ignored
+    """
+    def test_pack(self):
+        framer = Http2Framer()
+        self.assertEqual(framer.pack(Http2Framer.PING, Http2Framer.ACK, 0, b'12345678'), b'\x00\x00\x08\x06\x01\x00\x00\x00\x0012345678')
+        self.assertEqual(framer.pack(Http2Framer.DATA, 0, 3, b'a'*70000)[0:9], b'\x01\x11\x70\x00\x00\x00\x00\x00\x03')
+        framer.feed(Http2Framer.PREFACE+b'\x00\x00\x00\x00\x00\x80\x00\x00\x05')
+        self.assertEqual(framer.next(), (Http2Framer.DATA, 0, 5, b''))
+
+    """
+        Invalid preface is a protocol error, even before it is complete
+    """
+    def test_invalid_preface(self):
+        framer = Http2Framer()
+        framer.feed(b'PRI * HTTP/2.0\r\n')
+        self.assertIsNone(framer.next())
+        framer.feed(b'\r\nXX')
+        with self.assertRaises(Http2Error) as context:
+            framer.next()
+        self.assertEqual(context.exception.code, Http2Framer.PROTOCOL_ERROR)
+
+    """
+        Frame over max frame size is refused from its header
+    """
+    def test_frame_too_large(self):
+        framer = Http2Framer(16384)
+        framer.feed(Http2Framer.PREFACE+b'\x00\x40\x01\x00\x00\x00\x00\x00\x01')
+        with self.assertRaises(Http2Error) as context:
+            framer.next()
+        self.assertEqual(context.exception.code, Http2Framer.FRAME_SIZE_ERROR)
+
+if __name__ == '__main__':
+    unittest.main()
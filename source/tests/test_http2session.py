@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+from nano.server.http2framer    import Http2Framer
+from nano.server.http2session   import Http2Session
+from nano.server.hpack          import Hpack
+
+import struct
+import unittest
+
+"""
+    In-memory connexion in thread mode (loop None), keeps written bytes
+"""
+class MemoryConnection():
+
+    """
+        Constructor
+        @returns None
+    """
+    def __init__(self):
+        self.closed     = False
+        self.loop       = None
+        self.pending    = 0
+        self.data       = bytearray()
+        self._local     = ("127.0.0.1", 443)
+        self._remote    = ("127.0.0.1", 50000)
+        self._port      = 443
+        self._ssl       = True
+        self._events    = {}
+
+    """
+        Keep written data
+        @param   data   bytes   Data
+        @returns None
+    """
+    def write(self, data: bytes):
+        self.data += data
+
+    """
+        Keep last data, close
+        @param   data   bytes   Last data
+        @returns None
+    """
+    def end(self, data: bytes):
+        self.data += data
+        self.closed = True
+
+    """
+        Keep alive is not tracked
+        @param   value  bool    Keep alive
+        @returns None
+    """
+    def setkeepalive(self, value: bool):
+        pass
+
+    """
+        Keep event handlers
+        @param   eventName  str         Event name
+        @param   callback   Callable    Callback
+        @returns None
+    """
+    def on(self, eventName: str, callback):
+        self._events[eventName] = callback
+
+"""
+    Http/2 session of a connexion, client side played by test
+"""
+class TestHttp2Session(unittest.TestCase):
+
+    """
+        Started session, client preface and settings sent
+        @returns None
+    """
+    def setUp(self):
+        self.conn       = MemoryConnection()
+        self.events     = []
+        self.session    = Http2Session(self.conn, {"maxConcurrentStreams": 2, "initialWindowSize": 65535, "maxRequestSize": 100}, lambda name, args: self.events.append((name, args)))
+        self.encoder    = Hpack()
+        self.decoder    = Hpack()
+        self.framer     = Http2Framer()
+        self.session.start()
+        self.session.feed(Http2Framer.PREFACE+self.framer.pack(Http2Framer.SETTINGS, 0, 0))
+
+    """
+        Frames written by server since last call
+        @returns list   (type, flags, stream id, payload)
+    """
+    def received(self) -> list:
+        framer = Http2Framer()
+        framer.feed(Http2Framer.PREFACE+bytes(self.conn.data))
+        self.conn.data = bytearray()
+        frames = []
+        while True:
+            frame = framer.next()
+            if frame == None:
+                return frames
+            frames.append(frame)
+
+    """
+        HEADERS frame of a request
+        @param   streamId   int     Stream id
+        @param   headers    list    (name, value) bytes
+        @param   flags      int     Frame flags
+        @returns bytes
+    """
+    def headers(self, streamId: int, headers: list, flags: int = Http2Framer.END_HEADERS | Http2Framer.END_STREAM) -> bytes:
+        return self.framer.pack(Http2Framer.HEADERS, flags, streamId, self.encoder.encode(headers))
+
+    """
+        Pseudo headers of a GET request
+        @param   path   bytes   Path
+        @returns list
+    """
+    def get(self, path: bytes = b'/') -> list:
+        return [(b':method', b'GET'), (b':scheme', b'https'), (b':path', path), (b':authority', b'localhost')]
+
+    """
+        Connexion error sent (GOAWAY then close)
+        @param   code   int     Error code
+        @returns None
+    """
+    def assertGoaway(self, code: int):
+        frames = self.received()
+        self.assertEqual(frames[-1][0], Http2Framer.GOAWAY)
+        self.assertEqual(struct.unpack(">II", frames[-1][3])[1], code)
+        self.assertTrue(self.conn.closed)
+
+    """
+        Server preface is its SETTINGS, client SETTINGS are acknowledged, PING is answered
+    """
+    def test_settings_ping(self):
+        frames = self.received()
+        self.assertEqual(frames[0][0:3], (Http2Framer.SETTINGS, 0, 0))
+        self.assertIn((Http2Framer.SETTINGS_MAX_CONCURRENT_STREAMS, 2), [struct.unpack_from(">HI", frames[0][3], offset) for offset in range(0, len(frames[0][3]), 6)])
+        self.assertEqual(frames[1], (Http2Framer.SETTINGS, Http2Framer.ACK, 0, b''))
+        self.session.feed(self.framer.pack(Http2Framer.PING, 0, 0, b'abcdefgh'))
+        self.assertEqual(self.received(), [(Http2Framer.PING, Http2Framer.ACK, 0, b'abcdefgh')])
+
+    """
+        Request of a stream is fired as an http/1 request (version 2.0), cookie crumbs joined
+    """
+    def test_request(self):
+        self.received()
+        self.session.feed(self.headers(1, self.get(b'/a?b=1')+[(b'cookie', b'a=1'), (b'accept', b'*/*'), (b'cookie', b'b=2')]))
+        self.assertEqual(len(self.events), 1)
+        name, args = self.events[0]
+        self.assertEqual(name, "data")
+        self.assertEqual(args["data"], b'GET /a?b=1 HTTP/2.0\r\nhost: localhost\r\naccept: */*\r\ncookie: a=1; b=2\r\n\r\n')
+        self.assertEqual(args["socket"].id, 1)
+
+    """
+        Request split in HEADERS and CONTINUATION, body in DATA frames
+    """
+    def test_continuation_body(self):
+        self.received()
+        block = self.encoder.encode([(b':method', b'POST'), (b':scheme', b'https'), (b':path', b'/form'), (b':authority', b'localhost'), (b'content-length', b'6')])
+        self.session.feed(self.framer.pack(Http2Framer.HEADERS, 0, 1, block[0:5]))
+        self.session.feed(self.framer.pack(Http2Framer.CONTINUATION, Http2Framer.END_HEADERS, 1, block[5:]))
+        self.session.feed(self.framer.pack(Http2Framer.DATA, 0, 1, b'a=1'))
+        self.assertEqual(self.events, [])
+        self.session.feed(self.framer.pack(Http2Framer.DATA, Http2Framer.END_STREAM | Http2Framer.PADDED, 1, b'\x02&b=\x00\x00'))
+        self.assertEqual(self.events[0][1]["data"], b'POST /form HTTP/2.0\r\nhost: localhost\r\ncontent-length: 6\r\n\r\na=1&b=')
+
+    """
+        Http/1 response written on stream is sent as HEADERS and DATA, hop-by-hop headers dropped
+    """
+    def test_response(self):
+        self.received()
+        self.session.feed(self.headers(1, self.get()))
+        stream = self.events[0][1]["socket"]
+        stream.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: keep-alive\r\nContent-Length: 5\r\n\r\nhel')
+        stream.end(b'lo')
+        frames = self.received()
+        self.assertEqual(frames[0][0:3], (Http2Framer.HEADERS, Http2Framer.END_HEADERS, 1))
+        self.assertEqual(self.decoder.decode(frames[0][3]), [(b':status', b'200'), (b'content-type', b'text/plain'), (b'content-length', b'5')])
+        self.assertEqual(b''.join([frame[3] for frame in frames[1:]]), b'hello')
+        self.assertEqual(frames[-1][0:2], (Http2Framer.DATA, Http2Framer.END_STREAM))
+        self.assertTrue(stream.closed)
+        self.assertEqual(self.session.streams, {})
+
+    """
+        Response data waits for window updates of peer
+    """
+    def test_flow_control(self):
+        self.session.feed(self.framer.pack(Http2Framer.SETTINGS, 0, 0, struct.pack(">HI", Http2Framer.SETTINGS_INITIAL_WINDOW_SIZE, 4)))
+        self.received()
+        self.session.feed(self.headers(1, self.get()))
+        stream = self.events[0][1]["socket"]
+        stream.end(b'HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\n0123456789')
+        frames = self.received()
+        self.assertEqual([(frame[0], frame[3]) for frame in frames[1:]], [(Http2Framer.DATA, b'0123')])
+        self.session.feed(self.framer.pack(Http2Framer.WINDOW_UPDATE, 0, 1, struct.pack(">I", 4)))
+        self.assertEqual([(frame[0], frame[1], frame[3]) for frame in self.received()], [(Http2Framer.DATA, 0, b'4567')])
+        self.session.feed(self.framer.pack(Http2Framer.WINDOW_UPDATE, 0, 1, struct.pack(">I", 100)))
+        self.assertEqual([(frame[0], frame[1], frame[3]) for frame in self.received()], [(Http2Framer.DATA, Http2Framer.END_STREAM, b'89')])
+
+    """
+        Streams over max concurrent streams are refused, connexion goes on
+    """
+    def test_max_streams(self):
+        self.received()
+        for streamId in [1, 3, 5]:
+            self.session.feed(self.headers(streamId, self.get()))
+        self.assertEqual(len(self.events), 2)
+        self.assertEqual(self.received(), [(Http2Framer.RST_STREAM, 0, 5, struct.pack(">I", Http2Framer.REFUSED_STREAM))])
+        self.assertFalse(self.conn.closed)
+
+    """
+        Body over max request size is an invalid request (413), Content-Length mismatch resets stream
+    """
+    def test_body_errors(self):
+        self.received()
+        self.session.feed(self.headers(1, [(b':method', b'POST'), (b':scheme', b'https'), (b':path', b'/'), (b':authority', b'localhost')], Http2Framer.END_HEADERS))
+        self.session.feed(self.framer.pack(Http2Framer.DATA, Http2Framer.END_STREAM, 1, b'x'*101))
+        self.assertEqual((self.events[0][0], self.events[0][1]["code"]), ("invalid", 413))
+        self.session.feed(self.headers(3, [(b':method', b'POST'), (b':scheme', b'https'), (b':path', b'/'), (b':authority', b'localhost'), (b'content-length', b'9')], Http2Framer.END_HEADERS))
+        self.session.feed(self.framer.pack(Http2Framer.DATA, Http2Framer.END_STREAM, 3, b'xx'))
+        self.assertEqual(len(self.events), 1)
+        self.assertIn((Http2Framer.RST_STREAM, 0, 3, struct.pack(">I", Http2Framer.PROTOCOL_ERROR)), self.received())
+
+    """
+        Malformed requests reset their stream
+    """
+    def test_malformed_requests(self):
+        self.received()
+        requests = [
+            [(b':method', b'GET'), (b':path', b'/')],                               # Pseudo header after regular one
+            [(b':method', b'GET'), (b':scheme', b'https'), (b':path', b'x')],       # Path not absolute
+            self.get()+[(b'Accept', b'*/*')],                                       # Upper case name
+            self.get()+[(b'connection', b'keep-alive')],                            # Hop-by-hop header
+            self.get()+[(b'x-a', b'1\r\n2')]                                        # Line break in value
+        ]
+        requests[0].insert(0, (b'accept', b'*/*'))
+        for index, headers in enumerate(requests):
+            self.session.feed(self.headers(index*2+1, headers))
+            self.assertEqual(self.received(), [(Http2Framer.RST_STREAM, 0, index*2+1, struct.pack(">I", Http2Framer.PROTOCOL_ERROR))], headers)
+        self.assertEqual(self.events, [])
+        self.assertFalse(self.conn.closed)
+
+    """
+        DATA on stream 0 is a connexion error
+    """
+    def test_connexion_error(self):
+        self.received()
+        self.session.feed(self.framer.pack(Http2Framer.DATA, 0, 0, b'x'))
+        self.assertGoaway(Http2Framer.PROTOCOL_ERROR)
+
+    """
+        Undecodable header block is a compression error
+    """
+    def test_compression_error(self):
+        self.received()
+        self.session.feed(self.framer.pack(Http2Framer.HEADERS, Http2Framer.END_HEADERS, 1, b'\x80'))
+        self.assertGoaway(Http2Framer.COMPRESSION_ERROR)
+
+    """
+        Header block interrupted by another frame is a connexion error
+    """
+    def test_interrupted_header_block(self):
+        self.received()
+        self.session.feed(self.headers(1, self.get(), 0))
+        self.session.feed(self.framer.pack(Http2Framer.PING, 0, 0, b'abcdefgh'))
+        self.assertGoaway(Http2Framer.PROTOCOL_ERROR)
+
+    """
+        After GOAWAY, new streams are ignored, open ones still complete
+    """
+    def test_goaway(self):
+        self.received()
+        self.session.feed(self.headers(1, self.get(), Http2Framer.END_HEADERS))
+        frame = self.session.goaway()
+        self.assertEqual(frame, self.framer.pack(Http2Framer.GOAWAY, 0, 0, struct.pack(">II", 1, Http2Framer.NO_ERROR)))
+        self.session.feed(self.headers(3, self.get()))
+        self.assertNotIn(3, self.session.streams)
+        self.session.feed(self.framer.pack(Http2Framer.DATA, Http2Framer.END_STREAM, 1, b''))
+        self.assertEqual([args["socket"].id for name, args in self.events], [1])
+
+    """
+        Closed connexion releases its streams
+    """
+    def test_close(self):
+        self.session.feed(self.headers(1, self.get()))
+        stream = self.events[0][1]["socket"]
+        self.conn.closed = True
+        self.conn._events["close"]({})
+        self.assertTrue(stream.closed)
+        self.assertEqual(self.session.streams, {})
+
+if __name__ == '__main__':
+    unittest.main()
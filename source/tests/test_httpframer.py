@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+from nano.server.httpframer     import HttpFramer, FramingError
+
+import unittest
+
+"""
+    Framing of http requests and websocket frames
+"""
+class TestHttpFramer(unittest.TestCase):
+
+    """
+        Feed data and take every complete frame
+        @param   framer HttpFramer  Framer
+        @param   data   bytes       Received data
+        @returns list               Frames as bytes
+    """
+    def frames(self, framer: HttpFramer, data: bytes) -> list:
+        framer.feed(data)
+        frames = []
+        while True:
+            frame = framer.next()
+            if frame == None:
+                return frames
+            frames.append(bytes(frame))
+            frame.release()
+            framer.compact()
+
+    """
+        Request without body, then pipelined one
+    """
+    def test_pipelined(self):
+        framer = HttpFramer()
+        first  = b'GET /a HTTP/1.1\r\nHost: x\r\n\r\n'
+        second = b'GET /b HTTP/1.1\r\nHost: x\r\n\r\n'
+        self.assertEqual(self.frames(framer, first+second), [first, second])
+        self.assertEqual(framer.state(), "idle")
+
+    """
+        Content-Length body received in pieces
+    """
+    def test_content_length(self):
+        framer  = HttpFramer()
+        request = b'POST / HTTP/1.1\r\nContent-Length: 5\r\n\r\nhello'
+        self.assertEqual(self.frames(framer, request[0:10]), [])
+        self.assertEqual(framer.state(), "headers")
+        self.assertEqual(self.frames(framer, request[10:-2]), [])
+        self.assertEqual(framer.state(), "body")
+        self.assertEqual(self.frames(framer, request[-2:]), [request])
+
+    """
+        Invalid Content-Length is a bad request
+    """
+    def test_invalid_content_length(self):
+        for value in [b'abc', b'-1']:
+            with self.assertRaises(FramingError) as context:
+                self.frames(HttpFramer(), b'POST / HTTP/1.1\r\nContent-Length: '+value+b'\r\n\r\n')
+            self.assertEqual(context.exception.code, 400)
+
+    """
+        Chunked body is rebuilt with a Content-Length, extensions and trailers are dropped
+    """
+    def test_chunked(self):
+        framer  = HttpFramer()
+        request = b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n5;ext=1\r\nhello\r\n6\r\n world\r\n0\r\nTrailer: x\r\n\r\n'
+        frames  = []
+        for i in range(0, len(request)):
+            frames += self.frames(framer, request[i:i+1])
+        self.assertEqual(frames, [b'POST / HTTP/1.1\r\nContent-Length: 11\r\n\r\nhello world'])
+
+    """
+        Transfer-Encoding wins over Content-Length
+    """
+    def test_chunked_over_content_length(self):
+        request = b'POST / HTTP/1.1\r\nContent-Length: 3\r\nTransfer-Encoding: chunked\r\n\r\n2\r\nab\r\n0\r\n\r\n'
+        self.assertEqual(self.frames(HttpFramer(), request), [b'POST / HTTP/1.1\r\nContent-Length: 2\r\n\r\nab'])
+
+    """
+        Declared chunk size over max request size is refused before its bytes are received
+    """
+    def test_chunk_too_large(self):
+        framer = HttpFramer(1000)
+        with self.assertRaises(FramingError) as context:
+            self.frames(framer, b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\nFFFFFFFF\r\n')
+        self.assertEqual(context.exception.code, 413)
+
+    """
+        Chunks summing over max request size are refused
+    """
+    def test_chunks_too_large(self):
+        framer = HttpFramer(100)
+        data   = b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n'+b'10\r\n'+b'x'*16+b'\r\n'
+        with self.assertRaises(FramingError) as context:
+            for i in range(0, 10):
+                self.frames(framer, data)
+                data = b'10\r\n'+b'x'*16+b'\r\n'
+        self.assertEqual(context.exception.code, 413)
+
+    """
+        Chunk size line is limited, even without line end
+    """
+    def test_chunk_line_too_long(self):
+        framer = HttpFramer()
+        with self.assertRaises(FramingError) as context:
+            self.frames(framer, b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n1;'+b'x'*2000)
+        self.assertEqual(context.exception.code, 400)
+
+    """
+        Chunk size is hexadecimal and positive
+    """
+    def test_invalid_chunk_size(self):
+        for size in [b'zz', b'-5']:
+            with self.assertRaises(FramingError) as context:
+                self.frames(HttpFramer(), b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n'+size+b'\r\nhello\r\n')
+            self.assertEqual(context.exception.code, 400)
+
+    """
+        Trailers after last chunk are limited as headers
+    """
+    def test_trailers_too_large(self):
+        framer = HttpFramer(65536, 1000)
+        with self.assertRaises(FramingError) as context:
+            self.frames(framer, b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n0\r\nX: '+b'x'*2000)
+        self.assertEqual(context.exception.code, 431)
+
+    """
+        Headers without end over max headers size
+    """
+    def test_headers_too_large(self):
+        with self.assertRaises(FramingError) as context:
+            self.frames(HttpFramer(65536, 100), b'GET / HTTP/1.1\r\nX: '+b'x'*200)
+        self.assertEqual(context.exception.code, 431)
+
+    """
+        Content-Length over max request size
+    """
+    def test_request_too_large(self):
+        with self.assertRaises(FramingError) as context:
+            self.frames(HttpFramer(100), b'POST / HTTP/1.1\r\nContent-Length: 1000\r\n\r\n')
+        self.assertEqual(context.exception.code, 413)
+
+    """
+        Websocket frames by their length header (7 bits, 16 bits), masked
+    """
+    def test_websocket(self):
+        framer = HttpFramer()
+        framer.websocket = True
+        small  = bytes([0x81, 0x80|3])+b'mask'+b'abc'
+        medium = bytes([0x81, 0x80|126])+(300).to_bytes(2, "big")+b'mask'+b'x'*300
+        self.assertEqual(self.frames(framer, small+medium[0:100]), [small])
+        self.assertEqual(self.frames(framer, medium[100:]), [medium])
+
+    """
+        Websocket frame over max request size
+    """
+    def test_websocket_too_large(self):
+        framer = HttpFramer(100)
+        framer.websocket = True
+        with self.assertRaises(FramingError) as context:
+            self.frames(framer, bytes([0x81, 127])+(10**6).to_bytes(8, "big"))
+        self.assertEqual(context.exception.code, 413)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+from nano.server.httpparser     import HttpParser
+from nano.server.httpframer     import FramingError
+
+import unittest
+
+"""
+    Parsing of http request heads on bytes
+"""
+class TestHttpParser(unittest.TestCase):
+
+    """
+        Request line, headers by camelCase name, raw body
+    """
+    def test_parse(self):
+        parser  = HttpParser()
+        request = memoryview(b'POST /a?b=1 HTTP/1.1\r\nHost: localhost:80\r\nContent-Type: text/plain\r\nX-Forwarded-For:  10.0.0.1 \r\n\r\nbody')
+        (method, target, protocol, version, headers, body) = parser.parse(request)
+        self.assertEqual((method, target, protocol, version), ("post", "/a?b=1", "http", "1.1"))
+        self.assertEqual(headers, {"host": "localhost:80", "contentType": "text/plain", "xForwardedFor": "10.0.0.1"})
+        self.assertEqual(bytes(body), b'body')
+
+    """
+        Method, protocol and header names in any case
+    """
+    def test_case(self):
+        parser  = HttpParser()
+        for i in range(0, 2):
+            (method, target, protocol, version, headers, body) = parser.parse(b'get / http/1.0\r\nHOST: a\r\nuser-AGENT: b\r\nX-My-Header: c\r\n\r\n')
+            self.assertEqual((method, protocol, version), ("get", "http", "1.0"))
+            self.assertEqual(headers, {"host": "a", "userAgent": "b", "xMyHeader": "c"})
+
+    """
+        Lines which are not "name: value" and empty values are ignored, last value of a name wins
+    """
+    def test_ignored_lines(self):
+        headers = HttpParser().parse(b'GET / HTTP/1.1\r\nBad Name: x\r\nno colon\r\n: x\r\nEmpty:\r\nA: 1\r\na: 2\r\n\r\n')[4]
+        self.assertEqual(headers, {"a": "2"})
+
+    """
+        Values are decoded as latin-1 (obs-text)
+    """
+    def test_latin1(self):
+        headers = HttpParser().parse(b'GET / HTTP/1.1\r\nX: caf\xe9\r\n\r\n')[4]
+        self.assertEqual(headers["x"], "caf\xe9")
+
+    """
+        Invalid request lines are not http
+    """
+    def test_invalid_request_line(self):
+        parser = HttpParser()
+        for request in [b'HELLO\r\n\r\n', b'GET  / HTTP/1.1\r\n\r\n', b'GET / FTP/1.1\r\n\r\n', b'G3T / HTTP/1.1\r\n\r\n', b'GET / HTTP/1.1']:
+            self.assertIsNone(parser.parse(request), request)
+
+    """
+        Control characters in head (NUL, CR or LF alone) are a bad request
+    """
+    def test_controls(self):
+        parser = HttpParser()
+        for header in [b'A: b\x00c', b'A: b\nc', b'A: b\rc']:
+            with self.assertRaises(FramingError) as context:
+                parser.parse(b'GET / HTTP/1.1\r\n'+header+b'\r\n\r\n')
+            self.assertEqual(context.exception.code, 400)
+
+    """
+        A header line over max header size is refused (431)
+    """
+    def test_header_too_large(self):
+        parser = HttpParser(65536, 100)
+        self.assertEqual(parser.parse(b'GET / HTTP/1.1\r\nA: '+b'x'*97+b'\r\n\r\n')[4], {"a": "x"*97})
+        with self.assertRaises(FramingError) as context:
+            parser.parse(b'GET / HTTP/1.1\r\nA: '+b'x'*98+b'\r\n\r\n')
+        self.assertEqual(context.exception.code, 431)
+
+    """
+        Websocket frames and http requests are identified, others are not
+    """
+    def test_identify(self):
+        parser = HttpParser()
+        self.assertEqual(parser.identify(b'\x81\x83mask'), "websocket")
+        self.assertEqual(parser.identify(b'\x88\x80mask'), "websocket")
+        self.assertEqual(parser.identify(memoryview(b'GET / HTTP/1.1\r\nHost: a\r\n\r\n')), "http")
+        self.assertIsNone(parser.identify(b'SSH-2.0-OpenSSH\r\n'))
+
+    """
+        Names to camelCase keys, known names are interned
+    """
+    def test_names(self):
+        parser = HttpParser()
+        self.assertEqual(parser._camelCase(b'Sec-WebSocket-Key'), "secWebsocketKey")
+        self.assertEqual(parser._camelCase(b'a--b'), "aB")
+        self.assertIs(parser.parse(b'GET / HTTP/1.1\r\nIf-None-Match: x\r\n\r\n')[4].popitem()[0], parser._names[b'if-none-match'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+
+from nano.config                import Config
+from nano.server.httpprotocol   import HttpProtocol
+
+import json
+import os
+import tempfile
+import unittest
+
+"""
+    In-memory connexion in thread mode (loop None), keeps written bytes
+"""
+class MemoryConnection():
+
+    """
+        Constructor
+        @returns None
+    """
+    def __init__(self):
+        self.closed     = False
+        self.terminator = b'\r\n\r\n'
+        self.requests   = 0
+        self.pending    = 0
+        self.loop       = None
+        self.data       = bytearray()
+        self.finished   = 0
+        self._local     = ("127.0.0.1", 80)
+        self._remote    = ("127.0.0.1", 50000)
+        self._port      = 80
+        self._ssl       = False
+
+    """
+        Keep written data
+        @param   data   bytes   Data
+        @returns None
+    """
+    def write(self, data: bytes):
+        self.data += data
+
+    """
+        Keep last data, close
+        @param   data   bytes   Last data
+        @returns None
+    """
+    def end(self, data: bytes):
+        self.data += data
+        self.closed = True
+
+    """
+        Keep a slice of file, as sent by kernel
+        @param   file       file        Open file
+        @param   offset     int         Start of slice
+        @param   count      int         Bytes of slice
+        @param   callback   Callable    Called once sent
+        @returns None
+    """
+    def sendfile(self, file, offset: int, count: int, callback):
+        file.seek(offset)
+        self.data += file.read(count)
+        callback()
+
+    """
+        Run streaming routine at once
+        @param   callback   Callable    Streaming routine
+        @returns None
+    """
+    def stream(self, callback):
+        callback()
+
+    """
+        Response is over, count it
+        @returns None
+    """
+    def finish(self):
+        self.finished += 1
+
+    """
+        Close connexion
+        @returns None
+    """
+    def close(self):
+        self.closed = True
+
+    """
+        Keep alive is not tracked
+        @param   value  bool    Keep alive
+        @returns None
+    """
+    def setkeepalive(self, value: bool):
+        pass
+
+    """
+        Events are never fired
+        @param   eventName  str         Event name
+        @param   callback   Callable    Callback
+        @returns None
+    """
+    def on(self, eventName: str, callback):
+        pass
+
+"""
+    Http protocol helpers, out of any connexion
+"""
+class TestHttpProtocol(unittest.TestCase):
+
+    """
+        Protocol with server config, vhost directory with a public file
+        @returns None
+    """
+    def setUp(self):
+        dirRoot         = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))+os.path.sep
+        self.protocol   = HttpProtocol(dirRoot, Config(dirRoot+"config"))
+        self.directory  = tempfile.TemporaryDirectory()
+        self.dirRoot    = self.directory.name+os.path.sep
+        os.makedirs(self.dirRoot+"public"+os.path.sep+"css")
+        os.makedirs(self.dirRoot+"config")
+        self.path       = self.dirRoot+"public"+os.path.sep+"css"+os.path.sep+"site.css"
+        with open(self.path, "wb") as fd:
+            fd.write(b'body{color:red}')
+
+    """
+        Remove vhost directory
+        @returns None
+    """
+    def tearDown(self):
+        self.directory.cleanup()
+
+    """
+        Write manifest of the public file as built by precompress.py
+        @param   entry  dict    Manifest entry overloads
+        @returns None
+    """
+    def manifest(self, entry: dict = {}):
+        stat    = os.stat(self.path)
+        content = {"css/site.css": dict({"hash": "0123456789ab", "url": "/css/site.0123456789ab.css", "size": stat.st_size, "mtime": stat.st_mtime, "gzip": False}, **entry)}
+        with open(self.dirRoot+"config"+os.path.sep+"assets.json", "w") as fd:
+            json.dump(content, fd)
+        self.protocol._pathCache.invalidate()
+
+    """
+        Fingerprinted url of an unchanged file is its file, current
+    """
+    def test_fingerprint(self):
+        self.manifest()
+        self.assertEqual(self.protocol._fingerprint(self.dirRoot, "/css/site.0123456789ab.css"), ("/css/site.css", True))
+        self.assertEqual(self.protocol._fingerprint(self.dirRoot, "/css/site.css"), (None, False))
+        self.assertEqual(self.protocol._fingerprint(self.dirRoot, "/css/site.ba9876543210.css"), (None, False))
+
+    """
+        Without manifest no url is fingerprinted
+    """
+    def test_fingerprint_no_manifest(self):
+        self.assertEqual(self.protocol._fingerprint(self.dirRoot, "/css/site.0123456789ab.css"), (None, False))
+
+    """
+        File changed since build (size or mtime) is not the hashed content anymore
+    """
+    def test_fingerprint_changed(self):
+        self.manifest()
+        stat = os.stat(self.path)
+        os.utime(self.path, (stat.st_atime, stat.st_mtime+10))
+        self.protocol._pathCache.invalidate()
+        self.assertEqual(self.protocol._fingerprint(self.dirRoot, "/css/site.0123456789ab.css"), ("/css/site.css", False))
+        self.manifest({"size": 1})
+        self.assertEqual(self.protocol._fingerprint(self.dirRoot, "/css/site.0123456789ab.css"), ("/css/site.css", False))
+
+    """
+        Manifest built before size and mtime were recorded never marks a file current
+    """
+    def test_fingerprint_old_manifest(self):
+        with open(self.dirRoot+"config"+os.path.sep+"assets.json", "w") as fd:
+            json.dump({"css/site.css": {"hash": "0123456789ab", "url": "/css/site.0123456789ab.css", "gzip": False}}, fd)
+        self.assertEqual(self.protocol._fingerprint(self.dirRoot, "/css/site.0123456789ab.css"), ("/css/site.css", False))
+
+    """
+        Websocket messages of a connexion share a serial key, other connexions have their own
+    """
+    def test_websocket_serial(self):
+        first, second = object(), object()
+        frame   = b'\x81\x82\x01\x02\x03\x04'+bytes([ord("o")^1, ord("k")^2])
+        request = self.protocol.websocketParse(first, 80, False, frame)[0]
+        self.assertEqual(request.body, "ok")
+        self.assertIsNotNone(request.serial)
+        self.assertEqual(self.protocol.websocketParse(first, 80, False, frame)[0].serial, request.serial)
+        self.assertNotEqual(self.protocol.websocketParse(second, 80, False, frame)[0].serial, request.serial)
+
+    """
+        Range header against file size: suffix, open, coalesced, unsatisfiable, ignored
+    """
+    def test_byte_ranges(self):
+        ranges = self.protocol._byteRanges
+        self.assertEqual(ranges("bytes=0-4", 100), [(0, 4)])
+        self.assertEqual(ranges("BYTES=10-", 100), [(10, 99)])
+        self.assertEqual(ranges("bytes=-30", 100), [(70, 99)])
+        self.assertEqual(ranges("bytes=-300", 100), [(0, 99)])
+        self.assertEqual(ranges("bytes=90-200", 100), [(90, 99)])
+        self.assertEqual(ranges("bytes=0-9, 20-29", 100), [(0, 9), (20, 29)])
+        self.assertEqual(ranges("bytes=20-29,0-9,5-12,13-15", 100), [(0, 15), (20, 29)])
+        self.assertEqual(ranges("bytes=100-", 100), [])
+        self.assertEqual(ranges("bytes=-0", 100), [])
+        self.assertEqual(ranges("bytes=0-", 0), [])
+        self.assertEqual(ranges("bytes=100-,0-0", 100), [(0, 0)])
+        self.assertIsNone(ranges("items=0-4", 100))
+        self.assertIsNone(ranges("bytes=5-1", 100))
+        self.assertIsNone(ranges("bytes=-", 100))
+        self.assertIsNone(ranges("bytes=a-b", 100))
+        self.assertIsNone(ranges("bytes="+",".join([str(i*2)+"-"+str(i*2) for i in range(0, self.protocol.MAX_RANGES+1)]), 100))
+
+    """
+        If-Range validator: strong etag or exact date, weak etag never matches
+    """
+    def test_if_range(self):
+        etag = '"abc"'
+        self.assertTrue(self.protocol._ifRange(None, etag, 1000))
+        self.assertTrue(self.protocol._ifRange('"abc"', etag, 1000))
+        self.assertFalse(self.protocol._ifRange('"abd"', etag, 1000))
+        self.assertFalse(self.protocol._ifRange('W/"abc"', etag, 1000))
+        self.assertTrue(self.protocol._ifRange(self.protocol._httpgmtformat(1000), etag, 1000.5))
+        self.assertFalse(self.protocol._ifRange(self.protocol._httpgmtformat(999), etag, 1000))
+
+    """
+        Request a public file of vhost directory
+        @param   headers    str                 Extra request headers
+        @param   method     str                 Request method
+        @param   vhost      dict                Vhost configuration overloads
+        @param   connexion  MemoryConnection    Connexion receiving response
+        @returns tuple                          (code, headers by lowercase name, body)
+    """
+    def get(self, headers: str, method: str = "GET", vhost: dict = {}, connexion: MemoryConnection = None) -> tuple:
+        with open(self.path, "wb") as fd:
+            fd.write(bytes(range(0, 256))*40)
+        self.protocol.vhosts = [dict({"port": 80, "hosts": ["localhost"], "directory": self.dirRoot}, **vhost)]
+        connexion = connexion or MemoryConnection()
+        self.protocol.parse(connexion, 80, False, memoryview((method+" /css/site.css HTTP/1.1\r\nHost: localhost\r\n"+headers+"\r\n").encode()))
+        return self.split(connexion.data)
+
+    """
+        Split a raw http response
+        @param   data   bytes   Raw response
+        @returns tuple          (code, headers by lowercase name, body)
+    """
+    def split(self, data: bytes) -> tuple:
+        head, body = bytes(data).split(b'\r\n\r\n', 1)
+        lines   = head.decode().split("\r\n")
+        fields  = {line.split(":", 1)[0].lower(): line.split(":", 1)[1].strip() for line in lines[1:]}
+        return int(lines[0].split(" ")[1]), fields, body
+
+    """
+        Single range is a 206 with Content-Range
+    """
+    def test_range_single(self):
+        code, fields, body = self.get("Range: bytes=10-19\r\n")
+        self.assertEqual(code, 206)
+        self.assertEqual(fields["content-range"], "bytes 10-19/10240")
+        self.assertEqual(fields["content-length"], "10")
+        self.assertEqual(body, bytes(range(10, 20)))
+
+    """
+        Several ranges are a multipart/byteranges body, each part with its Content-Range
+    """
+    def test_range_multipart(self):
+        code, fields, body = self.get("Range: bytes=0-3,-4,100-103\r\n")
+        self.assertEqual(code, 206)
+        self.assertTrue(fields["content-type"].startswith("multipart/byteranges; boundary="))
+        boundary = fields["content-type"].split("boundary=")[1].encode()
+        self.assertEqual(int(fields["content-length"]), len(body))
+        self.assertTrue(body.endswith(b'\r\n--'+boundary+b'--\r\n'))
+        parts = body[:-len(boundary)-8].split(b'--'+boundary+b'\r\n')
+        self.assertEqual(parts[0], b'')
+        expected = [(b'bytes 0-3/10240', bytes([0, 1, 2, 3])), (b'bytes 100-103/10240', bytes([100, 101, 102, 103])), (b'bytes 10236-10239/10240', bytes([252, 253, 254, 255]))]
+        self.assertEqual(len(parts)-1, len(expected))
+        for part, (contentRange, data) in zip(parts[1:], expected):
+            head, content = part.split(b'\r\n\r\n', 1)
+            self.assertIn(b'Content-Range: '+contentRange, head)
+            self.assertIn(b'Content-Type: text/css', head)
+            self.assertIn(content, [data+b'\r\n', data])
+
+    """
+        Unsatisfiable range is a 416 with file size
+    """
+    def test_range_unsatisfiable(self):
+        code, fields, body = self.get("Range: bytes=20000-\r\n")
+        self.assertEqual(code, 416)
+        self.assertEqual(fields["content-range"], "bytes */10240")
+        self.assertEqual(body, b'')
+
+    """
+        Outdated If-Range validator or invalid Range header sends whole file
+    """
+    def test_range_ignored(self):
+        for headers in ['Range: bytes=0-3\r\nIf-Range: "outdated"\r\n', "Range: bytes=3-1\r\n"]:
+            code, fields, body = self.get(headers)
+            self.assertEqual(code, 200)
+            self.assertEqual(len(body), 10240)
+
+    """
+        HEAD of a cached asset and of a streamed file: headers with length of body, no body, connexion kept alive
+    """
+    def test_head_file(self):
+        for vhost in [{}, {"assetCache": {"budget": 0}}]:
+            self.protocol._assetCaches.clear()
+            connexion = MemoryConnection()
+            code, fields, body = self.get("", "HEAD", vhost, connexion)
+            self.assertEqual(code, 200)
+            self.assertEqual(fields["content-length"], "10240")
+            self.assertEqual(body, b'')
+            self.assertEqual(connexion.finished, 1)
+            self.assertFalse(connexion.closed)
+            self.assertEqual(self.protocol._assetCache(self.protocol.vhosts[0]) == None, "assetCache" in vhost)
+
+    """
+        HEAD of a dynamic route: packed response has length of body, no body
+    """
+    def test_head_route(self):
+        self.protocol.vhosts = [{"port": 80, "hosts": ["localhost"], "directory": self.dirRoot}]
+        for method, expected in [("GET", b'{"test": 1}'), ("HEAD", b'')]:
+            request, response = self.protocol.parse(MemoryConnection(), 80, False, memoryview((method+" /test/1 HTTP/1.1\r\nHost: localhost\r\n\r\n").encode()))
+            response.body = '{"test": 1}'
+            code, fields, body = self.split(self.protocol.pack(response))
+            self.assertEqual(code, 200)
+            self.assertEqual(fields["content-length"], "11")
+            self.assertEqual(fields["connection"], "keep-alive")
+            self.assertEqual(body, expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+from nano.server.proxyprotocol  import ProxyProtocol, ProxyProtocolError
+
+import socket
+import struct
+import unittest
+
+"""
+    PROXY protocol header (v1 text, v2 binary)
+"""
+class TestProxyProtocol(unittest.TestCase):
+
+    """
+        V2 header
+        @param   command    int     Version and command byte
+        @param   family     int     Family and transport byte
+        @param   addresses  bytes   Addresses and TLVs
+        @returns bytes
+    """
+    def v2(self, command: int, family: int, addresses: bytes) -> bytes:
+        return ProxyProtocol.V2_SIGNATURE+struct.pack(">BBH", command, family, len(addresses))+addresses
+
+    """
+        Parse a header followed by connexion data, at once then byte by byte
+        @param   header bytes   Header
+        @returns ProxyProtocol
+    """
+    def parse(self, header: bytes) -> ProxyProtocol:
+        data  = header+b'GET / HTTP/1.1\r\n'
+        proxy = ProxyProtocol()
+        self.assertEqual(proxy.feed(data), len(header))
+        split = ProxyProtocol()
+        count = 0
+        for i in range(len(data)):
+            count += split.feed(data[i:i+1])
+        self.assertEqual(count, len(header))
+        self.assertEqual((split.remote, split.local, split.version), (proxy.remote, proxy.local, proxy.version))
+        self.assertTrue(proxy.done)
+        return proxy
+
+    """
+        V1 addresses of tcp over ipv4 and ipv6, unknown connexion
+    """
+    def test_v1(self):
+        proxy = self.parse(b'PROXY TCP4 192.168.0.1 10.0.0.2 56324 443\r\n')
+        self.assertEqual((proxy.version, proxy.remote, proxy.local), (1, ("192.168.0.1", 56324), ("10.0.0.2", 443)))
+        proxy = self.parse(b'PROXY TCP6 2001:db8::1 ::1 65535 80\r\n')
+        self.assertEqual((proxy.remote, proxy.local), (("2001:db8::1", 65535), ("::1", 80)))
+        proxy = self.parse(b'PROXY UNKNOWN ffff:f...f:ffff ffff:f...f:ffff 65535 65535\r\n')
+        self.assertEqual((proxy.remote, proxy.local), (None, None))
+
+    """
+        V2 addresses of ipv4, ipv6 and unix connexions (TLVs ignored), local and unspecified connexions
+    """
+    def test_v2(self):
+        proxy = self.parse(self.v2(0x21, 0x11, socket.inet_aton("192.168.0.1")+socket.inet_aton("10.0.0.2")+struct.pack(">HH", 56324, 443)+b'\x04\x00\x01x'))
+        self.assertEqual((proxy.version, proxy.remote, proxy.local), (2, ("192.168.0.1", 56324), ("10.0.0.2", 443)))
+        proxy = self.parse(self.v2(0x21, 0x21, socket.inet_pton(socket.AF_INET6, "2001:db8::1")+socket.inet_pton(socket.AF_INET6, "::1")+struct.pack(">HH", 1, 2)))
+        self.assertEqual((proxy.remote, proxy.local), (("2001:db8::1", 1), ("::1", 2)))
+        proxy = self.parse(self.v2(0x21, 0x31, b'/run/a.sock'.ljust(108, b'\x00')+b''.ljust(108, b'\x00')))
+        self.assertEqual((proxy.remote, proxy.local), (("/run/a.sock", 0), ("unix", 0)))
+        proxy = self.parse(self.v2(0x20, 0x11, socket.inet_aton("192.168.0.1")+socket.inet_aton("10.0.0.2")+struct.pack(">HH", 1, 2)))
+        self.assertEqual((proxy.remote, proxy.local), (None, None))
+        proxy = self.parse(self.v2(0x21, 0x00, b''))
+        self.assertEqual((proxy.remote, proxy.local), (None, None))
+
+    """
+        Nothing is read once header is complete
+    """
+    def test_done(self):
+        proxy = ProxyProtocol()
+        proxy.feed(b'PROXY UNKNOWN\r\n')
+        self.assertEqual(proxy.feed(b'PROXY TCP4 1.1.1.1 2.2.2.2 1 2\r\n'), 0)
+
+    """
+        Invalid headers
+    """
+    def test_errors(self):
+        for data in [
+            b'GET / HTTP/1.1\r\n\r\n',
+            b'PROXY TCP4 192.168.0.1 10.0.0.2 56324\r\n',
+            b'PROXY TCP5 192.168.0.1 10.0.0.2 1 2\r\n',
+            b'PROXY TCP4 ::1 10.0.0.2 1 2\r\n',
+            b'PROXY TCP4 192.168.0.1 10.0.0.2 080 443\r\n',
+            b'PROXY TCP4 192.168.0.1 10.0.0.2 65536 443\r\n',
+            b'PROXY TCP4 192.168.0.1 10.0.0.2 1 2'+b' '*100,
+            self.v2(0x11, 0x11, b'\x00'*12),
+            self.v2(0x22, 0x11, b'\x00'*12),
+            self.v2(0x21, 0x11, b'\x00'*11),
+            self.v2(0x21, 0x21, b'\x00'*12),
+            self.v2(0x21, 0x41, b''),
+            ProxyProtocol.V2_SIGNATURE+struct.pack(">BBH", 0x21, 0x11, 5000)
+        ]:
+            with self.assertRaises(ProxyProtocolError, msg=data):
+                ProxyProtocol().feed(data)
+
+    """
+        Header is read from socket without consuming connexion data after it
+    """
+    def test_read(self):
+        server, client = socket.socketpair()
+        try:
+            server.setblocking(False)
+            proxy = ProxyProtocol()
+            client.sendall(b'PROXY TCP4 192.168.0.1 ')
+            self.assertFalse(proxy.read(server))
+            with self.assertRaises(BlockingIOError):
+                proxy.read(server)
+            client.sendall(b'10.0.0.2 56324 443\r\nGET /')
+            self.assertTrue(proxy.read(server))
+            self.assertEqual(proxy.remote, ("192.168.0.1", 56324))
+            self.assertEqual(server.recv(100), b'GET /')
+            client.close()
+            with self.assertRaises(ProxyProtocolError):
+                ProxyProtocol().read(server)
+        finally:
+            server.close()
+            client.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+from nano.server.filebuffer     import FileBuffer
+from nano.server.socketwrapper  import SocketWrapper
+
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+"""
+    Pipelined responses of a connexion in thread mode
+"""
+class TestResponseSequencer(unittest.TestCase):
+
+    """
+        Receive bytes from socket until count is reached
+        @param   sock   socket.socket   Client socket
+        @param   count  int             Bytes expected
+        @returns bytes
+    """
+    def receive(self, sock: socket.socket, count: int) -> bytes:
+        data = bytearray()
+        while len(data)<count:
+            chunk = sock.recv(65536)
+            if len(chunk)==0:
+                break
+            data += chunk
+        return bytes(data)
+
+    """
+        Static file queued behind a dynamic response is sent after it, finishing worker is not held by the download
+    """
+    def test_stream_behind_dynamic(self):
+        content = os.urandom(4*1024*1024)
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(content)
+        server, client = socket.socketpair()
+        client.settimeout(5)
+        try:
+            conn    = SocketWrapper(server, 80, False)
+            dynamic = conn._sequencer.slot()
+            static  = conn._sequencer.slot()
+            threads = []
+            done    = threading.Event()
+            fb      = FileBuffer(static, f.name, [(b'', 0, len(content))], 16384, True)
+            def start():
+                threads.append(threading.current_thread())
+                fb.start()
+                done.set()
+            static.stream(start)
+            self.assertEqual(threads, [])
+
+            def respond():
+                dynamic.write(b'dynamic')
+                dynamic.finish()
+            worker = threading.Thread(target=respond)
+            worker.start()
+            # File is larger than socket buffers, worker is back while nothing is read yet
+            worker.join(2)
+            self.assertFalse(worker.is_alive())
+
+            self.assertEqual(self.receive(client, 7+len(content)), b'dynamic'+content)
+            self.assertTrue(done.wait(5))
+            self.assertEqual(len(threads), 1)
+            self.assertIsNot(threads[0], worker)
+            self.assertEqual(conn._sequencer.depth(), 0)
+            self.assertFalse(conn.closed)
+        finally:
+            server.close()
+            client.close()
+            os.unlink(f.name)
+
+    """
+        Callbacks handed off by other threads run in order, one at a time
+    """
+    def test_handoff_order(self):
+        server, client = socket.socketpair()
+        try:
+            conn    = SocketWrapper(server, 80, False)
+            output  = []
+            done    = threading.Event()
+            for i in range(50):
+                conn.handoff(lambda i=i: output.append(i))
+            conn.handoff(done.set)
+            self.assertTrue(done.wait(5))
+            self.assertEqual(output, list(range(50)))
+        finally:
+            server.close()
+            client.close()
+
+if __name__ == '__main__':
+    unittest.main()
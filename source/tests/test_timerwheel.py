@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+from nano.server.timerwheel     import TimerWheel
+
+import random
+import threading
+import time
+import unittest
+
+"""
+    Hierarchical timer wheel, driven tick by tick
+"""
+class TestTimerWheel(unittest.TestCase):
+
+    RESOLUTION = 1000.0     # Seconds of a tick, no tick goes by while a test runs
+
+    """
+        Small wheel (4 slots by level, 3 levels: 63 ticks), not started
+        @returns None
+    """
+    def setUp(self):
+        self.wheel          = TimerWheel(self.RESOLUTION, 2, 3)
+        self.wheel._origin  = time.monotonic()
+        self.fired          = []
+
+    """
+        Schedule a timer expiring a number of ticks after current tick, it records its firing tick
+        @param   ticks  int     Ticks from current tick
+        @param   name   object  Timer name
+        @returns Timer
+    """
+    def schedule(self, ticks: int, name):
+        return self.wheel.schedule((self.wheel._tick+ticks-0.5)*self.RESOLUTION, lambda: self.fired.append((name, self.wheel._tick)))
+
+    """
+        Advance wheel, fire expired timers
+        @param   ticks  int     Ticks to advance
+        @returns None
+    """
+    def advance(self, ticks: int):
+        for i in range(ticks):
+            for timer in self.wheel._advance():
+                timer.callback()
+
+    """
+        Every timer fires at its tick, whatever level it was placed in and tick it was scheduled at
+    """
+    def test_fire_on_tick(self):
+        generator = random.Random(7)
+        expected  = []
+        for step in range(0, 4):
+            for i in range(0, 50):
+                ticks = generator.randint(1, 63)
+                expected.append(((step, i), self.wheel._tick+ticks))
+                self.schedule(ticks, (step, i))
+            self.advance(generator.randint(1, 40))
+        self.advance(64)
+        self.assertEqual(sorted(self.fired, key=lambda fired: (fired[1], fired[0])), sorted(expected, key=lambda fired: (fired[1], fired[0])))
+        self.assertEqual(self.wheel.stats()["timers"], 0)
+        self.assertEqual(self.wheel.stats()["fired"], 200)
+
+    """
+        Cancelled timers never fire, cancel twice is harmless
+    """
+    def test_cancel(self):
+        timers = [self.schedule(ticks, ticks) for ticks in [1, 5, 20, 60]]
+        timers[1].cancel()
+        timers[3].cancel()
+        timers[3].cancel()
+        self.assertEqual(self.wheel.stats()["timers"], 2)
+        self.advance(64)
+        self.assertEqual(self.fired, [(1, 1), (20, 20)])
+        timers[0].cancel()
+        self.assertEqual(self.wheel.stats()["timers"], 0)
+
+    """
+        Delays are clamped: never before next tick, never after wheel span
+    """
+    def test_clamp(self):
+        self.wheel.schedule(0, lambda: self.fired.append(("now", self.wheel._tick)))
+        self.wheel.schedule(-5, lambda: self.fired.append(("past", self.wheel._tick)))
+        self.schedule(1000, "far")
+        self.advance(64)
+        self.assertEqual(sorted(self.fired), [("far", 63), ("now", 1), ("past", 1)])
+
+    """
+        Started wheel calls back from its thread after delay, a failing callback does not stop it
+    """
+    def test_thread(self):
+        wheel = TimerWheel(0.01)
+        done  = threading.Event()
+        start = time.monotonic()
+        wheel.schedule(0.02, lambda: 1/0)
+        wheel.schedule(0.05, done.set)
+        wheel.start()
+        self.assertTrue(done.wait(5))
+        self.assertGreaterEqual(time.monotonic()-start, 0.05)
+        wheel.stop()
+        wheel.join(5)
+        self.assertFalse(wheel.is_alive())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+from nano.server.tokenbucket    import TokenBucket
+from nano.server.shaper         import Shaper
+from nano.server.filebuffer     import FileBuffer
+
+import os
+import tempfile
+import unittest
+
+"""
+    In-memory connexion in thread mode (loop None), keeps written bytes
+"""
+class MemoryConnection():
+
+    """
+        Constructor
+        @param   ssl    bool    Connexion over ssl (file is sent by slices, else by sendfile)
+        @returns None
+    """
+    def __init__(self, ssl: bool):
+        self.closed = False
+        self.loop   = None
+        self.data   = bytearray()
+        self._ssl   = ssl
+
+    """
+        Keep written data
+        @param   data   bytes   Data
+        @returns None
+    """
+    def write(self, data: bytes):
+        self.data += data
+
+    """
+        Keep a slice of file, as sent by kernel
+        @param   file       file        Open file
+        @param   offset     int         Start of slice
+        @param   count      int         Bytes of slice
+        @param   callback   Callable    Called once sent
+        @returns None
+    """
+    def sendfile(self, file, offset: int, count: int, callback):
+        file.seek(offset)
+        self.data += file.read(count)
+        callback()
+
+    """
+        Response is over
+        @returns None
+    """
+    def finish(self):
+        pass
+
+    """
+        Close connexion
+        @returns None
+    """
+    def close(self):
+        self.closed = True
+
+"""
+    Token buckets and bandwidth shaper
+"""
+class TestTokenBucket(unittest.TestCase):
+
+    """
+        Unlimited bucket grants everything
+    """
+    def test_unlimited(self):
+        bucket = TokenBucket(0)
+        self.assertTrue(bucket.consume(10**9))
+        self.assertEqual(bucket.take(12345), 12345)
+        self.assertEqual(bucket.delay(10**9), 0)
+
+    """
+        Take never gives more than available, nor less than nothing
+    """
+    def test_take(self):
+        bucket = TokenBucket(1, 1000)
+        self.assertEqual(bucket.take(600), 600)
+        self.assertEqual(bucket.take(600), 400)
+        self.assertEqual(bucket.take(600), 0)
+
+    """
+        A bucket in debt (charged over its tokens) grants nothing until refilled
+    """
+    def test_take_in_debt(self):
+        bucket = TokenBucket(1, 1000)
+        bucket.charge(5000)
+        self.assertEqual(bucket.take(256000), 0)
+        self.assertGreater(bucket.delay(1), 3000)
+
+    """
+        Consume is all or nothing
+    """
+    def test_consume(self):
+        bucket = TokenBucket(1, 10)
+        self.assertTrue(bucket.consume(10))
+        self.assertFalse(bucket.consume(1))
+
+    """
+        Charge back (negative) never exceeds burst
+    """
+    def test_charge_capped(self):
+        bucket = TokenBucket(1, 100)
+        bucket.charge(-1000)
+        self.assertEqual(bucket.take(1000), 100)
+
+    """
+        Client in debt: grant is 0 and other levels do not get tokens back
+    """
+    def test_grant_client_in_debt(self):
+        shaper = Shaper(1, 100000, 1000, None, 16)
+        key    = ("vhost", "1.2.3.4")
+        shaper.charge(key, 5000)
+        globalTokens = shaper._global._tokens
+        self.assertEqual(shaper.grant(key, 256000), 0)
+        self.assertLessEqual(shaper._global._tokens, globalTokens+1)
+
+    """
+        Most limited level paces the write, upper levels get back what they granted over it
+    """
+    def test_grant_most_limited(self):
+        shaper = Shaper(1, 100000, 1, 3000, 16)
+        key    = ("vhost", "1.2.3.4")
+        self.assertEqual(shaper.grant(key, 10000), 3000)
+        self.assertEqual(shaper._global.take(100000), 97000)
+        self.assertEqual(shaper.paced, 1)
+
+    """
+        Unshaped keys are never limited
+    """
+    def test_grant_unlimited(self):
+        shaper = Shaper(0, None, 0, None, 16)
+        self.assertFalse(shaper.enabled)
+        self.assertEqual(shaper.grant(("vhost", "1.2.3.4"), 5000), 5000)
+
+    """
+        A shaped download started while client is in debt sends the whole file, in order
+    """
+    def test_shaped_download_after_debt(self):
+        content = os.urandom(300000)
+        with tempfile.NamedTemporaryFile(delete=False) as fd:
+            fd.write(content)
+        try:
+            for ssl in [True, False]:
+                shaper = Shaper(0, None, 4000000, 400000, 16)
+                key    = ("vhost", "1.2.3.4")
+                shaper.charge(key, 600000)
+                conn   = MemoryConnection(ssl)
+                buffer = FileBuffer(conn, fd.name, [(b'', 0, len(content))], 65536, True, b'', shaper, key)
+                buffer.start()
+                self.assertEqual(bytes(conn.data), content)
+        finally:
+            os.remove(fd.name)
+
+if __name__ == '__main__':
+    unittest.main()
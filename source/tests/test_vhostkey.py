@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+from nano.server.vhostkey       import VhostKey
+
+import unittest
+
+"""
+    Vhost identification
+"""
+class TestVhostKey(unittest.TestCase):
+
+    """
+        Tcp port and unix socket path are listeners of a vhost
+    """
+    def test_ports(self):
+        vhostKey = VhostKey()
+        self.assertEqual(vhostKey.ports({"port": "80"}), [80])
+        self.assertEqual(vhostKey.ports({"unix": "/run/nano.sock"}), ["/run/nano.sock"])
+        self.assertEqual(vhostKey.ports({"port": 80, "unix": "/run/nano.sock"}), [80, "/run/nano.sock"])
+        self.assertEqual(vhostKey.ports({"unix": None}), [])
+
+    """
+        Key depends on listeners and hosts only, vhosts on different unix sockets differ
+    """
+    def test_key(self):
+        vhostKey = VhostKey()
+        self.assertEqual(vhostKey.key({"port": 80, "hosts": ["localhost", "*.localhost"], "directory": "./app/a/"}), "80:localhost,*.localhost")
+        self.assertEqual(vhostKey.key({"port": "80", "hosts": ["localhost", "*.localhost"], "workers": {}}), "80:localhost,*.localhost")
+        self.assertEqual(vhostKey.key({"port": 80, "unix": "/run/nano.sock", "hosts": ["a"]}), "80,/run/nano.sock:a")
+        self.assertNotEqual(vhostKey.key({"unix": "/run/a.sock", "hosts": ["a"]}), vhostKey.key({"unix": "/run/b.sock", "hosts": ["a"]}))
+
+if __name__ == '__main__':
+    unittest.main()
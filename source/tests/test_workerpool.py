@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+from nano.server.workerpool     import WorkerPool
+
+import threading
+import time
+import unittest
+
+"""
+    Bounded worker pool, serial tasks
+"""
+class TestWorkerPool(unittest.TestCase):
+
+    """
+        Wait for pool to be idle
+        @param   pool   WorkerPool  Pool
+        @param   total  int         Tasks completed when idle
+        @returns None
+    """
+    def wait(self, pool: WorkerPool, total: int):
+        deadline = time.monotonic()+5
+        while pool.stats()["completed"]<total and time.monotonic()<deadline:
+            time.sleep(0.005)
+        self.assertEqual(pool.stats()["completed"], total)
+
+    """
+        Tasks of a same serial key run one at a time, in submit order, on a multi-thread pool
+    """
+    def test_serial_order(self):
+        pool    = WorkerPool("Test", 8, 0)
+        output  = {"a": [], "b": []}
+        running = {"a": 0, "b": 0}
+        overlap = []
+        def task(key, i):
+            def run():
+                running[key] += 1
+                if running[key]>1:
+                    overlap.append(key)
+                time.sleep(0.0005 if i%3==0 else 0)
+                output[key].append(i)
+                running[key] -= 1
+            return run
+        for i in range(100):
+            self.assertTrue(pool.submit(task("a", i), "a"))
+            self.assertTrue(pool.submit(task("b", i), "b"))
+        deadline = time.monotonic()+5
+        while (len(output["a"])<100 or len(output["b"])<100) and time.monotonic()<deadline:
+            time.sleep(0.005)
+        pool.shutdown()
+        self.assertEqual(output["a"], list(range(100)))
+        self.assertEqual(output["b"], list(range(100)))
+        self.assertEqual(overlap, [])
+        self.assertEqual(pool._serials, {})
+
+    """
+        A failing task does not stop the following ones of its key
+    """
+    def test_serial_error(self):
+        pool    = WorkerPool("Test", 2, 0)
+        output  = []
+        release = threading.Event()
+        pool.submit(lambda: release.wait(5), "a")
+        pool.submit(lambda: 1/0, "a")
+        pool.submit(lambda: output.append(1), "a")
+        release.set()
+        deadline = time.monotonic()+5
+        while len(output)==0 and time.monotonic()<deadline:
+            time.sleep(0.005)
+        self.assertEqual(output, [1])
+        pool.shutdown()
+
+    """
+        Waiting tasks of a key are bounded by max queue
+    """
+    def test_serial_bounded(self):
+        pool    = WorkerPool("Test", 1, 2)
+        release = threading.Event()
+        self.assertTrue(pool.submit(lambda: release.wait(5), "a"))
+        self.assertTrue(pool.submit(lambda: None, "a"))
+        self.assertTrue(pool.submit(lambda: None, "a"))
+        self.assertFalse(pool.submit(lambda: None, "a"))
+        self.assertEqual(pool.stats()["rejected"], 1)
+        release.set()
+        self.wait(pool, 1)
+        pool.shutdown()
+
+    """
+        Tasks without key are rejected once queue is full
+    """
+    def test_bounded(self):
+        pool    = WorkerPool("Test", 1, 1)
+        release = threading.Event()
+        started = threading.Event()
+        self.assertTrue(pool.submit(lambda: started.set() or release.wait(5)))
+        started.wait(5)
+        self.assertTrue(pool.submit(lambda: None))
+        self.assertFalse(pool.submit(lambda: None))
+        self.assertFalse(pool.submit(lambda: None, "a"))
+        self.assertEqual(pool.stats()["rejected"], 2)
+        self.assertEqual(pool._serials, {})
+        release.set()
+        self.wait(pool, 2)
+        pool.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()